@@ -4,7 +4,7 @@
 
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 
@@ -71,11 +71,37 @@ class ConfigManager:
         # Иначе формируем URL стандартным способом
         if service_type == "chrome":
             return f"ws://{ip}:{port}"
+        elif service_type == "cdp":
+            # Chrome с --remote-debugging-port: ws URL с guid находится через /json/version
+            return f"http://{ip}:{port}"
         elif service_type == "selenium":
             return f"http://{ip}:{port}"
         else:
             return f"http://{ip}:{port}"
 
+    def get_remote_endpoints(self) -> List[Dict[str, Any]]:
+        """Получить пул удаленных браузеров: url, weight, capacity"""
+        endpoints = []
+        for endpoint in self.config["remote_settings"].get("endpoints", []):
+            url = endpoint["url"]
+            # Как и для mac_ip: адрес без протокола считается ws://
+            if "://" not in url:
+                url = f"ws://{url}"
+            endpoints.append({
+                "url": url,
+                "weight": endpoint.get("weight", 1),
+                "capacity": endpoint.get("capacity"),
+            })
+        return endpoints
+
+    def get_endpoint_probe_settings(self) -> Dict[str, float]:
+        """Получить настройки проверки эндпоинтов: таймаут и время жизни кэша"""
+        remote = self.config["remote_settings"]
+        return {
+            "probe_timeout": remote.get("probe_timeout", 2.0),
+            "cache_ttl": remote.get("probe_cache_ttl", 30),
+        }
+
     def get_browser_launch_args(self) -> Dict[str, Any]:
         """Получить аргументы запуска браузера"""
         if self.is_remote_mode():
@@ -109,6 +135,16 @@ class ConfigManager:
 
         return context_args
 
+    def get_local_target_settings(self) -> Dict[str, Any]:
+        """Получить настройки локального сервера-замены the-internet"""
+        settings: Dict[str, Any] = self.config.get("local_target", {})
+        return settings
+
+    def get_performance_budgets(self) -> Dict[str, Any]:
+        """Получить бюджеты метрик производительности страниц"""
+        budgets: Dict[str, Any] = self.config.get("performance_budgets", {})
+        return budgets
+
     def update_remote_ip(self, ip: str) -> None:
         """Обновить IP адрес удаленного Mac"""
         self.config["remote_settings"]["mac_ip"] = ip
@@ -129,6 +165,9 @@ class ConfigManager:
 
             print(f"   Remote URL: {remote_url}")
             print(f"   Service Type: {service_type}")
+            for endpoint in self.get_remote_endpoints():
+                capacity = endpoint["capacity"] or "∞"
+                print(f"   Endpoint: {endpoint['url']} (weight {endpoint['weight']}, capacity {capacity})")
         else:
             browser = os.getenv(
                 "BROWSER", self.config["local_settings"].get("browser", "chromium")
@@ -0,0 +1,52 @@
+"""
+Предустановленные конфигурации тестирования: переменные окружения каждой конфигурации
+Используются переключателем scripts/switch_config.py и матричным прогоном
+test_manager.py run --matrix
+"""
+from typing import Any, Dict, List
+
+
+CONFIGURATIONS: Dict[str, Dict[str, Any]] = {
+    "local": {
+        "description": "Local testing configuration",
+        "env_vars": {
+            "TEST_MODE": "local",
+            "BROWSER": "chromium",
+            "HEADLESS": "false",
+        },
+    },
+    "remote": {
+        "description": "Remote testing configuration",
+        "env_vars": {
+            "TEST_MODE": "remote",
+            "REMOTE_MAC_IP": "192.168.195.104",
+            "REMOTE_PORT": "9222",
+            "SERVICE_TYPE": "chrome",
+        },
+    },
+    "remote-selenium": {
+        "description": "Remote Selenium Grid configuration",
+        "env_vars": {
+            "TEST_MODE": "remote",
+            "REMOTE_MAC_IP": "192.168.195.104",
+            "REMOTE_PORT": "4444",
+            "SERVICE_TYPE": "selenium",
+        },
+    },
+    "headless": {
+        "description": "Headless local testing",
+        "env_vars": {"TEST_MODE": "local", "HEADLESS": "true"},
+    },
+}
+
+
+def parse_matrix(value: str) -> List[str]:
+    """'local,headless' -> ['local', 'headless']; неизвестные имена - ошибка"""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CONFIGURATIONS]
+    if unknown:
+        raise ValueError(f"Unknown configurations: {', '.join(unknown)} "
+                         f"(available: {', '.join(CONFIGURATIONS)})")
+    if len(set(names)) != len(names) or not names:
+        raise ValueError(f"Matrix must list distinct configurations, got '{value}'")
+    return names
@@ -5,7 +5,7 @@
 import subprocess
 import sys
 import argparse
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 
 # Добавляем корневую папку проекта в sys.path
@@ -15,6 +15,20 @@ sys.path.insert(0, str(project_root))
 from config.remote_config import RemoteConfig
 
 
+def get_remote_url(ip: str, service_type: str) -> str:
+    """Получить URL удаленного браузера с указанным IP (ip или ip:port)"""
+    if service_type == "chrome":
+        port = RemoteConfig.CHROME_DEBUG_PORT
+    elif service_type == "selenium":
+        port = RemoteConfig.SELENIUM_HUB_PORT
+    elif service_type == "chromedriver":
+        port = RemoteConfig.CHROMEDRIVER_PORT
+    else:
+        raise ValueError(f"Unknown service type: {service_type}")
+    address = ip if ":" in ip else f"{ip}:{port}"
+    return f"{'ws' if service_type == 'chrome' else 'http'}://{address}"
+
+
 def run_remote_tests(
     remote_ip: Optional[str] = None,
     test_file: Optional[str] = None,
@@ -27,18 +41,6 @@ def run_remote_tests(
     # Используем IP из конфигурации или переданный
     current_ip = remote_ip if remote_ip else RemoteConfig.REMOTE_MAC_IP
 
-    # Получаем URL удаленного браузера с нужным IP
-    def get_remote_url(ip: str, service_type: str) -> str:
-        """Получить URL удаленного браузера с указанным IP"""
-        if service_type == "chrome":
-            return f"ws://{ip}:{RemoteConfig.CHROME_DEBUG_PORT}"
-        elif service_type == "selenium":
-            return f"http://{ip}:{RemoteConfig.SELENIUM_HUB_PORT}"
-        elif service_type == "chromedriver":
-            return f"http://{ip}:{RemoteConfig.CHROMEDRIVER_PORT}"
-        else:
-            raise ValueError(f"Unknown service type: {service_type}")
-
     remote_url = get_remote_url(current_ip, service_type)
 
     # Формируем команду pytest
@@ -80,6 +82,38 @@ def run_remote_tests(
         return 1
 
 
+def run_distributed(
+    hosts: List[str],
+    test_file: Optional[str] = None,
+    service_type: str = "chrome",
+    verbose: bool = True,
+    history: Optional[str] = None,
+    report_dir: str = "reports/distributed",
+) -> int:
+    """Распределенный запуск: тесты делятся между удаленными хостами, по процессу pytest на хост"""
+    from tools.distributed_runner import DistributedRun
+    from tools.duration_history import history_key
+    from tools.sharding import shard_estimates
+
+    urls = {host: get_remote_url(host, service_type) for host in hosts}
+    pytest_args = ["-v" if verbose else "-q", "--tb=short"]
+    estimates = shard_estimates(history, history_key("remote", "chromium", None))
+
+    print(f"🚀 Распределенный запуск на {len(hosts)} удаленных хостах")
+    for host, url in urls.items():
+        print(f"📡 {host}: {url}")
+    print("=" * 50)
+
+    try:
+        return DistributedRun(urls, test_file or "tests/", pytest_args, report_dir, estimates).run()
+    except KeyboardInterrupt:
+        print("\n⚠️ Тестирование прервано пользователем")
+        return 1
+    except Exception as e:
+        print(f"❌ Ошибка при запуске тестов: {e}")
+        return 1
+
+
 def main() -> None:
     """Главная функция"""
     parser = argparse.ArgumentParser(
@@ -112,8 +146,35 @@ def main() -> None:
         "--quiet", action="store_true", help="Тихий режим (без verbose вывода)"
     )
 
+    parser.add_argument(
+        "--hosts",
+        help="Распределенный запуск: удаленные хосты через запятую (ip или ip:port)",
+    )
+
+    parser.add_argument(
+        "--history",
+        help="SQLite история длительностей для разбиения тестов между хостами",
+    )
+
+    parser.add_argument(
+        "--report-dir",
+        default="reports/distributed",
+        help="Каталог отчетов распределенного запуска (по умолчанию: reports/distributed)",
+    )
+
     args = parser.parse_args()
 
+    if args.hosts:
+        exit_code = run_distributed(
+            hosts=[host.strip() for host in args.hosts.split(",") if host.strip()],
+            test_file=args.test_file,
+            service_type=args.service_type,
+            verbose=not args.quiet,
+            history=args.history,
+            report_dir=args.report_dir,
+        )
+        sys.exit(exit_code)
+
     # Запускаем тесты
     exit_code = run_remote_tests(
         remote_ip=args.remote_ip,
@@ -3,18 +3,37 @@
 Простой тест для проверки удаленного подключения к Chrome через SSH туннель
 """
 import asyncio
-from playwright.async_api import async_playwright
+import os
+import sys
+from pathlib import Path
+from playwright.async_api import Error, async_playwright
+
+# Добавляем корневую директорию проекта в sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.cdp_resolver import CdpResolver
+
+# host:port туннеля к Chrome с --remote-debugging-port (guid определяется автоматически)
+CDP_ADDRESS = os.getenv("CDP_ADDRESS", "localhost:9223")
+
 
 async def test_remote_connection():
     """Тест удаленного подключения"""
-    ws_url = "ws://localhost:9223/devtools/browser/5388b816-d0d0-430e-9f51-365f47c85264"
-    
-    print(f"🔗 Connecting to: {ws_url}")
+    resolver = CdpResolver()
     
     try:
+        ws_url = resolver.resolve(CDP_ADDRESS)
+        print(f"🔗 Connecting to: {ws_url}")
+        
         async with async_playwright() as p:
             # Подключаемся к удаленному браузеру
-            browser = await p.chromium.connect_over_cdp(ws_url)
+            try:
+                browser = await p.chromium.connect_over_cdp(ws_url)
+            except Error:
+                # Браузер перезапущен - закэшированный guid устарел
+                ws_url = resolver.resolve(CDP_ADDRESS, refresh=True)
+                print(f"🔄 Browser restarted, reconnecting to: {ws_url}")
+                browser = await p.chromium.connect_over_cdp(ws_url)
             print("✅ Successfully connected to remote browser!")
             
             # Получаем информацию о браузере
@@ -3,6 +3,7 @@
 Скрипт для быстрого переключения между конфигурациями тестирования
 Аналог настроек java.test.config в VS Code
 """
+import copy
 import os
 import sys
 import json
@@ -13,6 +14,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from config.config_manager import ConfigManager
+from config.configurations import CONFIGURATIONS
 
 
 class TestConfigSwitcher:
@@ -22,39 +24,8 @@ class TestConfigSwitcher:
         self.config_manager = ConfigManager("config/test_config.json")
         self.vscode_settings_path = Path(".vscode/settings.json")
 
-        # Предустановленные конфигурации
-        self.configurations = {
-            "local": {
-                "description": "Local testing configuration",
-                "env_vars": {
-                    "TEST_MODE": "local",
-                    "BROWSER": "chromium",
-                    "HEADLESS": "false",
-                },
-            },
-            "remote": {
-                "description": "Remote testing configuration",
-                "env_vars": {
-                    "TEST_MODE": "remote",
-                    "REMOTE_MAC_IP": "192.168.195.104",
-                    "REMOTE_PORT": "9222",
-                    "SERVICE_TYPE": "chrome",
-                },
-            },
-            "remote-selenium": {
-                "description": "Remote Selenium Grid configuration",
-                "env_vars": {
-                    "TEST_MODE": "remote",
-                    "REMOTE_MAC_IP": "192.168.195.104",
-                    "REMOTE_PORT": "4444",
-                    "SERVICE_TYPE": "selenium",
-                },
-            },
-            "headless": {
-                "description": "Headless local testing",
-                "env_vars": {"TEST_MODE": "local", "HEADLESS": "true"},
-            },
-        }
+        # Предустановленные конфигурации (config/configurations.py)
+        self.configurations = copy.deepcopy(CONFIGURATIONS)
 
     def list_configurations(self):
         """Показать все доступные конфигурации"""
@@ -1,15 +1,40 @@
 import pytest
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import os
 import sys
+import time
 from pathlib import Path
-from playwright.sync_api import Browser, BrowserContext, Page
+from playwright.sync_api import Browser, BrowserContext, BrowserType, Page, sync_playwright
 
 # Добавляем корневую директорию проекта в sys.path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from config.config_manager import get_config
+from tools.browser_matrix import BrowserMatrixReport, parse_browsers
+from tools.browser_servers import (
+    endpoint_for_worker,
+    endpoints_from_env,
+    record_browser_startup,
+    worker_count,
+    worker_index,
+)
+from tools.cdp_resolver import CdpResolver, needs_discovery
+from tools.async_engine import AsyncEngine, AsyncSlot, ConcurrentScheduler
+from tools.auth_cache import StorageStateCache, login_via_http
+from tools.context_pool import ContextPool
+from tools.duration_history import DurationHistory, DurationScheduler, history_key
+from tools.endpoint_pool import Endpoint, EndpointPool, RemoteBrowserSession
+from tools.har_network import HAR_MATCH_MODES, NETWORK_MODES, HarStore
+from tools.local_target import LocalTargetServer
+from tools.perf_metrics import PerfMetricsCollector, PerformanceBudgets
+from tools.result_cache import ResultCache
+from tools.sharding import ShardSelector, parse_shard, shard_estimates
+from tools.span_tracer import SpanTracer
+from tools.test_daemon import warm_browsers
+from tools.virtual_clock import VirtualClock
+from tools.wait_auditor import WaitAuditor
+from tests.fixtures import AUTH_DATA
 
 
 def pytest_configure(config: pytest.Config) -> None:
@@ -24,6 +49,105 @@ def pytest_configure(config: pytest.Config) -> None:
     config.addinivalue_line("markers", "flaky: potentially unstable tests")
     config.addinivalue_line("markers", "auth: authentication related tests")
     config.addinivalue_line("markers", "ui: user interface tests")
+    config.addinivalue_line(
+        "markers", "isolated: always use a fresh BrowserContext (bypass context pool)"
+    )
+    config.addinivalue_line(
+        "markers", "virtual_time: fast-forward page timers via virtual_clock instead of sleeping"
+    )
+    config.addinivalue_line(
+        "markers", "concurrent: async test run as a coroutine alongside neighbouring concurrent tests"
+    )
+    config.pluginmanager.register(ConcurrentScheduler(), "concurrent_scheduler")
+
+    if _uses_endpoint_pool(config) and config.getoption("reruns", None) is None:
+        # Тест, на котором оборвался удаленный браузер, перезапускается на другом эндпоинте
+        config.option.reruns = 1
+        config.option.only_rerun = config.option.only_rerun or list(DISCONNECT_ERRORS)
+
+    if config.getoption("--browsers"):
+        # Матрица движков: pytest-playwright размножает тесты параметром browser_name
+        config.option.browser = parse_browsers(config.getoption("--browsers"))
+        config.pluginmanager.register(BrowserMatrixReport(config.option.browser), "browser_matrix")
+
+    if config.getoption("--audit-waits"):
+        auditor = WaitAuditor(
+            project_root,
+            config.getoption("--audit-waits-json"),
+            budget_ms=config.getoption("--wait-budget-ms"),
+        )
+        auditor.install()
+        config.pluginmanager.register(auditor, "wait_auditor")
+
+    if config.getoption("--trace-spans"):
+        tracer = SpanTracer(config.getoption("--trace-dir"))
+        tracer.install()
+        config.pluginmanager.register(tracer, "span_tracer")
+
+    if config.getoption("--perf-metrics"):
+        collector = PerfMetricsCollector(PerformanceBudgets(get_config().get_performance_budgets()))
+        collector.install()
+        config.pluginmanager.register(collector, "perf_metrics")
+
+    if config.getoption("--history"):
+        scheduler = DurationScheduler(DurationHistory(config.getoption("--history")), _history_key(config))
+        config.pluginmanager.register(scheduler, "duration_history")
+
+    if config.getoption("--shard"):
+        # Регистрируется после истории: trylast хуки плагинов вызываются в обратном порядке,
+        # поэтому сначала отбираются тесты шарда, затем они сортируются по длительности
+        index, total = parse_shard(config.getoption("--shard"))
+        estimates = shard_estimates(config.getoption("--history"), _history_key(config))
+        selector = ShardSelector(index, total, estimates, config.getoption("--shard-dir"))
+        config.pluginmanager.register(selector, "shard_selector")
+
+    if config.getoption("--result-cache"):
+        cache = ResultCache(
+            config.getoption("--result-cache"),
+            _result_cache_key(config),
+            project_root / "config" / "test_config.json",
+            build_id=config.getoption("--build-id"),
+            max_mb=config.getoption("--result-cache-max-mb"),
+        )
+        config.pluginmanager.register(cache, "result_cache")
+
+
+# Ошибки Playwright при обрыве соединения с удаленным браузером
+DISCONNECT_ERRORS = (
+    "Target page, context or browser has been closed",
+    "Browser has been closed",
+    "Connection closed",
+)
+
+
+def _uses_endpoint_pool(config: pytest.Config) -> bool:
+    """Удаленный режим с пулом эндпоинтов remote_settings.endpoints"""
+    if config.getoption("--remote-browser"):
+        return False
+    settings = get_config()
+    mode = config.getoption("--test-mode") or settings.get_test_mode()
+    return mode == "remote" and bool(settings.get_remote_endpoints())
+
+
+def _history_key(config: pytest.Config) -> str:
+    """Конфигурация прогона для истории длительностей: режим, браузер, headless"""
+    settings = get_config()
+    mode = config.getoption("--test-mode") or settings.get_test_mode()
+    browsers = config.getoption("--browser") or [settings.config["local_settings"].get("browser", "chromium")]
+    headless = None if mode == "remote" else settings.get_browser_launch_args().get("headless", False)
+    return history_key(mode, browsers[0], headless)
+
+
+def _result_cache_key(config: pytest.Config) -> str:
+    """Конфигурация прогона для кэша результатов: как у истории плюс сеть, цель и удаленный браузер
+
+    Прохождение на HAR replay или локальной замене the-internet не подтверждает живой прогон.
+    """
+    settings = get_config()
+    mode = config.getoption("--test-mode") or settings.get_test_mode()
+    remote_url = config.getoption("--remote-browser") or (settings.get_remote_url() if mode == "remote" else None)
+    target = "local-target" if config.getoption("--local-target") else "the-internet"
+    return f"{_history_key(config)}/{config.getoption('--network')}/{target}/{remote_url or 'local'}"
 
 
 @pytest.fixture(scope="session")
@@ -41,6 +165,32 @@ def browser_context_args(browser_context_args: Dict[str, Any]) -> Dict[str, Any]
 # base_url фикстура перенесена в fixtures.py
 
 
+def _is_xdist_worker(config: pytest.Config) -> bool:
+    """Запущен ли pytest как воркер pytest-xdist"""
+    return hasattr(config, "workerinput")
+
+
+def pytest_sessionstart(session: pytest.Session) -> None:
+    """Подготовка к записи HAR и поиск CDP эндпоинтов (только в главном процессе)"""
+    config = session.config
+    if not _is_xdist_worker(config):
+        # Все host:port разрешаются параллельно один раз, воркеры берут их из кэша
+        addresses = [address for address in _remote_addresses(config) if needs_discovery(address)]
+        if addresses:
+            cdp_resolver.resolve_many(addresses)
+    if config.getoption("--network") == "record" and not _is_xdist_worker(config):
+        HarStore(config.getoption("--har-dir")).clear_recordings()
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    """Сборка записанных HAR в архивы модулей после всех воркеров"""
+    config = session.config
+    if config.getoption("--network") == "record" and not _is_xdist_worker(config):
+        archives = HarStore(config.getoption("--har-dir")).merge_recordings()
+        for archive in archives:
+            print(f"\n📼 HAR saved: {archive}")
+
+
 def pytest_collection_modifyitems(config: pytest.Config, items: list) -> None:
     """Модификация собранных тестов - добавляем маркеры автоматически"""
     for item in items:
@@ -89,6 +239,167 @@ def pytest_addoption(parser):
         default=None,
         help="Режим тестирования: local или remote",
     )
+    parser.addoption(
+        "--context-pool",
+        action="store",
+        type=int,
+        default=0,
+        help="Размер пула теплых контекстов на воркер (0 - пул выключен)",
+    )
+    parser.addoption(
+        "--context-max-uses",
+        action="store",
+        type=int,
+        default=50,
+        help="Сколько тестов обслуживает контекст из пула до пересоздания",
+    )
+    parser.addoption(
+        "--auth-cache-ttl",
+        action="store",
+        type=float,
+        default=3600,
+        help="Время жизни кэша storage_state для auth тестов в секундах (0 - без кэша)",
+    )
+    parser.addoption(
+        "--auth-cache-dir",
+        action="store",
+        default=".auth_cache",
+        help="Каталог кэша storage_state",
+    )
+    parser.addoption(
+        "--network",
+        action="store",
+        choices=NETWORK_MODES,
+        default="live",
+        help="Сеть: live - реальная, record - запись HAR, replay - ответы из HAR",
+    )
+    parser.addoption(
+        "--har-match",
+        action="store",
+        choices=HAR_MATCH_MODES,
+        default="strict",
+        help="Режим replay: strict - неизвестные запросы обрываются, lenient - уходят в сеть",
+    )
+    parser.addoption(
+        "--har-dir",
+        action="store",
+        default="har",
+        help="Каталог HAR архивов (по одному на модуль тестов)",
+    )
+    parser.addoption(
+        "--local-target",
+        action="store_true",
+        default=False,
+        help="Тестировать локальную замену the-internet вместо herokuapp",
+    )
+    parser.addoption(
+        "--virtual-time",
+        action="store_true",
+        default=False,
+        help="Виртуальное время для всех тестов с фикстурой virtual_clock",
+    )
+    parser.addoption(
+        "--audit-waits",
+        action="store_true",
+        default=False,
+        help="Аудит ожиданий: sleep, wait_for_timeout, networkidle, expect",
+    )
+    parser.addoption(
+        "--audit-waits-json",
+        action="store",
+        default="reports/wait_audit.json",
+        help="Файл с результатами аудита ожиданий",
+    )
+    parser.addoption(
+        "--wait-budget-ms",
+        action="store",
+        type=float,
+        default=None,
+        help="Бюджет потерянного на ожидания времени, мс (превышение - прогон падает)",
+    )
+    parser.addoption(
+        "--trace-spans",
+        action="store_true",
+        default=False,
+        help="Спаны времени фикстур, навигаций, действий и expect в Chrome trace формате",
+    )
+    parser.addoption(
+        "--trace-dir",
+        action="store",
+        default="reports/traces",
+        help="Каталог файлов трассировки (trace-<worker>.json и объединенный trace.json)",
+    )
+    parser.addoption(
+        "--perf-metrics",
+        action="store_true",
+        default=False,
+        help="Метрики производительности после page.goto и проверка бюджетов performance_budgets",
+    )
+    parser.addoption(
+        "--history",
+        action="store",
+        default=None,
+        help="SQLite база истории длительностей: порядок тестов longest-first и отчет о makespan",
+    )
+    parser.addoption(
+        "--result-cache",
+        action="store",
+        default=None,
+        help="Каталог кэша результатов: тесты, прошедшие с тем же хэшем исходников и конфигурации, не выполняются",
+    )
+    parser.addoption(
+        "--build-id",
+        action="store",
+        default=None,
+        help="ID сборки тестируемого приложения (часть ключа кэша результатов)",
+    )
+    parser.addoption(
+        "--result-cache-max-mb",
+        action="store",
+        type=float,
+        default=64.0,
+        help="Размер кэша результатов, МБ (давно не использованные записи удаляются)",
+    )
+    parser.addoption(
+        "--async-concurrency",
+        action="store",
+        type=int,
+        default=8,
+        help="Сколько concurrent тестов одновременно выполняет async движок "
+        "(без xdist; воркер xdist выполняет их по одному)",
+    )
+    parser.addoption(
+        "--browsers",
+        action="store",
+        default=None,
+        help="Матрица движков через запятую (chromium,firefox,webkit): каждый тест на каждом движке; "
+        "concurrent тесты идут на всех движках одновременно, синхронные - движок за движком "
+        "(с -n N --dist loadgroup - каждый движок на своем воркере)",
+    )
+    parser.addoption(
+        "--shard",
+        action="store",
+        default=None,
+        help="Шард K/N: детерминированная часть тестов для одной из N машин",
+    )
+    parser.addoption(
+        "--shard-dir",
+        action="store",
+        default="reports/shards",
+        help="Каталог манифестов шардов (shard-K-of-N.json)",
+    )
+
+
+@pytest.fixture(scope="session")
+def playwright():
+    """Драйвер Playwright; в демоне (test_manager.py serve) - общий для всех прогонов"""
+    warm = warm_browsers()
+    if warm is not None:
+        yield warm.playwright
+        return
+    pw = sync_playwright().start()
+    yield pw
+    pw.stop()
 
 
 @pytest.fixture(scope="session")
@@ -115,50 +426,297 @@ def browser_type_launch_args(pytestconfig):
         # Подключение к удаленному браузеру будет через browser fixture
         return {}
     else:
-        # Для локального режима используем стандартные аргументы
-        local_settings = config.config["local_settings"]
-        return {
-            "headless": local_settings.get("headless", False),
-            "slow_mo": local_settings.get("slow_mo", 100),
-        }
+        # Для локального режима: local_settings с переопределением HEADLESS/SLOW_MO
+        # (переменные окружения конфигураций scripts/switch_config.py и run --matrix)
+        return config.get_browser_launch_args()
+
+
+# Кэш host:port -> ws://.../devtools/browser/<guid> общий для воркеров и запусков
+cdp_resolver = CdpResolver()
+
+
+def _connect_remote(browser_type: BrowserType, url: str) -> Browser:
+    """Подключение к удаленному браузеру: CDP для host:port и /devtools/ URL, иначе Playwright сервер"""
+    if needs_discovery(url):
+        return cdp_resolver.connect(url, browser_type.connect_over_cdp)
+    if url.startswith("ws://") and "/devtools/" in url:
+        return browser_type.connect_over_cdp(url)
+    return browser_type.connect(ws_endpoint=url)
+
+
+def _remote_addresses(config: pytest.Config) -> List[str]:
+    """Все адреса удаленных браузеров прогона: --remote-browser, remote_settings, пул эндпоинтов"""
+    settings = get_config()
+    addresses = [config.getoption("--remote-browser")]
+    if (config.getoption("--test-mode") or settings.get_test_mode()) == "remote":
+        addresses.append(settings.get_remote_url())
+        addresses.extend(endpoint["url"] for endpoint in settings.get_remote_endpoints())
+    return [address for address in addresses if address]
 
 
 @pytest.fixture(scope="session")
-def browser(browser_type, browser_type_launch_args, pytestconfig):
+def remote_browser_session(browser_type, pytestconfig):
+    """Удаленный браузер воркера из пула эндпоинтов (None без remote_settings.endpoints)"""
+    if not _uses_endpoint_pool(pytestconfig):
+        return None
+    config = get_config()
+    endpoints = [Endpoint(**endpoint) for endpoint in config.get_remote_endpoints()]
+    pool = EndpointPool(endpoints, **config.get_endpoint_probe_settings())
+    session = RemoteBrowserSession(
+        pool,
+        lambda url: _connect_remote(browser_type, url),
+        index=worker_index(),
+        workers=worker_count(),
+    )
+    print(f"   Connected to remote endpoint: {session.endpoint.url}")
+    return session
+
+
+@pytest.fixture(scope="session")
+def browser(browser_type, browser_type_launch_args, remote_browser_session, pytestconfig):
     """Кастомная фикстура браузера с поддержкой удаленного подключения"""
     # Проверяем командную строку и конфигурацию
     remote_url = pytestconfig.getoption("--remote-browser")
     config = get_config()
-
-    if remote_url:
+    shared_endpoints = endpoints_from_env()
+    warm = warm_browsers()
+    warm_launched = False
+    started = time.monotonic()
+
+    if remote_browser_session is not None:
+        # Пул удаленных браузеров: наименее загруженный здоровый эндпоинт
+        browser = remote_browser_session.browser
+    elif shared_endpoints and not (remote_url or config.is_remote_mode()):
+        # Общий browser-сервер, запущенный раннером (test_manager.py run --shared-browser)
+        endpoint = endpoint_for_worker(shared_endpoints)
+        print(f"   Connecting to shared browser server: {endpoint}")
+        browser = browser_type.connect(
+            ws_endpoint=endpoint,
+            slow_mo=browser_type_launch_args.get("slow_mo", 0),
+        )
+        record_browser_startup("shared", time.monotonic() - started)
+    elif remote_url:
         # Прямое указание URL удаленного браузера
         print(f"   Connecting to remote browser: {remote_url}")
-        # Для CDP подключения используем connect_over_cdp
-        if remote_url.startswith("ws://") and "/devtools/" in remote_url:
-            browser = browser_type.connect_over_cdp(remote_url)
-        else:
-            browser = browser_type.connect(ws_endpoint=remote_url)
+        browser = _connect_remote(browser_type, remote_url)
     elif config.is_remote_mode():
         # Используем конфигурацию для удаленного подключения
         remote_ws_url = config.get_remote_url()
         if remote_ws_url is None:
             raise ValueError("Remote URL is not configured")
         print(f"   Connecting to remote browser: {remote_ws_url}")
-        # Для CDP подключения используем connect_over_cdp
-        if remote_ws_url.startswith("ws://") and "/devtools/" in remote_ws_url:
-            browser = browser_type.connect_over_cdp(remote_ws_url)
-        else:
-            browser = browser_type.connect(ws_endpoint=remote_ws_url)
+        browser = _connect_remote(browser_type, remote_ws_url)
+    elif warm is not None:
+        # Демон: браузер запущен заранее и переживает прогон
+        browser = warm.browser(browser_type, browser_type_launch_args)
+        warm_launched = True
+        record_browser_startup("daemon", time.monotonic() - started)
     else:
         # Локальный режим - стандартный запуск
         browser = browser_type.launch(**browser_type_launch_args)
+        record_browser_startup("launch", time.monotonic() - started)
 
     yield browser
-    # Для удаленного браузера не закрываем browser
-    if not (remote_url or config.is_remote_mode()):
+    # Для удаленного браузера и браузера демона не закрываем browser
+    # (для общего сервера close() только отключает воркер)
+    if warm_launched:
+        # Контексты, которые тест не закрыл, не должны копиться в теплом браузере
+        for context in browser.contexts:
+            context.close()
+    elif not (remote_url or config.is_remote_mode()):
         browser.close()
 
 
+def _async_connect_url(pytestconfig) -> Optional[str]:
+    """Куда подключается async движок: тот же браузер, что и у синхронной фикстуры browser"""
+    remote_url = pytestconfig.getoption("--remote-browser")
+    config = get_config()
+    if remote_url:
+        return cdp_resolver.resolve(remote_url)
+    if config.is_remote_mode():
+        remote_ws_url = config.get_remote_url()
+        if remote_ws_url is None:
+            raise ValueError("Remote URL is not configured")
+        return cdp_resolver.resolve(remote_ws_url)
+    shared_endpoints = endpoints_from_env()
+    if shared_endpoints:
+        return endpoint_for_worker(shared_endpoints)
+    return None
+
+
+@pytest.fixture(scope="session")
+def async_engine(browser_type_launch_args, browser_context_args, har_store, pytestconfig):
+    """Async браузеры воркера для concurrent тестов: все движки --browsers, один поток с event loop"""
+    browsers = pytestconfig.option.browser or ["chromium"]
+    connect_url = _async_connect_url(pytestconfig)
+    if connect_url and len(browsers) > 1:
+        raise pytest.UsageError("Browser matrix runs local engines only, remote browser is a single engine")
+    engine = AsyncEngine(
+        browsers,
+        concurrency=pytestconfig.getoption("--async-concurrency"),
+        context_args=browser_context_args,
+        har_store=har_store,
+        network_mode=pytestconfig.getoption("--network"),
+        har_match=pytestconfig.getoption("--har-match"),
+    )
+    engine.start(browser_type_launch_args, connect_url=connect_url)
+    yield engine
+    engine.stop()
+
+
+@pytest.fixture(scope="session")
+def acontext(async_engine, browser_name):
+    """Собственный async BrowserContext concurrent теста (подставляется движком)"""
+    return AsyncSlot("context", browser_name)
+
+
+@pytest.fixture(scope="session")
+def apage(async_engine, browser_name):
+    """Async страница в собственном контексте concurrent теста (подставляется движком)"""
+    return AsyncSlot("page", browser_name)
+
+
+@pytest.fixture(scope="session")
+def local_target():
+    """Локальный сервер-замена the-internet на свободном порту"""
+    server = LocalTargetServer(get_config().get_local_target_settings())
+    server.start()
+    print(f"\n🏠 Local target: {server.url}")
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def performance_budgets():
+    """Бюджеты метрик производительности из config/test_config.json"""
+    return PerformanceBudgets(get_config().get_performance_budgets())
+
+
+@pytest.fixture(scope="session")
+def har_store(pytestconfig):
+    """Хранилище HAR архивов для --network=record|replay"""
+    return HarStore(pytestconfig.getoption("--har-dir"))
+
+
+@pytest.fixture(scope="session")
+def context_pool(browser, browser_context_args, pytestconfig):
+    """Пул теплых контекстов воркера (None, если пул выключен)"""
+    size = pytestconfig.getoption("--context-pool")
+    # Видео и трейсы пишутся только для контекстов pytest-playwright
+    artifacts_enabled = (
+        pytestconfig.getoption("--video") != "off"
+        or pytestconfig.getoption("--tracing") != "off"
+    )
+    if not size or artifacts_enabled:
+        yield None
+        return
+
+    pool = ContextPool(
+        browser,
+        browser_context_args,
+        size=size,
+        max_uses=pytestconfig.getoption("--context-max-uses"),
+    )
+    pool.warm_up()
+    yield pool
+    print(f"\n♻️  Context pool: {pool.created} created, {pool.recycled} recycled")
+    pool.close()
+
+
+@pytest.fixture(scope="session")
+def auth_storage_state(playwright, base_url, pytestconfig):
+    """Фабрика storage_state после логина: один логин на набор учетных данных"""
+    cache = StorageStateCache(
+        pytestconfig.getoption("--auth-cache-dir"),
+        ttl=pytestconfig.getoption("--auth-cache-ttl"),
+    )
+
+    def get_state(username: str, password: str):
+        if not base_url:
+            return None
+        if pytestconfig.getoption("--network") == "replay":
+            # Запрос логина идет мимо браузера и не попадает в HAR; при воспроизведении
+            # страницы /secure отдаются из архива, поэтому логин по сети не нужен
+            return None
+        key = cache.make_key(base_url, username, password)
+        return cache.get_or_create(
+            key,
+            lambda path: login_via_http(playwright, base_url, username, password, path),
+        )
+
+    return get_state
+
+
+@pytest.fixture
+def context(request, new_context, context_pool, har_store, pytestconfig,
+            browser, browser_context_args, remote_browser_session):
+    """Контекст теста: из пула или новый (маркеры auth, isolated, browser_context_args)"""
+    network_mode = pytestconfig.getoption("--network")
+    module = Path(str(request.node.fspath)).stem
+    context_kwargs = {}
+
+    auth_marker = request.node.get_closest_marker("auth")
+    if auth_marker and pytestconfig.getoption("--auth-cache-ttl") > 0:
+        # auth тесты стартуют с закэшированной сессией, учетные данные - аргументы маркера
+        credentials = auth_marker.args or AUTH_DATA
+        get_state = request.getfixturevalue("auth_storage_state")
+        context_kwargs["storage_state"] = get_state(*credentials)
+
+    if network_mode == "record":
+        # HAR пишется при создании контекста, поэтому пул не используется
+        context_kwargs.update(har_store.record_args(module, request.node.nodeid))
+
+    needs_fresh_context = (
+        context_kwargs
+        # Подмену таймеров нельзя снять с контекста, поэтому в пул он не возвращается
+        or "virtual_clock" in request.fixturenames
+        or request.node.get_closest_marker("isolated")
+        or request.node.get_closest_marker("browser_context_args")
+    )
+    pooled = None
+    remote_browser = remote_browser_session.current() if remote_browser_session is not None else None
+    failover_context = remote_browser is not None and remote_browser is not browser
+    if failover_context:
+        # Эндпоинт воркера оборвался - контекст создается на браузере другого эндпоинта
+        browser_context = remote_browser.new_context(**{**browser_context_args, **context_kwargs})
+    elif context_pool is None or needs_fresh_context:
+        browser_context = new_context(**context_kwargs)
+    else:
+        pooled = context_pool.acquire()
+        browser_context = pooled.context
+
+    if network_mode == "replay":
+        har_store.replay(browser_context, module, pytestconfig.getoption("--har-match"))
+
+    yield browser_context
+
+    if pooled is not None:
+        context_pool.release(pooled)
+    elif failover_context:
+        browser_context.close()
+
+
+@pytest.fixture
+def page(context, context_pool):
+    """Страница теста: теплая страница контекста из пула или новая"""
+    pooled = context_pool.lookup(context) if context_pool is not None else None
+    if pooled is not None:
+        return pooled.page
+    return context.new_page()
+
+
+@pytest.fixture
+def virtual_clock(page, request, pytestconfig):
+    """Часы теста: advance(ms) прокручивает таймеры страницы вместо реального ожидания"""
+    enabled = (
+        pytestconfig.getoption("--virtual-time")
+        or request.node.get_closest_marker("virtual_time") is not None
+    )
+    clock = VirtualClock(page, enabled)
+    clock.install()
+    return clock
+
+
 @pytest.fixture(scope="session")
 def context_args():
     """Аргументы для контекста браузера"""
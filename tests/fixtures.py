@@ -6,9 +6,16 @@ import pytest
 from playwright.sync_api import Page
 
 
+# Учетные данные для тестов аутентификации: username, password (валидные для the-internet)
+AUTH_DATA = ["tomsmith", "SuperSecretPassword!"]
+
+
 @pytest.fixture(scope="session")
-def base_url() -> str:
-    """Базовый URL для тестирования"""
+def base_url(pytestconfig: pytest.Config, request: pytest.FixtureRequest) -> str:
+    """Базовый URL для тестирования (локальный сервер при --local-target)"""
+    if pytestconfig.getoption("--local-target"):
+        url: str = request.getfixturevalue("local_target").url
+        return url
     return "https://the-internet.herokuapp.com/"
 
 
@@ -22,7 +29,7 @@ def test_data() -> Dict[str, Any]:
             "Checkboxes",
             "Form Authentication"
         ],
-        "auth_data": ["admin", "admin"],  # username, password
+        "auth_data": list(AUTH_DATA),  # username, password
         "expected_urls": {
             "A/B Testing": "/abtest",
             "Add/Remove Elements": "/add_remove_elements", 
@@ -5,7 +5,9 @@
 from typing import List, Generator
 import pytest
 from playwright.sync_api import Page, expect, BrowserContext, Browser
+from playwright.async_api import Page as AsyncPage, expect as async_expect
 from fixtures import base_url, test_data
+from tools.perf_metrics import PerformanceBudgets, expect_performance
 
 
 # ===============================
@@ -19,6 +21,17 @@ def test_homepage_loads(page: Page, base_url: str) -> None:
     expect(page).to_have_title("The Internet")
 
 
+@pytest.mark.smoke
+def test_homepage_performance(page: Page, base_url: str, performance_budgets: PerformanceBudgets,
+                              pytestconfig: pytest.Config) -> None:
+    """Smoke test - главная страница укладывается в бюджет performance_budgets"""
+    if not pytestconfig.getoption("--local-target"):
+        # Время загрузки публичного сайта зависит от сети, а не от тестируемого кода
+        pytest.skip("Performance budgets are checked against --local-target only")
+    page.goto(base_url)
+    expect_performance(page).within_budget(performance_budgets)
+
+
 @pytest.mark.regression
 def test_all_main_links_present(page: Page, base_url: str, test_data: dict) -> None:
     """Regression test - проверка всех основных ссылок"""
@@ -79,16 +92,11 @@ def test_basic_auth_navigation(page: Page, base_url: str) -> None:
     expect(page).not_to_have_url(base_url)
 
 
-def test_cross_browser_compatibility_manual(playwright) -> None:
-    """Кросс-браузерное тестирование (ручной запуск)"""
-    # Тестируем только chromium чтобы избежать конфликта с параметризацией playwright плагина
-    browser = playwright.chromium.launch()
-    page = browser.new_page()
-    
-    page.goto("https://the-internet.herokuapp.com")
-    expect(page).to_have_title("The Internet")
-    
-    browser.close()
+@pytest.mark.concurrent
+async def test_cross_browser_compatibility(apage: AsyncPage, base_url: str) -> None:
+    """Кросс-браузерное тестирование: с --browsers=chromium,firefox,webkit движки проверяются одновременно"""
+    await apage.goto(base_url)
+    await async_expect(apage).to_have_title("The Internet")
 
 
 # ===============================
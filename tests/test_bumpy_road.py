@@ -10,13 +10,17 @@ import time
 
 # Import fixtures to ensure they're available
 from tests.fixtures import base_url
+from tools.virtual_clock import VirtualClock
 
 
+@pytest.mark.virtual_time
 class TestBumpyRoadAhead:
     """Test class for Bumpy Road Ahead scenarios with multiple challenges"""
 
     @pytest.mark.smoke
-    def test_bumpy_road_with_2_bumps(self, page: Page, base_url: str) -> None:
+    def test_bumpy_road_with_2_bumps(
+        self, page: Page, base_url: str, virtual_clock: VirtualClock
+    ) -> None:
         """
         Test that navigates through a bumpy road with 2 specific challenges:
         Bump 1: Slow loading resources
@@ -33,7 +37,7 @@ class TestBumpyRoadAhead:
 
         # BUMP 2: Dynamic Content Challenge
         print("🚧 Bump 2: Handling dynamic content...")
-        self._handle_dynamic_content_bump(page, base_url)
+        self._handle_dynamic_content_bump(page, base_url, virtual_clock)
 
         print("✅ Successfully navigated through all 2 bumps!")
 
@@ -57,7 +61,9 @@ class TestBumpyRoadAhead:
             # Continue with the test even if this bump fails
             pass
 
-    def _handle_dynamic_content_bump(self, page: Page, base_url: str) -> None:
+    def _handle_dynamic_content_bump(
+        self, page: Page, base_url: str, clock: VirtualClock
+    ) -> None:
         """Handle the dynamic content bump - test adaptability to changing content"""
         try:
             # Navigate to dynamic content page
@@ -70,7 +76,7 @@ class TestBumpyRoadAhead:
             page.reload()
 
             # Wait for content to potentially change
-            page.wait_for_timeout(2000)  # 2 seconds
+            clock.advance(2000)  # 2 seconds
 
             # Verify the page still works with dynamic content
             content_elements = page.locator("[id='content'] div")
@@ -84,7 +90,9 @@ class TestBumpyRoadAhead:
             pass
 
     @pytest.mark.regression
-    def test_bumpy_road_comprehensive(self, page: Page, base_url: str) -> None:
+    def test_bumpy_road_comprehensive(
+        self, page: Page, base_url: str, virtual_clock: VirtualClock
+    ) -> None:
         """
         Comprehensive bumpy road test with multiple types of challenges
         """
@@ -112,7 +120,7 @@ class TestBumpyRoadAhead:
                 expect(page).to_have_url(f"{base_url.rstrip('/')}{challenge_path}")
 
                 # Wait a bit to ensure page loads
-                page.wait_for_timeout(1000)
+                virtual_clock.advance(1000)
 
                 # Try to find any content on the page
                 page_content = page.locator("body")
@@ -128,7 +136,7 @@ class TestBumpyRoadAhead:
             # Return to main page for next challenge
             try:
                 page.goto(base_url)
-                page.wait_for_timeout(500)
+                virtual_clock.advance(500)
             except:
                 pass
 
@@ -143,7 +151,9 @@ class TestBumpyRoadAhead:
         ), f"Success rate {success_rate:.2%} below 60% threshold"
 
     @pytest.mark.slow
-    def test_bumpy_road_with_retries(self, page: Page, base_url: str) -> None:
+    def test_bumpy_road_with_retries(
+        self, page: Page, base_url: str, virtual_clock: VirtualClock
+    ) -> None:
         """
         Test bumpy road navigation with retry mechanism for handling flaky scenarios
         """
@@ -154,12 +164,12 @@ class TestBumpyRoadAhead:
             {
                 "name": "Entry Ad",
                 "path": "/entry_ad",
-                "action": lambda p: self._handle_entry_ad(p),
+                "action": lambda p: self._handle_entry_ad(p, virtual_clock),
             },
             {
                 "name": "Exit Intent",
                 "path": "/exit_intent",
-                "action": lambda p: self._handle_exit_intent(p),
+                "action": lambda p: self._handle_exit_intent(p, virtual_clock),
             },
         ]
 
@@ -189,15 +199,15 @@ class TestBumpyRoadAhead:
                     print(f"   ⚠️  Attempt {attempt + 1} failed: {str(e)}")
                     if attempt < max_retries - 1:
                         print("   🔄 Retrying...")
-                        page.wait_for_timeout(1000)  # Wait before retry
+                        virtual_clock.advance(1000)  # Wait before retry
 
             if not success:
                 print(f"   ❌ {scenario['name']} failed after {max_retries} attempts")
 
-    def _handle_entry_ad(self, page: Page) -> None:
+    def _handle_entry_ad(self, page: Page, clock: VirtualClock) -> None:
         """Handle entry ad scenario"""
         # Wait for page to load
-        page.wait_for_timeout(2000)
+        clock.advance(2000)
 
         # Try to close any modal that might appear
         try:
@@ -210,15 +220,15 @@ class TestBumpyRoadAhead:
         # Verify we can interact with the page
         expect(page.locator("body")).to_be_visible()
 
-    def _handle_exit_intent(self, page: Page) -> None:
+    def _handle_exit_intent(self, page: Page, clock: VirtualClock) -> None:
         """Handle exit intent scenario"""
         # Wait for page to load
-        page.wait_for_timeout(1000)
+        clock.advance(1000)
 
         # Simulate mouse movement to trigger exit intent
         try:
             page.mouse.move(0, 0)  # Move to top-left corner
-            page.wait_for_timeout(500)
+            clock.advance(500)
         except:
             pass
 
@@ -0,0 +1,52 @@
+"""
+Независимые async тесты, выполняемые async движком одновременно
+Каждый тест получает собственный контекст и страницу (apage, acontext),
+число одновременных тестов ограничивает --async-concurrency
+"""
+import asyncio
+
+import pytest
+from playwright.async_api import Page, BrowserContext, expect
+from fixtures import base_url
+
+
+PAGES = [
+    ("abtest", "A/B Test"),
+    ("checkboxes", "Checkboxes"),
+    ("dropdown", "Dropdown List"),
+    ("login", "Login Page"),
+    ("dynamic_loading", "Dynamically Loaded Page Elements"),
+    ("inputs", "Inputs"),
+]
+
+
+@pytest.mark.concurrent
+@pytest.mark.parametrize("path,heading", PAGES)
+async def test_page_heading(apage: Page, base_url: str, path: str, heading: str) -> None:
+    """Заголовок страницы (все страницы проверяются параллельно)"""
+    await apage.goto(f"{base_url.rstrip('/')}/{path}")
+    await expect(apage.get_by_role("heading", name=heading)).to_be_visible()
+
+
+@pytest.mark.concurrent
+async def test_checkboxes_toggle(apage: Page, base_url: str) -> None:
+    """Переключение чекбокса в собственном контексте"""
+    await apage.goto(f"{base_url.rstrip('/')}/checkboxes")
+    checkbox = apage.locator("#checkboxes input").first
+    await checkbox.check()
+    await expect(checkbox).to_be_checked()
+
+
+@pytest.mark.concurrent
+@pytest.mark.parametrize("owner", ["first", "second", "third"])
+async def test_isolated_cookies(acontext: BrowserContext, base_url: str, owner: str) -> None:
+    """Куки concurrent теста не видны копиям теста, идущим одновременно в той же пачке"""
+    assert await acontext.cookies() == []
+    page = await acontext.new_page()
+    await page.goto(base_url)
+    # Все копии ставят куку с одним именем и ждут, пока это сделают соседние:
+    # в общем хранилище кук они перетерли бы друг друга
+    await acontext.add_cookies([{"name": "owner", "value": owner, "url": base_url}])
+    await asyncio.sleep(0.5)
+    await page.reload()
+    assert await page.evaluate("document.cookie") == f"owner={owner}"
@@ -1,14 +1,15 @@
 from typing import List
 import pytest
 from playwright.sync_api import Page, expect
+from fixtures import base_url
 
-def test_open_the_internet_website(page: Page) -> None:
+def test_open_the_internet_website(page: Page, base_url: str) -> None:
     """
     Simple test that opens the-internet.herokuapp.com website
     and verifies that the page loads correctly
     """
     # Navigate to the website
-    page.goto("https://the-internet.herokuapp.com")
+    page.goto(base_url)
     
     # Verify the page title contains "The Internet"
     expect(page).to_have_title("The Internet")
@@ -23,12 +24,12 @@ def test_open_the_internet_website(page: Page) -> None:
     expect(page.get_by_role("link", name="A/B Testing")).to_be_visible()
 
 
-def test_check_page_elements(page: Page) -> None:
+def test_check_page_elements(page: Page, base_url: str) -> None:
     """
     Test that checks specific elements on the-internet homepage
     """
     # Navigate to the website
-    page.goto("https://the-internet.herokuapp.com")
+    page.goto(base_url)
     
     # Check that GitHub link is present (may be hidden, so check if it exists)
     expect(page.get_by_role("link", name="Fork me on GitHub")).to_be_attached()
@@ -49,18 +50,18 @@ def test_check_page_elements(page: Page) -> None:
     expect(page.locator("text=Powered by Elemental Selenium")).to_be_visible()
 
 
-def test_navigate_to_ab_testing_page(page: Page) -> None:
+def test_navigate_to_ab_testing_page(page: Page, base_url: str) -> None:
     """
     Test that navigates to A/B Testing page to verify functionality
     """
     # Navigate to the main website
-    page.goto("https://the-internet.herokuapp.com")
+    page.goto(base_url)
     
     # Click on A/B Testing link
     page.get_by_role("link", name="A/B Testing").click()
     
     # Verify we're on the A/B Testing page
-    expect(page).to_have_url("https://the-internet.herokuapp.com/abtest")
+    expect(page).to_have_url(f"{base_url.rstrip('/')}/abtest")
     
     # Verify the heading contains "A/B Test"
     heading = page.get_by_role("heading")
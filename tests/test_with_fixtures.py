@@ -2,6 +2,7 @@
 Демонстрация использования разделенных фикстур
 Показывает различные способы использования фикстур из fixtures.py
 """
+import re
 from typing import Dict, Any
 import pytest
 from playwright.sync_api import Page, expect
@@ -33,7 +34,9 @@ def test_using_navigation_helper(navigation_helper, test_data: Dict[str, Any]) -
 
 
 @pytest.mark.regression
-def test_using_element_checker(page_with_base_url: Page, element_checker, test_data: Dict[str, Any]) -> None:
+def test_using_element_checker(
+    page_with_base_url: Page, element_checker, test_data: Dict[str, Any], base_url: str
+) -> None:
     """
     Демонстрация использования element_checker фикстуры
     """
@@ -41,7 +44,7 @@ def test_using_element_checker(page_with_base_url: Page, element_checker, test_d
     element_checker.check_page_title("The Internet")
     
     # Проверяем что URL содержит правильный домен
-    assert "the-internet.herokuapp.com" in page_with_base_url.url
+    assert page_with_base_url.url.startswith(base_url)
     
     # Проверяем видимость основных ссылок
     main_links = test_data["main_links"][:3]  # Берем первые 3 ссылки
@@ -124,31 +127,20 @@ class TestFixturesIntegration:
     ) -> None:
         """
         Тест workflow аутентификации с использованием фикстур
+        auth тест стартует с закэшированной сессией (storage_state из auth_storage_state)
         """
-        # Переходим к странице аутентификации
-        navigation_helper.go_to_link("Form Authentication")
-        
         page = navigation_helper.page
-        
-        # Заполняем форму используя данные из test_data
-        username, password = test_data["auth_data"]
-        page.get_by_label("Username").fill(username)
-        page.get_by_label("Password").fill(password)
-        
-        # Нажимаем Login
-        page.get_by_role("button", name="Login").click()
-        
-        # Ждем навигации или сообщения об ошибке
-        page.wait_for_load_state("networkidle")
-        
-        # Проверяем результат (может быть успех или неудача)
-        if "/secure" in page.url:
-            # Успешный логин
-            expect(page.get_by_text("Welcome to the Secure Area")).to_be_visible()
-        else:
-            # Проверяем что остались на странице логина с сообщением об ошибке
-            assert "/login" in page.url
-            # Это нормально для демо-сайта с невалидными учетными данными
+        page.goto(f"{navigation_helper.base_url.rstrip('/')}/secure")
+
+        if "/login" in page.url:
+            # Кэш сессии выключен (--auth-cache-ttl=0) - логинимся через форму
+            username, password = test_data["auth_data"]
+            page.get_by_label("Username").fill(username)
+            page.get_by_label("Password").fill(password)
+            page.get_by_role("button", name="Login").click()
+
+        expect(page).to_have_url(re.compile(r"/secure$"))
+        expect(page.get_by_text("Welcome to the Secure Area")).to_be_visible()
 
 
 @pytest.mark.slow
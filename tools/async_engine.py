@@ -0,0 +1,258 @@
+"""
+Асинхронный движок: независимые тесты с маркером concurrent выполняются
+корутинами в одном воркере, каждая со своим BrowserContext
+Playwright async API работает в отдельном потоке со своим event loop, pytest
+по-прежнему проходит тесты по одному, а тело теста лишь забирает результат
+корутины, запущенной заранее вместе с соседними тестами пачки
+"""
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, TypeGuard
+
+import pytest
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+
+from tools.har_network import HarStore
+
+
+# Параметр pytest-playwright, которым тесты размножаются по браузерам
+BROWSER_PARAM = "browser_name"
+
+
+class AsyncSlot:
+    """Заглушка синхронной фикстуры: движок подставляет вместо нее объект async API"""
+
+    def __init__(self, kind: str, browser_name: str):
+        self.kind = kind
+        self.browser_name = browser_name
+
+    def __repr__(self) -> str:
+        return f"<async {self.kind} ({self.browser_name})>"
+
+
+# Фикстуры-заглушки: имя фикстуры -> что подставляет движок
+SLOT_FIXTURES = {"apage": "page", "acontext": "context"}
+
+
+class AsyncEngine:
+    """Браузеры async API в фоновом потоке и ограничение числа одновременных тестов"""
+
+    def __init__(self, browser_names: List[str], concurrency: int, context_args: Optional[Dict[str, Any]] = None,
+                 har_store: Optional[HarStore] = None, network_mode: str = "live", har_match: str = "strict"):
+        self.browser_names = browser_names
+        self.concurrency = concurrency
+        self.context_args = context_args or {}
+        # --network=record|replay: контексты тестов пишут и воспроизводят HAR так же, как синхронные
+        self.har_store = har_store
+        self.network_mode = network_mode
+        self.har_match = har_match
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-engine", daemon=True)
+        self._playwright: Optional[Playwright] = None
+        self._browsers: Dict[str, Browser] = {}
+        # С Python 3.10 семафор не привязывается к event loop при создании
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    # ---------- жизненный цикл ----------
+
+    def start(self, launch_args: Optional[Dict[str, Any]] = None, connect_url: Optional[str] = None) -> None:
+        """Запустить поток и все браузеры: launch, либо подключение к удаленному/общему браузеру"""
+        self._thread.start()
+        self.call(self._start(launch_args or {}, connect_url))
+
+    async def _start(self, launch_args: Dict[str, Any], connect_url: Optional[str]) -> None:
+        self._playwright = await async_playwright().start()
+        # Все движки матрицы запускаются один раз на воркер и одновременно
+        browsers = await asyncio.gather(
+            *(self._launch(name, launch_args, connect_url) for name in self.browser_names)
+        )
+        self._browsers = dict(zip(self.browser_names, browsers))
+
+    async def _launch(self, browser_name: str, launch_args: Dict[str, Any], connect_url: Optional[str]) -> Browser:
+        browser_type = getattr(self._playwright, browser_name)
+        browser: Browser
+        if connect_url is None:
+            browser = await browser_type.launch(**launch_args)
+        elif connect_url.startswith("ws://") and "/devtools/" in connect_url:
+            browser = await browser_type.connect_over_cdp(connect_url)
+        else:
+            browser = await browser_type.connect(ws_endpoint=connect_url)
+        return browser
+
+    def stop(self) -> None:
+        """Закрыть браузер и остановить поток"""
+        if self._thread.is_alive():
+            self.call(self._stop())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+        self.loop.close()
+
+    async def _stop(self) -> None:
+        for browser in self._browsers.values():
+            await browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def call(self, coro: Coroutine) -> Any:
+        """Выполнить корутину в потоке движка и дождаться результата"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    # ---------- выполнение тестов ----------
+
+    def submit(self, test_fn: Callable[..., Coroutine], kwargs: Dict[str, Any],
+               module: str = "", nodeid: str = "") -> Future:
+        """Запланировать тест; AsyncSlot аргументы заменяются его контекстом и страницей
+
+        module и nodeid теста нужны для записи и воспроизведения HAR.
+        Результат future - длительность самого теста в секундах (без ожидания очереди).
+        """
+        return asyncio.run_coroutine_threadsafe(self._run_test(test_fn, kwargs, module, nodeid), self.loop)
+
+    async def _new_context(self, browser_name: str, module: str, nodeid: str) -> BrowserContext:
+        context_args = dict(self.context_args)
+        if self.har_store is not None and self.network_mode == "record":
+            context_args.update(self.har_store.record_args(module, nodeid))
+        context = await self._browsers[browser_name].new_context(**context_args)
+        if self.har_store is not None and self.network_mode == "replay":
+            archive, replay_args = self.har_store.replay_args(module, self.har_match)
+            await context.route_from_har(archive, **replay_args)
+        return context
+
+    async def _run_test(self, test_fn: Callable[..., Coroutine], kwargs: Dict[str, Any],
+                        module: str, nodeid: str) -> float:
+        slots = [value for value in kwargs.values() if isinstance(value, AsyncSlot)]
+        browser_name = slots[0].browser_name if slots else self.browser_names[0]
+        async with self._semaphore:
+            started = time.monotonic()
+            context = await self._new_context(browser_name, module, nodeid)
+            try:
+                page = await context.new_page() if any(slot.kind == "page" for slot in slots) else None
+                resolved = {
+                    name: (page if value.kind == "page" else context) if isinstance(value, AsyncSlot) else value
+                    for name, value in kwargs.items()
+                }
+                await test_fn(**resolved)
+            finally:
+                await context.close()
+            return time.monotonic() - started
+
+
+class ConcurrentScheduler:
+    """Плагин pytest: пачки соседних concurrent тестов запускаются в AsyncEngine разом"""
+
+    def __init__(self, fixture_name: str = "async_engine"):
+        self.fixture_name = fixture_name
+        self.futures: Dict[str, Future] = {}
+
+    @staticmethod
+    def is_concurrent(item: pytest.Item) -> TypeGuard[pytest.Function]:
+        return (
+            isinstance(item, pytest.Function)
+            and item.get_closest_marker("concurrent") is not None
+            and inspect.iscoroutinefunction(item.obj)
+        )
+
+    @staticmethod
+    def can_prefetch(item: pytest.Function) -> bool:
+        """Тест можно запустить до его setup: без skip маркеров, аргументы - параметры и session фикстуры"""
+        if item.get_closest_marker("skip") or item.get_closest_marker("skipif"):
+            return False
+        params = item.callspec.params if hasattr(item, "callspec") else {}
+        for name in _test_arguments(item):
+            if name in params:
+                continue
+            fixturedefs = item._fixtureinfo.name2fixturedefs.get(name)
+            if not fixturedefs or fixturedefs[-1].scope != "session":
+                return False
+        return True
+
+    def batch_from(self, item: pytest.Function) -> List[pytest.Function]:
+        """Пачка: этот тест, следующие за ним подряд concurrent тесты и их копии для других браузеров
+
+        pytest группирует тесты по браузеру (session параметр), поэтому копии теста
+        для firefox и webkit ищутся по всему прогону - движки проверяются одновременно.
+        Воркер xdist не знает, какие тесты достанутся ему, а session.items содержит
+        весь прогон, поэтому там тесты не запускаются заранее (параллелят воркеры).
+        """
+        if hasattr(item.config, "workerinput"):
+            return [item]
+        items = item.session.items
+        batch = [item]
+        for candidate in items[items.index(item) + 1:]:
+            if not self.is_concurrent(candidate):
+                break
+            if candidate.nodeid in self.futures or not self.can_prefetch(candidate):
+                continue
+            batch.append(candidate)
+
+        cases = {matrix_case(member) for member in batch}
+        scheduled = {member.nodeid for member in batch}
+        for candidate in items:
+            if (
+                candidate.nodeid not in scheduled
+                and candidate.nodeid not in self.futures
+                and self.is_concurrent(candidate)
+                and matrix_case(candidate) in cases
+                and self.can_prefetch(candidate)
+            ):
+                batch.append(candidate)
+        return batch
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(self, pyfuncitem: pytest.Function) -> Optional[bool]:
+        if not self.is_concurrent(pyfuncitem):
+            return None
+
+        future = self.futures.pop(pyfuncitem.nodeid, None)
+        if future is None:
+            # Тест может не запрашивать apage/acontext - движок берется из фикстуры напрямую
+            engine = pyfuncitem._request.getfixturevalue(self.fixture_name)
+            assert isinstance(engine, AsyncEngine), f"{self.fixture_name} must be an AsyncEngine"
+            for item in self.batch_from(pyfuncitem):
+                if item is pyfuncitem:
+                    kwargs = {name: pyfuncitem.funcargs[name] for name in _test_arguments(item)}
+                else:
+                    # Session фикстуры уже готовы (или создаются здесь же) - тест стартует заранее
+                    kwargs = {name: _prefetch_argument(item, name) for name in _test_arguments(item)}
+                module = Path(str(item.fspath)).stem
+                self.futures[item.nodeid] = engine.submit(item.obj, kwargs, module, item.nodeid)
+            future = self.futures.pop(pyfuncitem.nodeid)
+
+        # Собственное время теста, без ожидания своей очереди в пачке
+        pyfuncitem.user_properties.append(("engine_duration", future.result()))
+        return True
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        # Прогон прерван (-x, Ctrl+C) - заранее запущенные тесты не нужны
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+
+def _test_arguments(item: pytest.Function) -> List[str]:
+    """Аргументы тестовой функции (без self и autouse фикстур)"""
+    return [name for name in inspect.signature(item.obj).parameters if name in item._fixtureinfo.argnames]
+
+
+def _prefetch_argument(item: pytest.Function, name: str) -> Any:
+    """Значение аргумента теста до его setup: параметр parametrize или session фикстура"""
+    params = item.callspec.params if hasattr(item, "callspec") else {}
+    if name in params:
+        return params[name]
+    if name in SLOT_FIXTURES:
+        # Не через getfixturevalue: смена session параметра browser_name
+        # закрыла бы синхронный браузер текущей группы тестов
+        return AsyncSlot(SLOT_FIXTURES[name], str(params.get(BROWSER_PARAM, "chromium")))
+    return item._request.getfixturevalue(name)
+
+
+def matrix_case(item: pytest.Function) -> Tuple[str, str]:
+    """Тест без учета браузера: копии одного случая для разных движков совпадают"""
+    params = item.callspec.params if hasattr(item, "callspec") else {}
+    other = tuple(sorted((name, repr(value)) for name, value in params.items() if name != BROWSER_PARAM))
+    parent = item.parent.nodeid if item.parent is not None else ""
+    return f"{parent}::{item.originalname}", repr(other)
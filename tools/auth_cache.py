@@ -0,0 +1,109 @@
+"""
+Кэш storage_state после логина: один логин на набор учетных данных
+Безопасен для параллельных воркеров - логин выполняет только один из них
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlparse
+
+from playwright.sync_api import Playwright
+
+
+SESSION_COOKIE = "rack.session"
+
+
+class StorageStateCache:
+    """Файловый кэш storage_state с TTL и межпроцессной блокировкой"""
+
+    def __init__(self, cache_dir: str = ".auth_cache", ttl: float = 3600, lock_timeout: float = 60):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(base_url: str, username: str, password: str) -> str:
+        """Ключ кэша по base_url и учетным данным (пароль в имя файла не попадает)"""
+        raw = f"{base_url.rstrip('/')}\0{username}\0{password}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def path_for(self, key: str) -> Path:
+        """Путь к файлу storage_state для ключа"""
+        return self.cache_dir / f"{key}.json"
+
+    def is_fresh(self, path: Path) -> bool:
+        """Файл существует и моложе TTL"""
+        try:
+            return time.time() - path.stat().st_mtime < self.ttl
+        except FileNotFoundError:
+            return False
+
+    def get_or_create(self, key: str, create: Callable[[Path], None]) -> Path:
+        """Вернуть свежий storage_state, при необходимости создав его через `create`"""
+        path = self.path_for(key)
+        if self.is_fresh(path):
+            return path
+
+        lock_path = path.with_suffix(".lock")
+        deadline = time.monotonic() + self.lock_timeout
+
+        while True:
+            if self._try_lock(lock_path):
+                try:
+                    # Другой воркер мог успеть создать файл, пока мы ждали
+                    if not self.is_fresh(path):
+                        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                        create(tmp_path)
+                        os.replace(tmp_path, path)
+                    return path
+                finally:
+                    lock_path.unlink(missing_ok=True)
+
+            if self.is_fresh(path):
+                return path
+            self._break_stale_lock(lock_path)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for auth state: {path}")
+            time.sleep(0.1)
+
+    def _try_lock(self, lock_path: Path) -> bool:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+
+    def _break_stale_lock(self, lock_path: Path) -> None:
+        """Снять блокировку, оставшуюся от упавшего воркера"""
+        try:
+            if time.time() - lock_path.stat().st_mtime > self.lock_timeout:
+                lock_path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+
+
+def login_via_http(
+    playwright: Playwright, base_url: str, username: str, password: str, path: Path
+) -> None:
+    """Логин через форму /authenticate без браузера, сохранение storage_state"""
+    request_context = playwright.request.new_context(base_url=base_url, ignore_https_errors=True)
+    try:
+        response = request_context.post(
+            "authenticate", form={"username": username, "password": password}
+        )
+        if not response.ok:
+            raise RuntimeError(f"Login request failed: {response.status} {response.url}")
+        # При неверных учетных данных сайт отвечает 200 со страницей логина,
+        # поэтому успех - это редирект на /secure и выданная сессионная cookie
+        state = request_context.storage_state()
+        has_session = any(cookie["name"] == SESSION_COOKIE for cookie in state["cookies"])
+        if urlparse(response.url).path.rstrip("/") != "/secure" or not has_session:
+            raise RuntimeError(f"Login failed for '{username}': ended at {response.url}")
+        request_context.storage_state(path=str(path))
+    finally:
+        request_context.dispose()
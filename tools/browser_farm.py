@@ -0,0 +1,356 @@
+"""
+Ферма браузеров для ChromeProxy: N headless Chrome на одной машине за одним портом
+Прокси сам запускает и перезапускает процессы Chrome, отдает каждое новое
+подключение наименее загруженному экземпляру и объединяет /json/* API всех
+экземпляров. Экземпляр перезапускается после заданного числа сессий или при
+превышении порога памяти - когда на нем не осталось активных подключений
+"""
+import asyncio
+import json
+import shutil
+import socket
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+try:
+    import psutil
+except ImportError:  # psutil нужен только для порога памяти
+    psutil = None
+
+
+CHROME_ARGS = [
+    "--headless=new",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-dev-shm-usage",
+    "--remote-debugging-address=127.0.0.1",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+async def default_executable() -> str:
+    """Chromium, установленный Playwright (`playwright install chromium`)"""
+    from playwright.async_api import async_playwright
+
+    playwright = await async_playwright().start()
+    try:
+        return playwright.chromium.executable_path
+    finally:
+        await playwright.stop()
+
+
+class ChromeInstance:
+    """Процесс Chrome фермы, его нагрузка и счетчик обслуженных сессий"""
+
+    def __init__(self, index: int, executable: str, extra_args: List[str]):
+        self.index = index
+        self.executable = executable
+        self.extra_args = extra_args
+        self.port = 0
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.user_data_dir: Optional[str] = None
+        self.version: Dict[str, Any] = {}
+        self.ready = False
+        self.draining = False
+        self.active = 0
+        self.sessions = 0
+        self.restarts = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def browser_ws_url(self) -> str:
+        return str(self.version["webSocketDebuggerUrl"])
+
+    async def start(self, session: aiohttp.ClientSession, timeout: float) -> None:
+        """Запустить Chrome и дождаться ответа /json/version"""
+        self.port = free_port()
+        self.user_data_dir = tempfile.mkdtemp(prefix=f"chrome-farm-{self.index}-")
+        self.process = await asyncio.create_subprocess_exec(
+            self.executable,
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.user_data_dir}",
+            *CHROME_ARGS,
+            *self.extra_args,
+            "about:blank",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.returncode is not None:
+                break
+            try:
+                async with session.get(f"{self.base_url}/json/version") as response:
+                    self.version = await response.json(content_type=None)
+                self.ready = True
+                self.draining = False
+                self.sessions = 0
+                return
+            except (aiohttp.ClientError, ValueError):
+                await asyncio.sleep(0.1)
+        await self.stop()
+        raise RuntimeError(f"Chrome #{self.index} did not start in {timeout}s (exit code: {self.process.returncode})")
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+
+    def rss(self) -> Optional[int]:
+        """Суммарный RSS Chrome и его дочерних процессов (рендереры, GPU)"""
+        if psutil is None or self.process is None:
+            return None
+        try:
+            root = psutil.Process(self.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    @property
+    def alive(self) -> bool:
+        return self.ready and self.process is not None and self.process.returncode is None
+
+
+class BrowserFarm:
+    """Процессы Chrome, выбор экземпляра для подключения и общий /json API"""
+
+    def __init__(self, size: int, executable: Optional[str] = None, max_sessions: int = 50,
+                 max_rss_mb: Optional[int] = None, chrome_args: Optional[List[str]] = None,
+                 check_interval: float = 5.0, startup_timeout: float = 30.0):
+        self.size = size
+        self.executable = executable
+        self.max_sessions = max_sessions
+        self.max_rss_mb = max_rss_mb
+        self.chrome_args = chrome_args or []
+        self.check_interval = check_interval
+        self.startup_timeout = startup_timeout
+        self.instances: List[ChromeInstance] = []
+        # targetId вкладки -> экземпляр, где она открыта (для /devtools/page/ и /json/close)
+        self.target_owners: Dict[str, ChromeInstance] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._restarting: Dict[int, asyncio.Task] = {}
+
+    # ---------- жизненный цикл ----------
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """HTTP сессия для /json API экземпляров (задается в start)"""
+        if self._session is None:
+            raise RuntimeError("Browser farm is not started")
+        return self._session
+
+    async def start(self, session: aiohttp.ClientSession) -> None:
+        """Запустить все экземпляры одновременно и наблюдение за ними"""
+        self._session = session
+        if self.max_rss_mb and psutil is None:
+            print("⚠️ psutil is not installed, memory threshold is ignored")
+        executable = self.executable or await default_executable()
+        self.instances = [ChromeInstance(index, executable, self.chrome_args) for index in range(self.size)]
+        await asyncio.gather(*(instance.start(session, self.startup_timeout) for instance in self.instances))
+        self._supervisor = asyncio.create_task(self._supervise())
+        print(f"🏭 Browser farm: {self.size} Chrome instance(s) on ports "
+              f"{', '.join(str(instance.port) for instance in self.instances)}")
+
+    async def stop(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        for task in self._restarting.values():
+            task.cancel()
+        await asyncio.gather(*(instance.stop() for instance in self.instances))
+
+    async def _supervise(self) -> None:
+        """Перезапуск упавших экземпляров и проверка порога памяти"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for instance in self.instances:
+                if instance.index in self._restarting:
+                    continue
+                if instance.process is not None and instance.process.returncode is not None:
+                    self.recycle(instance, f"exited with code {instance.process.returncode}")
+                    continue
+                rss = instance.rss()
+                if self.max_rss_mb and rss is not None and rss > self.max_rss_mb * 1024 * 1024:
+                    self.retire(instance, f"RSS {rss // (1024 * 1024)} MB")
+
+    def retire(self, instance: ChromeInstance, reason: str) -> None:
+        """Не давать экземпляру новых подключений и перезапустить, когда текущие закончатся"""
+        if not instance.draining:
+            instance.draining = True
+            print(f"♻️ Chrome #{instance.index} retiring: {reason}")
+        if instance.active == 0:
+            self.recycle(instance, reason)
+
+    def recycle(self, instance: ChromeInstance, reason: str) -> None:
+        if instance.index in self._restarting:
+            return
+        self._restarting[instance.index] = asyncio.create_task(self._restart(instance, reason))
+
+    async def _restart(self, instance: ChromeInstance, reason: str) -> None:
+        try:
+            await instance.stop()
+            for target_id in [t for t, owner in self.target_owners.items() if owner is instance]:
+                del self.target_owners[target_id]
+            await instance.start(self.session, self.startup_timeout)
+            instance.restarts += 1
+            print(f"🔄 Chrome #{instance.index} restarted ({reason}), port {instance.port}")
+        except (RuntimeError, OSError) as e:
+            # Без перехвата OSError (нет исполняемого файла, порт занят) экземпляр
+            # остался бы мертвым, а ошибка - в необработанной задаче
+            print(f"❌ Chrome #{instance.index} restart failed: {e}")
+        finally:
+            self._restarting.pop(instance.index, None)
+
+    # ---------- распределение подключений ----------
+
+    def _available(self, exclude: Optional[ChromeInstance] = None) -> List[ChromeInstance]:
+        return [i for i in self.instances if i.alive and not i.draining and i is not exclude]
+
+    def least_loaded(self) -> ChromeInstance:
+        """Экземпляр с наименьшим числом активных подключений (при равенстве - с меньшим числом сессий)"""
+        available = self._available() or [instance for instance in self.instances if instance.alive]
+        if not available:
+            raise ConnectionError("No browser farm instance is running")
+        return min(available, key=lambda instance: (instance.active, instance.sessions, instance.index))
+
+    async def acquire(self, path: str) -> Tuple[ChromeInstance, str]:
+        """Экземпляр и upstream ws URL для клиентского пути /devtools/browser/... или /devtools/page/<id>"""
+        instance: Optional[ChromeInstance]
+        if path.startswith("/devtools/browser/"):
+            instance = await self._wait_for_instance()
+            upstream = instance.browser_ws_url
+            instance.sessions += 1
+        else:
+            target_id = path.rstrip("/").rsplit("/", 1)[-1]
+            if target_id not in self.target_owners:
+                await self.list_targets()
+            instance = self.target_owners.get(target_id)
+            if instance is None or not instance.alive:
+                raise ConnectionError(f"Unknown target {target_id}")
+            upstream = f"ws://127.0.0.1:{instance.port}{path}"
+        instance.active += 1
+        return instance, upstream
+
+    async def _wait_for_instance(self) -> ChromeInstance:
+        """Наименее загруженный экземпляр; если все перезапускаются - дождаться первого"""
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                return self.least_loaded()
+            except ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+    def release(self, instance: ChromeInstance) -> None:
+        instance.active -= 1
+        # Экземпляры перезапускаются по одному: последний доступный обслуживает дальше
+        if instance.sessions >= self.max_sessions and self._available(exclude=instance):
+            self.retire(instance, f"{instance.sessions} sessions served")
+        elif instance.draining and instance.active == 0:
+            self.recycle(instance, "drained")
+
+    # ---------- /json API ----------
+
+    async def list_targets(self) -> List[Tuple[ChromeInstance, Dict[str, Any]]]:
+        """Вкладки всех экземпляров (/json/list опрашиваются одновременно)"""
+        instances = [instance for instance in self.instances if instance.alive]
+        results = await asyncio.gather(*(self._get_json(instance, "/json/list") for instance in instances),
+                                       return_exceptions=True)
+        targets = []
+        for instance, result in zip(instances, results):
+            if isinstance(result, BaseException):
+                continue
+            for target in result:
+                self.target_owners[target["id"]] = instance
+                targets.append((instance, target))
+        return targets
+
+    async def _get_json(self, instance: ChromeInstance, path: str, method: str = "GET") -> Any:
+        async with self.session.request(method, f"{instance.base_url}{path}") as response:
+            return await response.json(content_type=None)
+
+    async def fetch(self, method: str, path: str, ws_address: str) -> Tuple[int, str, bytes]:
+        """Ответ DevTools API фермы: (статус, content-type, тело) с адресами прокси"""
+        path = path.rstrip("/") or "/"
+        body: Any
+        if path == "/json/version":
+            body = dict(self.least_loaded().version)
+            body["webSocketDebuggerUrl"] = f"ws://{ws_address}/devtools/browser/farm"
+        elif path in ("/json", "/json/list"):
+            body = [self._public_target(target, ws_address) for _, target in await self.list_targets()]
+        elif path.startswith("/json/new"):
+            newest = self.least_loaded()
+            target = await self._get_json(newest, path, method)
+            self.target_owners[target["id"]] = newest
+            body = self._public_target(target, ws_address)
+        elif path.startswith(("/json/close/", "/json/activate/")):
+            target_id = path.rsplit("/", 1)[-1]
+            if target_id not in self.target_owners:
+                await self.list_targets()
+            owner = self.target_owners.get(target_id)
+            if owner is None:
+                return 404, "text/plain", f"No such target id: {target_id}".encode()
+            async with self.session.request(method, f"{owner.base_url}{path}") as response:
+                return response.status, response.content_type, await response.read()
+        elif path == "/json/protocol":
+            body = await self._get_json(self.least_loaded(), path)
+        else:
+            return 404, "text/plain", b"Unknown DevTools endpoint"
+        return 200, "application/json", json.dumps(body, indent=2).encode()
+
+    @staticmethod
+    def _public_target(target: Dict[str, Any], ws_address: str) -> Dict[str, Any]:
+        """Адреса вкладки через прокси: ws://<прокси>/devtools/page/<id>"""
+        target = dict(target)
+        if "webSocketDebuggerUrl" in target:
+            target["webSocketDebuggerUrl"] = f"ws://{ws_address}/devtools/page/{target['id']}"
+        if "devtoolsFrontendUrl" in target:
+            target["devtoolsFrontendUrl"] = f"/devtools/inspector.html?ws={ws_address}/devtools/page/{target['id']}"
+        return target
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Состояние экземпляров для /farm/stats"""
+        rows = []
+        for instance in self.instances:
+            rss = instance.rss()
+            rows.append({
+                "index": instance.index,
+                "port": instance.port,
+                "pid": instance.process.pid if instance.process is not None else None,
+                "alive": instance.alive,
+                "draining": instance.draining,
+                "active": instance.active,
+                "sessions": instance.sessions,
+                "restarts": instance.restarts,
+                "rss_mb": rss // (1024 * 1024) if rss is not None else None,
+            })
+        return rows
@@ -0,0 +1,112 @@
+"""
+Кросс-браузерная матрица: сравнение длительностей одних и тех же тестов на разных движках
+Тесты размножаются по браузерам параметром browser_name pytest-playwright.
+В одном процессе синхронные тесты проходят движки по очереди (pytest группирует
+тесты по session параметру); с --dist loadgroup синхронные тесты каждого движка
+уходят своему воркеру xdist, и движки идут параллельно. concurrent тесты
+выполняются на всех движках одновременно (tools/async_engine.py)
+"""
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import pytest
+
+from tools.async_engine import BROWSER_PARAM, ConcurrentScheduler
+
+
+BROWSER_ENGINES = ("chromium", "firefox", "webkit")
+
+
+def parse_browsers(value: str) -> List[str]:
+    """'chromium,firefox' -> ['chromium', 'firefox'] с проверкой имен"""
+    browsers = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in browsers if name not in BROWSER_ENGINES]
+    if unknown or not browsers:
+        raise pytest.UsageError(f"--browsers expects names from {', '.join(BROWSER_ENGINES)}, got '{value}'")
+    return list(dict.fromkeys(browsers))
+
+
+def matrix_label(item: pytest.Function) -> str:
+    """Название случая без браузера: tests/x.py::test_y[param]"""
+    params = item.callspec.params if hasattr(item, "callspec") else {}
+    other = "-".join(str(value) for name, value in params.items() if name != BROWSER_PARAM)
+    parent = item.parent.nodeid if item.parent is not None else ""
+    label = f"{parent}::{item.originalname}"
+    return f"{label}[{other}]" if other else label
+
+
+class BrowserMatrixReport:
+    """Плагин pytest: длительности случаев по движкам и отчет с выделением отстающего движка"""
+
+    def __init__(self, browsers: List[str], threshold: float = 1.5, top: int = 15, min_seconds: float = 0.1):
+        self.browsers = browsers
+        self.threshold = threshold
+        # Разброс у мгновенных тестов - шум, такие тесты не выделяются
+        self.min_seconds = min_seconds
+        self.top = top
+        self.durations: Dict[str, Dict[str, float]] = defaultdict(dict)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: List[pytest.Item]) -> None:
+        """С --dist loadgroup - группа xdist на движок (раньше хука xdist, читающего группы)"""
+        if config.getoption("dist", None) != "loadgroup":
+            return
+        for item in items:
+            params = getattr(item, "callspec", None)
+            if params is None or BROWSER_PARAM not in params.params or ConcurrentScheduler.is_concurrent(item):
+                continue
+            item.add_marker(pytest.mark.xdist_group(params.params[BROWSER_PARAM]))
+
+    def pytest_runtest_setup(self, item: pytest.Item) -> None:
+        params = getattr(item, "callspec", None)
+        if not isinstance(item, pytest.Function) or params is None or BROWSER_PARAM not in params.params:
+            return
+        names = {name for name, _ in item.user_properties}
+        if "matrix_case" not in names:
+            item.user_properties.append(("matrix_case", matrix_label(item)))
+            item.user_properties.append(("browser", params.params[BROWSER_PARAM]))
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        """Длительность call фазы (для concurrent тестов - собственное время в движке)"""
+        # outcome "rerun" выставляет pytest-rerunfailures, в аннотации TestReport его нет
+        if report.when != "call" or str(report.outcome) == "rerun":
+            return
+        properties = dict(report.user_properties)
+        if "matrix_case" not in properties:
+            return
+        duration = properties.get("engine_duration", report.duration)
+        assert isinstance(duration, (int, float))
+        self.durations[str(properties["matrix_case"])][str(properties["browser"])] = duration
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Случаи матрицы, отсортированные по разбросу между движками"""
+        rows = []
+        for case, by_browser in self.durations.items():
+            values = [value for value in by_browser.values() if value > 0]
+            spread = max(values) / min(values) if len(values) > 1 else 1.0
+            slowest = max(by_browser, key=lambda name: by_browser[name])
+            rows.append({"case": case, "durations": by_browser, "spread": spread, "slowest": slowest})
+        return sorted(rows, key=lambda row: row["spread"], reverse=True)
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if hasattr(terminalreporter.config, "workerinput") or not self.durations:
+            return
+        tr = terminalreporter
+        tr.write_sep("=", "browser matrix")
+        header = " ".join(f"{name + ', s':>12}" for name in self.browsers)
+        tr.write_line(f"{header} {'spread':>7}  Test")
+
+        def cell(value: Any) -> str:
+            return f"{value:>12.2f}" if value is not None else f"{'-':>12}"
+
+        rows = self.rows()
+        for row in rows[: self.top]:
+            cells = " ".join(cell(row["durations"].get(name)) for name in self.browsers)
+            regressed = row["spread"] >= self.threshold and row["durations"][row["slowest"]] >= self.min_seconds
+            flag = f"  ⚠️ {row['slowest']}" if regressed else ""
+            tr.write_line(f"{cells} {row['spread']:>6.1f}x  {row['case']}{flag}")
+
+        totals = " ".join(
+            cell(sum(row["durations"].get(name, 0.0) for row in rows)) for name in self.browsers
+        )
+        tr.write_line(f"{totals} {'':>7}  Total ({len(rows)} tests)")
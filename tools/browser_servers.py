@@ -0,0 +1,229 @@
+"""
+Общие Playwright browser-серверы для параллельных воркеров pytest
+Раннер запускает несколько серверов один раз, воркеры подключаются к ним через connect()
+"""
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil нужен только для замера RSS
+    psutil = None
+
+
+# Переменная окружения со списком ws-эндпоинтов серверов (через запятую)
+ENDPOINTS_ENV_VAR = "BROWSER_SERVER_ENDPOINTS"
+# Переменная окружения с путем к логу времени запуска браузера в воркерах
+STARTUP_LOG_ENV_VAR = "BROWSER_STARTUP_LOG"
+
+
+def servers_for_workers(workers: int, workers_per_server: int) -> int:
+    """Количество серверов для заданного числа воркеров"""
+    if workers_per_server < 1:
+        raise ValueError("workers_per_server must be >= 1")
+    return max(1, math.ceil(workers / workers_per_server))
+
+
+def worker_index(worker_id: Optional[str] = None) -> int:
+    """Номер воркера pytest-xdist (gw0 -> 0), 0 без xdist"""
+    if worker_id is None:
+        worker_id = os.getenv("PYTEST_XDIST_WORKER", "gw0")
+    digits = "".join(ch for ch in worker_id if ch.isdigit())
+    return int(digits) if digits else 0
+
+
+def worker_count() -> int:
+    """Число воркеров pytest-xdist, 1 без xdist"""
+    return int(os.getenv("PYTEST_XDIST_WORKER_COUNT", "1"))
+
+
+def endpoint_for_worker(endpoints: List[str], worker_id: Optional[str] = None) -> str:
+    """Выбрать сервер для воркера: соседние воркеры распределяются по кругу"""
+    if not endpoints:
+        raise ValueError("No browser server endpoints configured")
+    return endpoints[worker_index(worker_id) % len(endpoints)]
+
+
+def endpoints_from_env() -> List[str]:
+    """Эндпоинты общих серверов, переданные раннером"""
+    value = os.getenv(ENDPOINTS_ENV_VAR, "")
+    return [endpoint.strip() for endpoint in value.split(",") if endpoint.strip()]
+
+
+def record_browser_startup(mode: str, seconds: float) -> None:
+    """Записать время запуска/подключения браузера в лог раннера"""
+    log_path = os.getenv(STARTUP_LOG_ENV_VAR)
+    if not log_path:
+        return
+    entry = {
+        "worker": os.getenv("PYTEST_XDIST_WORKER", "main"),
+        "mode": mode,
+        "seconds": seconds,
+    }
+    # Короткая строка в режиме append атомарна для параллельных воркеров
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def read_startup_log(log_path: str) -> List[Dict]:
+    """Прочитать лог времени запуска браузера"""
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class BrowserServerPool:
+    """Набор запущенных `playwright launch-server` процессов"""
+
+    def __init__(
+        self,
+        browser_name: str = "chromium",
+        headless: bool = True,
+        launch_timeout: float = 30.0,
+    ):
+        self.browser_name = browser_name
+        self.headless = headless
+        self.launch_timeout = launch_timeout
+        self.endpoints: List[str] = []
+        self.startup_time = 0.0
+        self._processes: List[subprocess.Popen] = []
+        self._config_files: List[str] = []
+
+    @property
+    def pids(self) -> List[int]:
+        """PID процессов серверов"""
+        return [process.pid for process in self._processes]
+
+    def start(self, count: int) -> List[str]:
+        """Запустить `count` серверов параллельно и вернуть их ws-эндпоинты"""
+        started = time.monotonic()
+        for _ in range(count):
+            self._processes.append(self._spawn())
+
+        try:
+            self.endpoints = [self._read_endpoint(process) for process in self._processes]
+        except Exception:
+            self.stop()
+            raise
+
+        self.startup_time = time.monotonic() - started
+        return self.endpoints
+
+    def stop(self) -> None:
+        """Остановить все серверы"""
+        for process in self._processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for config_file in self._config_files:
+            if os.path.exists(config_file):
+                os.remove(config_file)
+        self._processes = []
+        self._config_files = []
+
+    def _spawn(self) -> subprocess.Popen:
+        """Запустить один browser-сервер через CLI драйвера Playwright"""
+        fd, config_file = tempfile.mkstemp(prefix="pw-server-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"headless": self.headless, "port": 0}, f)
+        self._config_files.append(config_file)
+
+        return subprocess.Popen(
+            [
+                sys.executable, "-m", "playwright", "launch-server",
+                "--browser", self.browser_name,
+                "--config", config_file,
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+    def _read_endpoint(self, process: subprocess.Popen) -> str:
+        """Дождаться строки с ws-эндпоинтом в stdout сервера"""
+        result: Dict[str, str] = {}
+
+        def read() -> None:
+            assert process.stdout is not None
+            result["line"] = process.stdout.readline().strip()
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        reader.join(self.launch_timeout)
+
+        endpoint = result.get("line", "")
+        if not endpoint.startswith("ws://"):
+            raise RuntimeError(
+                f"Browser server did not report ws endpoint in {self.launch_timeout}s "
+                f"(exit code: {process.poll()}, output: {endpoint!r})"
+            )
+        return endpoint
+
+
+class ProcessTreeMonitor:
+    """Фоновый замер пикового суммарного RSS дерева процессов"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak_rss = 0
+        self._roots: List[int] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        """Доступен ли замер (нужен psutil)"""
+        return psutil is not None
+
+    def track(self, *pids: int) -> None:
+        """Добавить корневые процессы для замера"""
+        self._roots.extend(pids)
+
+    def start(self) -> None:
+        """Запустить фоновый замер"""
+        if not self.available:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановить замер"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self._sample())
+            self._stop.wait(self.interval)
+
+    def _sample(self) -> int:
+        """Суммарный RSS корневых процессов и всех их потомков"""
+        seen = set()
+        total = 0
+        for pid in self._roots:
+            try:
+                root = psutil.Process(pid)
+                processes = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            for process in processes:
+                if process.pid in seen:
+                    continue
+                seen.add(process.pid)
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+        return total
@@ -0,0 +1,342 @@
+"""
+Мультиплексирование CDP: воркеры делят несколько постоянных подключений к браузеру
+вместо собственного WebSocket (и рукопожатия через SSH туннель) на каждого
+Команды клиентов получают уникальные id апстрима, ответы возвращаются с исходным id.
+Browser context'ы и flatten сессии (Target.attachToTarget) принадлежат создавшему их
+клиенту: события уходят владельцу, чужие сессии клиенту недоступны, а Browser.close
+клиента закрывает только его контексты, но не общий браузер
+"""
+import asyncio
+import itertools
+import json
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+
+
+# Chrome пишет id первым полем ответа: ответы (в том числе скриншоты) маршрутизируются без разбора JSON
+RESPONSE_ID = re.compile(rb'^\{"id":(\d+),')
+# Ответы, по которым запоминается владелец созданного ресурса
+TRACKED_METHODS = {
+    "Target.createBrowserContext",
+    "Target.disposeBrowserContext",
+    "Target.attachToTarget",
+    "Target.createTarget",
+}
+SESSION_NOT_FOUND = {"code": -32001, "message": "Session with given id not found."}
+_UNKNOWN = object()
+
+
+class MuxClient:
+    """Подключение клиента: его сессии, контексты и очередь отправки"""
+
+    def __init__(self, websocket: Any, queue_size: int, recording: Any = None):
+        self.websocket = websocket
+        self.recording = recording
+        self.sessions: Set[str] = set()
+        self.contexts: Set[str] = set()
+        self.closed = False
+        self.overflowed = False
+        # У каждого клиента своя очередь: медленный клиент не задерживает события остальных
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self._closing: Optional[asyncio.Task] = None
+
+    def send(self, message: bytes) -> None:
+        """Поставить кадр в очередь без ожидания: чтение апстрима общее для всех клиентов
+
+        Клиент, очередь которого заполнена, отключается - иначе он остановил бы
+        доставку ответов и событий остальным клиентам подключения.
+        """
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.close()
+            self._closing = asyncio.create_task(self.websocket.close(1008, "client is too slow"))
+
+    async def write_loop(self) -> None:
+        try:
+            while True:
+                message = await self._queue.get()
+                if self.recording is not None:
+                    self.recording.incoming(message)
+                await self.websocket.send(message, text=True)
+        except ConnectionClosed:
+            self.close()
+
+    def close(self) -> None:
+        """Больше не принимать кадры и отбросить еще не отправленные"""
+        self.closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+
+class Upstream:
+    """Постоянное подключение к браузеру и таблицы маршрутизации его клиентов"""
+
+    def __init__(self, websocket: Any, stats: Counter, on_targets_changed: Optional[Callable[[], None]] = None):
+        self.websocket = websocket
+        self.stats = stats
+        # Вызывается при создании/закрытии вкладки (сброс кэша /json/list прокси)
+        self.on_targets_changed = on_targets_changed
+        self.clients: Set[MuxClient] = set()
+        self.closed = False
+        self._ids = itertools.count(1)
+        # id апстрима -> (клиент или None для служебных команд, id клиента, метод, параметры)
+        self.pending: Dict[int, Tuple[Optional[MuxClient], int, str, Dict[str, Any]]] = {}
+        # Владельцы ресурсов; None - общий ресурс (вкладки контекста по умолчанию)
+        self.sessions: Dict[str, Optional[MuxClient]] = {}
+        self.contexts: Dict[str, MuxClient] = {}
+        self.targets: Dict[str, Optional[MuxClient]] = {}
+
+    # ---------- команды клиентов ----------
+
+    async def command(self, client: MuxClient, message: Dict[str, Any]) -> None:
+        session_id = message.get("sessionId")
+        if session_id is not None and not self._can_use(client, session_id):
+            self._reply(client, {"id": message["id"], "error": SESSION_NOT_FOUND, "sessionId": session_id})
+            return
+        if message.get("method") == "Browser.close" and session_id is None:
+            # Браузер общий - закрываются только ресурсы клиента
+            await self.release(client)
+            self._reply(client, {"id": message["id"], "result": {}})
+            return
+
+        upstream_id = next(self._ids)
+        self.pending[upstream_id] = (client, message["id"], message.get("method", ""), message.get("params", {}))
+        message["id"] = upstream_id
+        self.stats["mux_commands"] += 1
+        await self.websocket.send(json.dumps(message))
+
+    async def release(self, client: MuxClient) -> None:
+        """Закрыть контексты клиента и отключить его сессии во вкладках контекста по умолчанию"""
+        # Копии множеств: пока ждем отправки, read_loop может убрать из них отключенную сессию
+        for context_id in list(client.contexts):
+            self.contexts.pop(context_id, None)
+            await self._internal("Target.disposeBrowserContext", {"browserContextId": context_id})
+        for session_id in list(client.sessions):
+            self.sessions.pop(session_id, None)
+            await self._internal("Target.detachFromTarget", {"sessionId": session_id})
+        for target_id in [t for t, owner in self.targets.items() if owner is client]:
+            del self.targets[target_id]
+        client.contexts.clear()
+        client.sessions.clear()
+
+    async def _internal(self, method: str, params: Dict[str, Any]) -> None:
+        """Служебная команда мультиплексора: ответ никому не пересылается"""
+        upstream_id = next(self._ids)
+        self.pending[upstream_id] = (None, 0, method, params)
+        await self.websocket.send(json.dumps({"id": upstream_id, "method": method, "params": params}))
+
+    def _can_use(self, client: MuxClient, session_id: str) -> bool:
+        owner = self.sessions.get(session_id, _UNKNOWN)
+        return owner is client or owner is None
+
+    def _reply(self, client: MuxClient, message: Dict[str, Any]) -> None:
+        if message.get("sessionId") is None:
+            message.pop("sessionId", None)
+        client.send(json.dumps(message).encode())
+
+    # ---------- сообщения браузера ----------
+
+    async def read_loop(self) -> None:
+        """Разбор сообщений браузера; при потере подключения клиенты отключаются"""
+        try:
+            while True:
+                message = await self.websocket.recv(decode=False)
+                try:
+                    await self.dispatch(message)
+                except ConnectionClosed:
+                    raise
+                except Exception as e:
+                    # Неожиданное сообщение не должно отключать всех клиентов апстрима
+                    self.stats["mux_dispatch_errors"] += 1
+                    print(f"⚠️ Multiplexer failed to route message: {e!r}: {message[:200]!r}")
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+            for client in list(self.clients):
+                client.close()
+                await client.websocket.close(1011, "browser connection lost")
+
+    async def dispatch(self, message: bytes) -> None:
+        match = RESPONSE_ID.match(message)
+        if match:
+            await self._response(int(match.group(1)), message, match.end())
+            return
+        event = json.loads(message)
+        if "id" in event:
+            await self._response(event["id"], message, None)
+            return
+        for client in self._route_event(event):
+            client.send(message)
+
+    async def _response(self, upstream_id: int, message: bytes, body_start: Optional[int]) -> None:
+        entry = self.pending.pop(upstream_id, None)
+        if entry is None:
+            return
+        client, client_id, method, params = entry
+        if method in TRACKED_METHODS:
+            self._track(client, method, params, json.loads(message).get("result"))
+        if client is None:
+            return
+        if body_start is not None:
+            client.send(b'{"id":%d,' % client_id + message[body_start:])
+        else:
+            response = json.loads(message)
+            response["id"] = client_id
+            client.send(json.dumps(response).encode())
+
+    def _track(self, client: Optional[MuxClient], method: str, params: Dict[str, Any],
+               result: Optional[Dict[str, Any]]) -> None:
+        """Запомнить владельца ресурса, созданного командой (ответ без id ресурса пропускается)"""
+        if result is None:
+            return
+        if method == "Target.createBrowserContext":
+            context_id = result.get("browserContextId")
+            if context_id is not None and client is not None:
+                self.contexts[context_id] = client
+                client.contexts.add(context_id)
+        elif method == "Target.disposeBrowserContext":
+            context_id = params.get("browserContextId")
+            if context_id is not None:
+                self.contexts.pop(context_id, None)
+                if client is not None:
+                    client.contexts.discard(context_id)
+        elif method == "Target.attachToTarget":
+            session_id = result.get("sessionId")
+            if session_id is not None:
+                self._own_session(session_id, client)
+        elif method == "Target.createTarget":
+            target_id = result.get("targetId")
+            if target_id is not None:
+                self.targets[target_id] = client
+
+    def _route_event(self, event: Dict[str, Any]) -> List[MuxClient]:
+        """Получатели события: владелец сессии, контекста или вкладки, иначе все клиенты"""
+        method = event.get("method")
+        params = event.get("params", {})
+        session_id = event.get("sessionId")
+        owner: Any
+        if session_id is not None:
+            owner = self.sessions.get(session_id, _UNKNOWN)
+            if owner is _UNKNOWN:
+                return []
+        else:
+            target_info = params.get("targetInfo", {})
+            context_id = target_info.get("browserContextId")
+            target_id = target_info.get("targetId") or params.get("targetId")
+            if context_id in self.contexts:
+                owner = self.contexts[context_id]
+            elif target_id in self.targets:
+                owner = self.targets[target_id]
+            else:
+                owner = self.sessions.get(params.get("sessionId"))
+            if method == "Target.targetCreated":
+                self.targets[target_id] = owner
+            elif method == "Target.targetDestroyed":
+                self.targets.pop(target_id, None)
+            if method in ("Target.targetCreated", "Target.targetDestroyed") and self.on_targets_changed is not None:
+                self.on_targets_changed()
+
+        # Дочерние сессии (auto-attach) принадлежат владельцу родителя или контекста
+        if method == "Target.attachedToTarget":
+            self._own_session(params["sessionId"], owner)
+        elif method == "Target.detachedFromTarget":
+            detached = self.sessions.pop(params.get("sessionId"), None)
+            if detached is not None:
+                detached.sessions.discard(params.get("sessionId"))
+
+        if owner is None:
+            return list(self.clients)
+        return [owner] if owner in self.clients else []
+
+    def _own_session(self, session_id: str, owner: Optional[MuxClient]) -> None:
+        self.sessions[session_id] = owner
+        if owner is not None:
+            owner.sessions.add(session_id)
+
+
+class CdpMultiplexer:
+    """Пул постоянных подключений к браузеру; новый клиент попадает на наименее загруженное"""
+
+    def __init__(self, upstream_base: str, upstreams: int, relay: Any, stats: Counter, recorder: Any = None,
+                 keepalive: float = 20.0, on_targets_changed: Optional[Callable[[], None]] = None):
+        self.upstream_base = upstream_base
+        self.upstreams = upstreams
+        self.relay = relay
+        self.stats = stats
+        self.recorder = recorder
+        self.keepalive = keepalive
+        self.on_targets_changed = on_targets_changed
+        self.pools: Dict[str, List[Upstream]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+
+    async def upstream_for(self, path: str) -> Upstream:
+        """Подключение для нового клиента: новое открывается, только если все занятые"""
+        async with self._lock:
+            pool = [upstream for upstream in self.pools.get(path, []) if not upstream.closed]
+            self.pools[path] = pool
+            if len(pool) < self.upstreams and all(upstream.clients for upstream in pool):
+                websocket = await websockets.connect(
+                    f"{self.upstream_base}{path}",
+                    ping_interval=self.keepalive,
+                    ping_timeout=self.keepalive,
+                    **self.relay.connection_kwargs(),
+                )
+                upstream = Upstream(websocket, self.stats, self.on_targets_changed)
+                task = asyncio.create_task(upstream.read_loop())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                pool.append(upstream)
+                self.stats["mux_upstream_connections"] += 1
+            return min(pool, key=lambda upstream: len(upstream.clients))
+
+    async def warm(self, path: str) -> None:
+        """Открыть первое подключение заранее, до прихода воркеров"""
+        try:
+            await self.upstream_for(path)
+        except (OSError, InvalidHandshake, InvalidURI, asyncio.TimeoutError) as e:
+            print(f"⚠️ Multiplexer warm-up failed: {e}")
+
+    async def handle(self, websocket: Any) -> None:
+        """Обработчик клиентского WebSocket к /devtools/browser/..."""
+        try:
+            upstream = await self.upstream_for(websocket.request.path)
+        except (OSError, InvalidHandshake, InvalidURI, asyncio.TimeoutError) as e:
+            self.stats["upstream_errors"] += 1
+            print(f"WebSocket proxy error: {websocket.request.path}: {e}")
+            await websocket.close(1011, "upstream unavailable")
+            return
+
+        recording = self.recorder.connection() if self.recorder is not None else None
+        client = MuxClient(websocket, self.relay.queue_size, recording)
+        upstream.clients.add(client)
+        self.stats["mux_clients"] += 1
+        writer = asyncio.create_task(client.write_loop())
+        try:
+            while True:
+                message = await websocket.recv(decode=False)
+                if recording is not None:
+                    recording.command(message)
+                await upstream.command(client, json.loads(message))
+        except ConnectionClosed:
+            pass
+        finally:
+            client.close()
+            writer.cancel()
+            upstream.clients.discard(client)
+            if client.overflowed:
+                self.stats["mux_slow_clients"] += 1
+            if not upstream.closed:
+                try:
+                    await upstream.release(client)
+                except ConnectionClosed:
+                    pass
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Запись CDP трафика ChromeProxy и отчет по методам протокола
+Каждая пара команда/ответ (и каждое событие) пишется в компактный бинарный журнал
+только на дозапись: метод, размеры и время round trip. CLI строит по журналу
+таблицу p50/p95/p99 по методам и проигрывает запись на фейковом CDP сервере,
+чтобы сравнивать изменения прокси без удаленного браузера
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import statistics
+import struct
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.cdp_multiplexer import RESPONSE_ID
+
+
+MAGIC = b"CDPREC1\n"
+# Запись: вид, время отправки (unix), round trip (мс), байт команды, байт ответа, длина имени метода
+RECORD = struct.Struct("<BdfIIH")
+COMMAND, ERROR, EVENT = 0, 1, 2
+
+# Chrome пишет method первым полем события (id ответа - см. RESPONSE_ID)
+EVENT_METHOD = re.compile(rb'^\{"method":"([^"]+)"')
+ERROR_RESPONSE = re.compile(rb'^\{"id":\s*\d+,\s*"error"')
+
+
+class Record(NamedTuple):
+    kind: int
+    timestamp: float
+    rtt_ms: float
+    request_bytes: int
+    response_bytes: int
+    method: str
+
+
+class CdpRecorder:
+    """Журнал CDP трафика: один файл на прокси, записи от всех подключений"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, "ab")
+        if is_new:
+            self._file.write(MAGIC)
+
+    def write(self, kind: int, timestamp: float, rtt_ms: float, request_bytes: int, response_bytes: int,
+              method: str) -> None:
+        name = method.encode()[:0xFFFF]
+        self._file.write(RECORD.pack(kind, timestamp, rtt_ms, request_bytes, response_bytes, len(name)) + name)
+
+    def connection(self) -> "ConnectionRecorder":
+        return ConnectionRecorder(self)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ConnectionRecorder:
+    """Сопоставление команд и ответов одного клиентского подключения по id"""
+
+    def __init__(self, recorder: CdpRecorder):
+        self.recorder = recorder
+        self.pending: Dict[int, Tuple[str, float, float, int]] = {}
+
+    def command(self, message: bytes) -> None:
+        """Кадр клиент -> браузер"""
+        try:
+            request = json.loads(message)
+        except ValueError:
+            return
+        if "id" in request:
+            self.pending[request["id"]] = (request.get("method", ""), time.time(), time.perf_counter(), len(message))
+
+    def incoming(self, message: bytes) -> None:
+        """Кадр браузер -> клиент: ответ на команду или событие"""
+        match = RESPONSE_ID.match(message)
+        if match:
+            self._response(int(match.group(1)), message)
+            return
+        match = EVENT_METHOD.match(message)
+        if match:
+            self.recorder.write(EVENT, time.time(), 0.0, 0, len(message), match.group(1).decode())
+            return
+        try:
+            parsed = json.loads(message)
+        except ValueError:
+            return
+        if "id" in parsed:
+            self._response(parsed["id"], message)
+        elif "method" in parsed:
+            self.recorder.write(EVENT, time.time(), 0.0, 0, len(message), parsed["method"])
+
+    def _response(self, request_id: int, message: bytes) -> None:
+        entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        method, sent_at, started, request_bytes = entry
+        rtt_ms = (time.perf_counter() - started) * 1000
+        kind = ERROR if ERROR_RESPONSE.match(message) else COMMAND
+        self.recorder.write(kind, sent_at, rtt_ms, request_bytes, len(message), method)
+
+
+def read_log(path: str) -> Iterator[Record]:
+    """Записи журнала; недописанная последняя запись (прокси убит) пропускается"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a CDP recording")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            kind, timestamp, rtt_ms, request_bytes, response_bytes, name_length = RECORD.unpack(header)
+            name = f.read(name_length)
+            if len(name) < name_length:
+                return
+            yield Record(kind, timestamp, rtt_ms, request_bytes, response_bytes, name.decode())
+
+
+# ---------- отчет ----------
+
+def percentile(values: List[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def summarize(records: List[Record]) -> List[Dict[str, Any]]:
+    """Строки по методам: число вызовов, ошибок, p50/p95/p99, суммарное время и байты"""
+    groups: Dict[Tuple[str, bool], List[Record]] = defaultdict(list)
+    for record in records:
+        groups[(record.method, record.kind == EVENT)].append(record)
+
+    rows = []
+    for (method, is_event), group in groups.items():
+        rtts = [record.rtt_ms for record in group]
+        rows.append({
+            "method": method,
+            "event": is_event,
+            "count": len(group),
+            "errors": sum(1 for record in group if record.kind == ERROR),
+            "p50": 0.0 if is_event else statistics.median(rtts),
+            "p95": 0.0 if is_event else percentile(rtts, 95),
+            "p99": 0.0 if is_event else percentile(rtts, 99),
+            "total_ms": sum(rtts),
+            "bytes": sum(record.request_bytes + record.response_bytes for record in group),
+        })
+    # Команды, на которые ушло больше всего времени, первыми; события - в конце
+    return sorted(rows, key=lambda row: (row["event"], -row["total_ms"], -row["bytes"]))
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def print_summary(rows: List[Dict[str, Any]], top: int) -> None:
+    commands = [row for row in rows if not row["event"]]
+    total_ms = sum(row["total_ms"] for row in commands) or 1.0
+    print(f"{'count':>7} {'err':>4} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'total, s':>9} "
+          f"{'share':>6} {'bytes':>9}  Method")
+    for row in commands[:top]:
+        print(f"{row['count']:>7} {row['errors']:>4} {row['p50']:>9.2f} {row['p95']:>9.2f} {row['p99']:>9.2f} "
+              f"{row['total_ms'] / 1000:>9.2f} {row['total_ms'] / total_ms:>6.0%} "
+              f"{format_bytes(row['bytes']):>9}  {row['method']}")
+    events = [row for row in rows if row["event"]]
+    if events:
+        print(f"\n📨 Events: {sum(row['count'] for row in events)}, "
+              f"{format_bytes(sum(row['bytes'] for row in events))}")
+        for row in sorted(events, key=lambda row: -row["bytes"])[:top]:
+            print(f"{row['count']:>7} {format_bytes(row['bytes']):>9}  {row['method']}")
+
+
+# ---------- проигрывание ----------
+
+# Команды, создающие ресурсы: мультиплексор запоминает владельца по id из ответа
+CREATED_IDS = {
+    "Target.createBrowserContext": "browserContextId",
+    "Target.attachToTarget": "sessionId",
+    "Target.createTarget": "targetId",
+}
+
+
+async def replay_endpoint(websocket: Any) -> None:
+    """Фейковый CDP: отвечает на команду телом заказанного размера без задержки"""
+    created = itertools.count(1)
+    async for message in websocket:
+        request = json.loads(message)
+        size = request["params"].get("response_bytes", 0)
+        result = {"data": "x" * size}
+        id_field = CREATED_IDS.get(request["method"])
+        if id_field is not None:
+            result[id_field] = f"REPLAY{next(created):08X}"
+        await websocket.send(json.dumps({"id": request["id"], "result": result}))
+
+
+async def replay(records: List[Record], args: argparse.Namespace) -> List[Record]:
+    """Проиграть команды записи последовательно (или с исходными паузами) и замерить round trip"""
+    import websockets
+    from tools.chrome_proxy import ChromeProxy, relay_settings
+    from tools.proxy_benchmark import free_port
+
+    relay = relay_settings(args)
+    cdp_port, proxy_port = free_port(), free_port()
+    proxy = ChromeProxy("localhost", cdp_port, proxy_port - 1, relay=relay, multiplex=args.multiplex)
+    commands = [record for record in records if record.kind != EVENT]
+    replayed = []
+
+    async with websockets.serve(replay_endpoint, "localhost", cdp_port, **relay.connection_kwargs()), \
+            websockets.serve(proxy.handle_websocket, "localhost", proxy_port, **relay.connection_kwargs()):
+        port = cdp_port if args.direct else proxy_port
+        async with websockets.connect(f"ws://localhost:{port}/devtools/browser/replay",
+                                      **relay.connection_kwargs()) as ws:
+            previous: Optional[float] = None
+            for request_id, record in enumerate(commands, 1):
+                if args.pace and previous is not None:
+                    await asyncio.sleep(max(0.0, record.timestamp - previous))
+                previous = record.timestamp
+                # Команда и ответ того же размера, что в записи (с точностью до обертки JSON)
+                params = {"response_bytes": max(0, record.response_bytes - 32),
+                          "padding": "x" * max(0, record.request_bytes - 80)}
+                started = time.perf_counter()
+                await ws.send(json.dumps({"id": request_id, "method": record.method, "params": params}))
+                response = await ws.recv(decode=False)
+                rtt_ms = (time.perf_counter() - started) * 1000
+                replayed.append(Record(COMMAND, time.time(), rtt_ms, record.request_bytes, len(response),
+                                       record.method))
+    return replayed
+
+
+def main() -> None:
+    from tools.chrome_proxy import add_relay_arguments
+
+    parser = argparse.ArgumentParser(description='CDP traffic recording tools')
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    summary_parser = subparsers.add_parser('summarize', help='Per-method latency and size report')
+    summary_parser.add_argument('log', help='Recording written by chrome_proxy.py --record')
+    summary_parser.add_argument('--top', type=int, default=30, help='Rows to show')
+
+    replay_parser = subparsers.add_parser('replay', help='Replay recorded commands through the proxy')
+    replay_parser.add_argument('log', help='Recording written by chrome_proxy.py --record')
+    replay_parser.add_argument('--top', type=int, default=30, help='Rows to show')
+    replay_parser.add_argument('--direct', action='store_true', help='Bypass the proxy (baseline)')
+    replay_parser.add_argument('--pace', action='store_true', help='Keep recorded gaps between commands')
+    replay_parser.add_argument('--multiplex', type=int, default=0, metavar='N',
+                               help='Replay through the proxy in multiplexing mode')
+    add_relay_arguments(replay_parser)
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return
+
+    records = list(read_log(args.log))
+    if not records:
+        print(f"📭 {args.log} has no records")
+        return
+
+    if args.command == 'summarize':
+        span = records[-1].timestamp - records[0].timestamp
+        print(f"📼 {args.log}: {len(records)} records over {span:.1f}s")
+        print_summary(summarize(records), args.top)
+    else:
+        from tools.chrome_proxy import run
+        replayed = run(replay(records, args), use_uvloop=args.uvloop)
+        recorded_ms = sum(record.rtt_ms for record in records if record.kind != EVENT)
+        replayed_ms = sum(record.rtt_ms for record in replayed)
+        target = "direct" if args.direct else "proxy"
+        print(f"🔁 Replayed {len(replayed)} commands ({target}): {replayed_ms / 1000:.2f}s "
+              f"vs {recorded_ms / 1000:.2f}s recorded")
+        print_summary(summarize(replayed), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Поиск CDP эндпоинта браузера по host:port через /json/version
+webSocketDebuggerUrl (ws://.../devtools/browser/<guid>) кэшируется на диске с TTL:
+повторные запуски подключаются сразу, а после перезапуска браузера (новый guid)
+адрес переопределяется автоматически при неудачном подключении
+"""
+import ipaddress
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from urllib.parse import urlparse, urlunparse
+
+from playwright.sync_api import Error
+
+
+DEFAULT_CACHE_PATH = Path(tempfile.gettempdir()) / "cdp-endpoints.json"
+
+T = TypeVar("T")
+
+
+def needs_discovery(address: str) -> bool:
+    """Адрес без guid: host:port или http(s)://host:port"""
+    if "/devtools/" in address:
+        return False
+    return address.startswith(("http://", "https://")) or "://" not in address
+
+
+def http_base(address: str) -> str:
+    """host:port -> http://host:port"""
+    address = address.rstrip("/")
+    return address if "://" in address else f"http://{address}"
+
+
+def is_loopback(host: str) -> bool:
+    """localhost, 127.0.0.0/8, ::1 и 0.0.0.0 - адреса, видимые только с машины браузера"""
+    if host == "localhost":
+        return True
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return ip.is_loopback or ip.is_unspecified
+
+
+def with_host(ws_url: str, host: str) -> str:
+    """Заменить в ws URL только имя хоста, порт остается прежним"""
+    parsed = urlparse(ws_url)
+    netloc = f"[{host}]" if ":" in host else host
+    if parsed.port is not None:
+        netloc = f"{netloc}:{parsed.port}"
+    return urlunparse(parsed._replace(netloc=netloc))
+
+
+class CdpResolver:
+    """Кэш host:port -> webSocketDebuggerUrl"""
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: float = 600.0, timeout: float = 2.0):
+        self.cache_path = Path(cache_path) if cache_path else DEFAULT_CACHE_PATH
+        self.ttl = ttl
+        self.timeout = timeout
+
+    # ---------- кэш ----------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries: Dict[str, Dict[str, Any]] = json.load(f)
+                return entries
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        # Запись через временный файл: параллельные воркеры не читают недописанный кэш
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def cached(self, address: str) -> Optional[str]:
+        """Закэшированный ws URL, если он свежее ttl"""
+        entry = self._load().get(http_base(address))
+        if entry and time.time() - entry["resolved_at"] < self.ttl:
+            return str(entry["ws_url"])
+        return None
+
+    def invalidate(self, address: str) -> None:
+        entries = self._load()
+        if entries.pop(http_base(address), None) is not None:
+            self._save(entries)
+
+    # ---------- разрешение ----------
+
+    def fetch(self, address: str) -> str:
+        """Запросить /json/version и вернуть webSocketDebuggerUrl"""
+        base = http_base(address)
+        try:
+            with urllib.request.urlopen(f"{base}/json/version", timeout=self.timeout) as response:
+                info = json.load(response)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise ConnectionError(f"CDP discovery failed for {base}: {e}") from e
+        ws_url = info.get("webSocketDebuggerUrl")
+        if not ws_url:
+            raise ConnectionError(f"{base}/json/version has no webSocketDebuggerUrl")
+        # Браузер за пробросом порта отдает свой localhost - снаружи нужен запрошенный хост.
+        # Порт из ответа сохраняется: прокси (browser_farm, chrome_proxy) указывают свой
+        advertised = urlparse(ws_url).hostname or ""
+        requested = urlparse(base).hostname
+        if requested and is_loopback(advertised):
+            return with_host(ws_url, requested)
+        return str(ws_url)
+
+    def resolve(self, address: str, refresh: bool = False) -> str:
+        """ws URL для адреса; готовые /devtools/ URL возвращаются как есть"""
+        if not needs_discovery(address):
+            return address
+        if not refresh:
+            ws_url = self.cached(address)
+            if ws_url:
+                return ws_url
+        ws_url = self.fetch(address)
+        entries = self._load()
+        entries[http_base(address)] = {"ws_url": ws_url, "resolved_at": time.time()}
+        self._save(entries)
+        return ws_url
+
+    def resolve_many(self, addresses: List[str]) -> Dict[str, str]:
+        """Разрешить все адреса параллельно; недоступные пропускаются"""
+        pending = [address for address in dict.fromkeys(addresses) if needs_discovery(address)]
+        pending = [address for address in pending if self.cached(address) is None]
+        fetched: Dict[str, str] = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                results = executor.map(self._try_fetch, pending)
+            fetched = {address: ws_url for address, ws_url in zip(pending, results) if ws_url}
+            entries = self._load()
+            now = time.time()
+            for address, ws_url in fetched.items():
+                entries[http_base(address)] = {"ws_url": ws_url, "resolved_at": now}
+            self._save(entries)
+
+        resolved = {}
+        for address in addresses:
+            url = address if not needs_discovery(address) else fetched.get(address) or self.cached(address)
+            if url:
+                resolved[address] = url
+        return resolved
+
+    def _try_fetch(self, address: str) -> Optional[str]:
+        try:
+            return self.fetch(address)
+        except ConnectionError:
+            return None
+
+    def connect(self, address: str, connect: Callable[[str], T]) -> T:
+        """Подключиться по закэшированному URL; при ошибке (браузер перезапущен) - переопределить и повторить"""
+        ws_url = self.resolve(address)
+        try:
+            return connect(ws_url)
+        except Error:
+            if not needs_discovery(address):
+                raise
+            self.invalidate(address)
+            return connect(self.resolve(address, refresh=True))
@@ -6,124 +6,438 @@ WebSocket прокси для Chrome Remote Debugging
 import asyncio
 import websockets
 import json
+import re
+import signal
+import sys
+import time
 import aiohttp
+from aiohttp import web
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple, TypeVar
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
 from urllib.parse import urlparse
 import argparse
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.browser_farm import BrowserFarm
+from tools.cdp_multiplexer import CdpMultiplexer
+from tools.cdp_recorder import CdpRecorder
+
+
+# Ответы DevTools API, которые кэшируются на короткое время
+CACHED_PATHS = ("/json/version", "/json/list", "/json")
+# Запросы, меняющие список вкладок: после них кэш /json/list сбрасывается
+TARGET_CHANGING_PATHS = ("/json/new", "/json/close", "/json/activate")
+# CDP события создания/закрытия вкладок в трафике WebSocket
+TARGET_EVENT_MARKERS = (b'"Target.targetCreated"', b'"Target.targetDestroyed"')
+# Маркер конца потока в очереди relay
+_CLOSED = object()
+
+T = TypeVar("T")
+
+
+@dataclass
+class RelaySettings:
+    """Параметры WebSocket relay
+
+    queue_size - сколько кадров одного направления может ждать отправки: при заполнении
+    чтение источника приостанавливается и давление передается отправителю через TCP.
+    max_frame_size - предел размера кадра (скриншоты и screencast бывают по несколько МБ).
+    compression - "deflate" для permessage-deflate, None - без сжатия (быстрее на localhost и LAN).
+    """
+
+    queue_size: int = 64
+    max_frame_size: int = 64 * 1024 * 1024
+    compression: Optional[str] = None
+
+    def connection_kwargs(self) -> Dict:
+        """Общие параметры websockets.serve / websockets.connect"""
+        return {
+            "max_size": self.max_frame_size,
+            "max_queue": self.queue_size,
+            "compression": self.compression,
+        }
+
+
+def close_code(connection: Any) -> Tuple[int, str]:
+    """Код и причина закрытия источника для передачи другой стороне
+
+    1005 (без кода) и 1006 (обрыв) нельзя отправить в close кадре.
+    """
+    code = connection.close_code
+    if code is None or code == 1006:
+        return 1011, "upstream connection lost"
+    if code == 1005:
+        return 1000, ""
+    return code, connection.close_reason or ""
+
+
+class ResponseCache:
+    """Короткоживущий кэш ответов DevTools API: путь -> (время, статус, content-type, тело)"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, int, str, bytes]] = {}
+
+    def get(self, path: str) -> Optional[Tuple[int, str, bytes]]:
+        entry = self._entries.get(path)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1:]
+
+    def put(self, path: str, status: int, content_type: str, body: bytes) -> None:
+        self._entries[path] = (time.monotonic(), status, content_type, body)
+
+    def invalidate_targets(self) -> None:
+        """Список вкладок изменился - /json/version остается, списки сбрасываются"""
+        for path in [p for p in self._entries if p != "/json/version"]:
+            del self._entries[path]
 
 
 class ChromeProxy:
-    def __init__(self, remote_host: str, remote_port: int = 9222, local_port: int = 9223):
+    def __init__(self, remote_host: Optional[str], remote_port: int = 9222, local_port: int = 9223,
+                 cache_ttl: float = 1.0, relay: Optional[RelaySettings] = None, multiplex: int = 0,
+                 record: Optional[str] = None, farm: Optional[BrowserFarm] = None, host: str = 'localhost'):
         self.remote_host = remote_host
         self.remote_port = remote_port
         self.local_port = local_port
+        self.ws_port = local_port + 1
+        self.host = host
+        # Режим фермы: вместо удаленного Chrome - локальные экземпляры, запущенные прокси
+        self.farm = farm
         self.remote_base_url = f"http://{remote_host}:{remote_port}"
+        self.cache = ResponseCache(cache_ttl)
+        self.relay = relay or RelaySettings()
+        self.stats: Counter = Counter()
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Журнал команд и событий CDP для tools/cdp_recorder.py
+        self.recorder = CdpRecorder(record) if record else None
+        # Клиенты браузерного эндпоинта делят multiplex постоянных подключений к Chrome
+        self.multiplexer = CdpMultiplexer(
+            f"ws://{remote_host}:{remote_port}", multiplex, self.relay, self.stats, self.recorder,
+            on_targets_changed=self.cache.invalidate_targets,
+        ) if multiplex else None
+        
+        # Все адреса Chrome в ответах (ws://host:port и ws=host:port в devtoolsFrontendUrl)
+        # заменяются на WebSocket порт прокси за один проход
+        hosts = "|".join(re.escape(h) for h in dict.fromkeys([remote_host or "localhost", "localhost", "127.0.0.1"]))
+        self._ws_url_pattern = re.compile(rf"(ws://|ws=)(?:{hosts}):{remote_port}".encode())
+        self._ws_url_replacement = rb"\g<1>localhost:" + str(self.ws_port).encode()
     
-    async def proxy_websocket(self, websocket, path):
-        """Проксирует WebSocket подключение к удаленному Chrome"""
+    def rewrite_ws_urls(self, body: bytes) -> bytes:
+        """Направить WebSocket URL из ответа Chrome на прокси"""
+        return self._ws_url_pattern.sub(self._ws_url_replacement, body)
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с keep-alive соединениями к удаленному Chrome"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        if self.recorder is not None:
+            self.recorder.close()
+    
+    async def handle_websocket(self, websocket: Any) -> None:
+        """Браузерный эндпоинт - через мультиплексор (если включен), вкладки - прямым relay"""
+        if self.farm is not None:
+            await self.proxy_farm_websocket(websocket, self.farm)
+        elif self.multiplexer is not None and websocket.request.path.startswith('/devtools/browser/'):
+            await self.multiplexer.handle(websocket)
+        else:
+            await self.proxy_websocket(websocket)
+    
+    async def proxy_farm_websocket(self, websocket: Any, farm: BrowserFarm) -> None:
+        """Подключение к наименее загруженному экземпляру фермы (вкладка - к экземпляру, где она открыта)"""
         try:
-            # Подключаемся к удаленному Chrome WebSocket
-            remote_ws_url = f"ws://{self.remote_host}:{self.remote_port}{path}"
-            print(f"Connecting to remote WebSocket: {remote_ws_url}")
-            
-            async with websockets.connect(remote_ws_url) as remote_ws:
-                print(f"Connected to remote Chrome WebSocket")
-                
-                # Проксируем сообщения в обе стороны
-                async def forward_to_remote():
-                    async for message in websocket:
-                        await remote_ws.send(message)
-                
-                async def forward_to_local():
-                    async for message in remote_ws:
-                        await websocket.send(message)
-                
-                # Запускаем проксирование в обе стороны
-                await asyncio.gather(
-                    forward_to_remote(),
-                    forward_to_local()
-                )
-                
-        except Exception as e:
+            instance, remote_ws_url = await farm.acquire(websocket.request.path)
+        except ConnectionError as e:
+            self.stats["upstream_errors"] += 1
             print(f"WebSocket proxy error: {e}")
+            await websocket.close(1011, "no browser available")
+            return
+        try:
+            await self.proxy_websocket(websocket, remote_ws_url)
+        finally:
+            farm.release(instance)
     
-    async def handle_http_request(self, request):
-        """Обрабатывает HTTP запросы к Chrome DevTools API"""
+    async def warm_multiplexer(self) -> None:
+        """Подключиться к браузеру до прихода воркеров: путь берется из /json/version"""
+        if self.multiplexer is None:
+            return
         try:
-            # Проксируем HTTP запрос к удаленному Chrome
-            remote_url = f"{self.remote_base_url}{request.path_qs}"
-            print(f"Proxying HTTP request: {remote_url}")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(remote_url) as response:
-                    content = await response.text()
-                    
-                    # Заменяем localhost на наш прокси в WebSocket URL
-                    if request.path.startswith('/json'):
-                        content = content.replace(
-                            f"ws://{self.remote_host}:{self.remote_port}",
-                            f"ws://localhost:{self.local_port}"
-                        )
-                        content = content.replace(
-                            f"ws://localhost:{self.remote_port}",
-                            f"ws://localhost:{self.local_port}"
-                        )
-                    
-                    return aiohttp.web.Response(
-                        text=content,
-                        status=response.status,
-                        headers={'Content-Type': response.headers.get('Content-Type', 'application/json')}
-                    )
+            session = await self.get_session()
+            async with session.get(f"{self.remote_base_url}/json/version") as response:
+                info = await response.json(content_type=None)
+        except (aiohttp.ClientError, ValueError) as e:
+            print(f"⚠️ Multiplexer warm-up failed: {e}")
+            return
+        await self.multiplexer.warm(urlparse(info["webSocketDebuggerUrl"]).path)
+    
+    async def proxy_websocket(self, websocket: Any, remote_ws_url: Optional[str] = None) -> None:
+        """Проксирует WebSocket подключение к удаленному Chrome"""
+        remote_ws_url = remote_ws_url or f"ws://{self.remote_host}:{self.remote_port}{websocket.request.path}"
+        self.stats["ws_connections"] += 1
+        try:
+            remote_ws = await websockets.connect(remote_ws_url, **self.relay.connection_kwargs())
+        except (OSError, InvalidHandshake, InvalidURI, asyncio.TimeoutError) as e:
+            self.stats["upstream_errors"] += 1
+            print(f"WebSocket proxy error: {remote_ws_url}: {e}")
+            await websocket.close(1011, "upstream unavailable")
+            return
         
-        except Exception as e:
-            print(f"HTTP proxy error: {e}")
-            return aiohttp.web.Response(text=f"Proxy error: {e}", status=500)
+        recording = self.recorder.connection() if self.recorder is not None else None
+        async with remote_ws:
+            # Закрытие любой стороны доходит до другой после уже принятых кадров
+            await asyncio.gather(
+                self._relay(websocket, remote_ws, "ws_to_remote", recording.command if recording else None),
+                self._relay(remote_ws, websocket, "ws_to_local", recording.incoming if recording else None),
+            )
     
-    async def start_server(self):
-        """Запускает прокси сервер"""
-        print(f"Starting Chrome proxy server...")
-        print(f"Remote Chrome: {self.remote_host}:{self.remote_port}")
-        print(f"Local proxy: localhost:{self.local_port}")
+    async def _relay(self, source: Any, target: Any, direction: str,
+                     record: Optional[Callable[[bytes], None]] = None) -> None:
+        """Одно направление: чтение и отправка в отдельных задачах через ограниченную очередь"""
+        queue: asyncio.Queue = asyncio.Queue(self.relay.queue_size)
+        watch_targets = direction == "ws_to_local"
         
-        # HTTP сервер для DevTools API
-        app = aiohttp.web.Application()
-        app.router.add_get('/{path:.*}', self.handle_http_request)
+        async def read() -> None:
+            try:
+                while True:
+                    # Кадры не декодируются: CDP передает JSON текстовыми кадрами,
+                    # они уходят дальше теми же байтами
+                    await queue.put(await source.recv(decode=False))
+            except ConnectionClosed:
+                await queue.put(_CLOSED)
         
-        # Запускаем HTTP сервер
-        runner = aiohttp.web.AppRunner(app)
-        await runner.setup()
-        site = aiohttp.web.TCPSite(runner, 'localhost', self.local_port)
-        await site.start()
+        async def write() -> None:
+            while True:
+                message = await queue.get()
+                if message is _CLOSED:
+                    await target.close(*close_code(source))
+                    return
+                if watch_targets and any(marker in message for marker in TARGET_EVENT_MARKERS):
+                    self.cache.invalidate_targets()
+                if record is not None:
+                    record(message)
+                try:
+                    await target.send(message, text=True)
+                except ConnectionClosed:
+                    # Получатель ушел - источник закроется встречным relay
+                    reader.cancel()
+                    return
+                self.stats[f"{direction}_messages"] += 1
+                self.stats[f"{direction}_bytes"] += len(message)
         
-        # WebSocket сервер для DevTools Protocol
-        ws_server = await websockets.serve(
-            self.proxy_websocket,
-            'localhost',
-            self.local_port + 1  # WebSocket на порту +1
-        )
+        reader = asyncio.create_task(read())
+        try:
+            await write()
+        finally:
+            reader.cancel()
+    
+    async def handle_http_request(self, request):
+        """Обрабатывает HTTP запросы к Chrome DevTools API"""
+        path = request.path.rstrip('/') or '/'
+        self.stats["requests"] += 1
         
-        print(f"✅ Chrome proxy server started!")
-        print(f"📡 HTTP API: http://localhost:{self.local_port}")
-        print(f"🔌 WebSocket: ws://localhost:{self.local_port + 1}")
-        print(f"🎯 Test: curl http://localhost:{self.local_port}/json/version")
+        cacheable = path in CACHED_PATHS and not request.query_string
+        if cacheable:
+            cached = self.cache.get(path)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                status, content_type, body = cached
+                return web.Response(body=body, status=status, content_type=content_type)
+            self.stats["cache_misses"] += 1
         
-        # Ждем завершения
-        await asyncio.Future()  # run forever
+        try:
+            if self.farm is not None:
+                # Адрес прокси - тот, по которому обратился клиент (раннер на другой машине)
+                status, content_type, body = await self.farm.fetch(
+                    request.method, request.path_qs, f"{request.url.host}:{self.ws_port}"
+                )
+            else:
+                status, content_type, body = await self.fetch_remote(request)
+        except (aiohttp.ClientError, ConnectionError) as e:
+            self.stats["upstream_errors"] += 1
+            print(f"HTTP proxy error: {e}")
+            return web.Response(text=f"Proxy error: {e}", status=502)
+        
+        if path.startswith(TARGET_CHANGING_PATHS):
+            self.cache.invalidate_targets()
+        if cacheable and status == 200:
+            self.cache.put(path, status, content_type, body)
+        
+        return web.Response(body=body, status=status, content_type=content_type)
+    
+    async def fetch_remote(self, request: web.Request) -> Tuple[int, str, bytes]:
+        """Проксируем HTTP запрос к удаленному Chrome"""
+        remote_url = f"{self.remote_base_url}{request.path_qs}"
+        session = await self.get_session()
+        # /json/new в новых версиях Chrome принимает только PUT
+        async with session.request(request.method, remote_url) as response:
+            body = await response.read()
+            content_type = response.content_type or 'application/json'
+            status = response.status
+        if request.path.startswith('/json'):
+            body = self.rewrite_ws_urls(body)
+        return status, content_type, body
+    
+    async def handle_farm_stats(self, request: web.Request) -> web.Response:
+        """Состояние экземпляров фермы"""
+        assert self.farm is not None
+        return web.json_response(self.farm.stats())
+    
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """Счетчики запросов и доля попаданий в кэш"""
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return web.json_response({
+            **self.stats,
+            "cache_hit_rate": round(self.stats["cache_hits"] / lookups, 3) if lookups else None,
+        })
+    
+    async def start_server(self):
+        """Запускает прокси сервер"""
+        print(f"Starting Chrome proxy server...")
+        runner = None
+        ws_server = None
+        try:
+            if self.farm is not None:
+                await self.farm.start(await self.get_session())
+            else:
+                print(f"Remote Chrome: {self.remote_host}:{self.remote_port}")
+            print(f"Local proxy: {self.host}:{self.local_port}")
+            
+            # HTTP сервер для DevTools API
+            app = web.Application()
+            app.router.add_get('/proxy/stats', self.handle_stats)
+            if self.farm is not None:
+                app.router.add_get('/farm/stats', self.handle_farm_stats)
+            app.router.add_route('*', '/{path:.*}', self.handle_http_request)
+            
+            # Запускаем HTTP сервер
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, self.local_port)
+            await site.start()
+            
+            # WebSocket сервер для DevTools Protocol
+            ws_server = await websockets.serve(
+                self.handle_websocket,
+                self.host,
+                self.ws_port,  # WebSocket на порту +1
+                **self.relay.connection_kwargs()
+            )
+            
+            print(f"✅ Chrome proxy server started!")
+            print(f"📡 HTTP API: http://localhost:{self.local_port}")
+            print(f"🔌 WebSocket: ws://localhost:{self.ws_port}")
+            print(f"🎯 Test: curl http://localhost:{self.local_port}/json/version")
+            print(f"📊 Stats: curl http://localhost:{self.local_port}/proxy/stats")
+            if self.multiplexer is not None:
+                await self.warm_multiplexer()
+                print(f"🔀 Multiplexing browser sessions over {self.multiplexer.upstreams} upstream connection(s)")
+            if self.recorder is not None:
+                print(f"📼 Recording CDP traffic to {self.recorder.path}")
+            
+            # Ждем завершения
+            await asyncio.Future()  # run forever
+        finally:
+            # Процессы фермы останавливаются и при ошибке запуска (например, занят порт)
+            if ws_server is not None:
+                ws_server.close()
+            if self.farm is not None:
+                await self.farm.stop()
+            await self.close()
+            if runner is not None:
+                await runner.cleanup()
 
 
 async def main():
     parser = argparse.ArgumentParser(description='Chrome Remote Debugging Proxy')
-    parser.add_argument('--remote-host', required=True, help='Remote Chrome host IP')
+    parser.add_argument('--remote-host', help='Remote Chrome host IP (not used with --farm)')
     parser.add_argument('--remote-port', type=int, default=9222, help='Remote Chrome port')
     parser.add_argument('--local-port', type=int, default=9223, help='Local proxy port')
+    parser.add_argument('--cache-ttl', type=float, default=1.0,
+                        help='TTL of cached /json/version and /json/list responses, seconds')
+    parser.add_argument('--multiplex', type=int, default=0, metavar='N',
+                        help='Share N persistent upstream browser connections between clients')
+    parser.add_argument('--record', metavar='PATH',
+                        help='Append CDP commands and events to a recording (see tools/cdp_recorder.py)')
+    parser.add_argument('--host', default='localhost',
+                        help='Address to listen on (0.0.0.0 to serve other machines)')
+    parser.add_argument('--farm', type=int, default=0, metavar='N',
+                        help='Launch N local headless Chrome instances instead of proxying a remote one')
+    parser.add_argument('--farm-max-sessions', type=int, default=50,
+                        help='Restart a farm instance after this many browser sessions')
+    parser.add_argument('--farm-max-rss-mb', type=int,
+                        help='Restart a farm instance when its process tree exceeds this RSS (needs psutil)')
+    parser.add_argument('--chrome-path', help='Chrome executable for the farm (default: Playwright Chromium)')
+    add_relay_arguments(parser)
     
     args = parser.parse_args()
+    if not args.farm and not args.remote_host:
+        parser.error('--remote-host is required unless --farm is used')
+    if args.farm and args.multiplex:
+        parser.error('--multiplex cannot be combined with --farm')
     
-    proxy = ChromeProxy(args.remote_host, args.remote_port, args.local_port)
+    farm = BrowserFarm(
+        args.farm,
+        executable=args.chrome_path,
+        max_sessions=args.farm_max_sessions,
+        max_rss_mb=args.farm_max_rss_mb,
+    ) if args.farm else None
+    proxy = ChromeProxy(args.remote_host, args.remote_port, args.local_port, args.cache_ttl,
+                        relay_settings(args), args.multiplex, args.record, farm, args.host)
+    task = asyncio.current_task()
+    assert task is not None
+    try:
+        # SIGTERM (CI, systemd) завершает прокси так же, как Ctrl+C: процессы фермы не остаются
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:  # Windows
+        pass
     await proxy.start_server()
 
 
+def add_relay_arguments(parser: argparse.ArgumentParser) -> None:
+    """Параметры WebSocket relay (общие с tools/proxy_benchmark.py)"""
+    defaults = RelaySettings()
+    parser.add_argument('--queue-size', type=int, default=defaults.queue_size,
+                        help='Frames buffered per direction before reading is paused')
+    parser.add_argument('--max-frame-size', type=int, default=defaults.max_frame_size,
+                        help='Maximum WebSocket frame size, bytes')
+    parser.add_argument('--compression', choices=['none', 'deflate'], default='none',
+                        help='permessage-deflate for relayed connections')
+    parser.add_argument('--uvloop', action='store_true', help='Run on uvloop event loop if installed')
+
+
+def relay_settings(args: argparse.Namespace) -> RelaySettings:
+    return RelaySettings(
+        queue_size=args.queue_size,
+        max_frame_size=args.max_frame_size,
+        compression=None if args.compression == 'none' else args.compression,
+    )
+
+
+def run(coro: Coroutine[Any, Any, T], use_uvloop: bool = False) -> T:
+    """asyncio.run, по запросу на uvloop (необязательная зависимость)"""
+    if use_uvloop:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            print("⚠️ uvloop is not installed, using default event loop")
+    return asyncio.run(coro)
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
+        run(main(), use_uvloop='--uvloop' in sys.argv)
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n🛑 Proxy server stopped") 
\ No newline at end of file
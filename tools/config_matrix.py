@@ -0,0 +1,138 @@
+"""
+Матричный прогон: несколько конфигураций (config/configurations.py) за один запуск
+Тесты собираются один раз, затем каждая конфигурация выполняет тот же список
+тестов в своем процессе pytest одновременно с остальными: окружение конфигурации,
+свой basetemp и JUnit отчет, без общего кэша pytest. Сводный отчет показывает исход
+и длительность каждого теста по конфигурациям (например, headed против headless)
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from config.configurations import CONFIGURATIONS
+from tools.distributed_runner import collect, junit_address, read_junit, run_pytest
+
+
+OUTCOME_MARKS = {"passed": "✅", "failure": "❌", "error": "💥", "skipped": "⏭️"}
+
+
+class MatrixRun:
+    """Одновременный прогон одних и тех же тестов в нескольких конфигурациях"""
+
+    def __init__(self, names: List[str], target: str, pytest_args: List[str],
+                 report_dir: str = "reports/matrix"):
+        self.names = names
+        self.target = target
+        self.pytest_args = pytest_args
+        # Абсолютный путь: процессы pytest работают в корне проекта
+        self.report_dir = Path(report_dir).resolve()
+        self.exit_codes: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self._print_lock = threading.Lock()
+
+    def log(self, name: str, line: str) -> None:
+        width = max(len(n) for n in self.names)
+        with self._print_lock:
+            print(f"[{name:<{width}}] {line}", flush=True)
+
+    def environment(self, name: str) -> Dict[str, str]:
+        """Окружение процесса конфигурации: текущее плюс переменные конфигурации"""
+        env = dict(os.environ)
+        env.update(CONFIGURATIONS[name]["env_vars"])
+        return env
+
+    def run(self) -> int:
+        # Те же аргументы отбора (-m, --shard, --browsers, ...), что у прогонов конфигураций
+        nodeids = collect(self.target, self.pytest_args)
+        print(f"🧮 {len(nodeids)} tests x {len(self.names)} configurations: {', '.join(self.names)}")
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+
+        threads = [threading.Thread(target=self._run_configuration, args=(name, nodeids), daemon=True)
+                   for name in self.names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(nodeids)
+
+    def _run_configuration(self, name: str, nodeids: List[str]) -> None:
+        basetemp = Path(tempfile.gettempdir()) / f"pytest-matrix-{os.getpid()}-{name}"
+        args = [f"--junitxml={self.report_dir / f'{name}.xml'}", f"--basetemp={basetemp}",
+                "-p", "no:cacheprovider", *self.pytest_args]
+        started = time.monotonic()
+        if nodeids:
+            self.exit_codes[name] = run_pytest(nodeids, args, lambda line: self.log(name, line),
+                                               env=self.environment(name))
+        else:
+            self.exit_codes[name] = 5
+        self.seconds[name] = time.monotonic() - started
+
+    # ---------- сводный отчет ----------
+
+    def results(self) -> Dict[str, Dict[Tuple[str, str], Tuple[str, float]]]:
+        report = {}
+        for name in self.names:
+            path = self.report_dir / f"{name}.xml"
+            report[name] = read_junit(path) if path.exists() else {}
+        return report
+
+    def report(self, nodeids: List[str]) -> int:
+        """Таблица тест x конфигурация, итоги по конфигурациям; код выхода - худший из прогонов"""
+        results = self.results()
+        rows: List[Dict[str, Any]] = []
+        for nodeid in nodeids:
+            address = junit_address(nodeid)
+            rows.append({"nodeid": nodeid,
+                         "results": {name: results[name].get(address) for name in self.names}})
+
+        summary = {}
+        for name in self.names:
+            outcomes = [row["results"][name] for row in rows if row["results"][name] is not None]
+            summary[name] = {
+                "env_vars": CONFIGURATIONS[name]["env_vars"],
+                "exit_code": self.exit_codes.get(name),
+                "passed": sum(1 for outcome, _ in outcomes if outcome == "passed"),
+                "failed": sum(1 for outcome, _ in outcomes if outcome in ("failure", "error")),
+                "skipped": sum(1 for outcome, _ in outcomes if outcome == "skipped"),
+                "not_run": len(rows) - len(outcomes),
+                "test_seconds": sum(seconds for _, seconds in outcomes),
+                "wall_seconds": self.seconds.get(name, 0.0),
+            }
+
+        with open(self.report_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump({"configurations": summary,
+                       "tests": [{"nodeid": row["nodeid"],
+                                  "results": {name: list(result) if result else None
+                                              for name, result in row["results"].items()}}
+                                 for row in rows]}, f, indent=2)
+        self.print_report(rows, summary)
+        codes = [self.exit_codes.get(name, 1) for name in self.names]
+        return 0 if all(code in (0, 5) for code in codes) else max(code for code in codes if code not in (0, 5))
+
+    def print_report(self, rows: List[Dict], summary: Dict[str, Dict]) -> None:
+        width = max(12, *(len(name) + 2 for name in self.names))
+        baseline = self.names[0]
+        print("=" * 50)
+        print(f"📊 Configuration matrix ({self.report_dir / 'summary.json'})")
+        print("".join(f"{name:>{width}}" for name in self.names) + "  Test")
+        for row in rows:
+            cells = []
+            for name in self.names:
+                result = row["results"][name]
+                cells.append(f"{OUTCOME_MARKS.get(result[0], '?')} {result[1]:.2f}s" if result else "—")
+            print("".join(f"{cell:>{width}}" for cell in cells) + f"  {row['nodeid']}")
+
+        print()
+        base_seconds = summary[baseline]["test_seconds"]
+        for name in self.names:
+            row = summary[name]
+            ratio = f", x{row['test_seconds'] / base_seconds:.2f} vs {baseline}" \
+                if name != baseline and base_seconds else ""
+            status = "✅" if row["failed"] == 0 and row["not_run"] == 0 else "❌"
+            print(f"   {status} {name}: {row['passed']} passed, {row['failed']} failed, "
+                  f"{row['skipped']} skipped, {row['not_run']} not run, "
+                  f"{row['test_seconds']:.1f}s in tests ({row['wall_seconds']:.1f}s wall{ratio})")
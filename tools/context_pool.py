@@ -0,0 +1,153 @@
+"""
+Пул теплых BrowserContext со сбросом состояния между тестами
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from playwright.sync_api import Browser, BrowserContext, Error, Frame, Page
+
+
+# Хранилища, которые очищаются через CDP для всех посещенных origin (только Chromium)
+CDP_STORAGE_TYPES = "local_storage,indexeddb,cache_storage,service_workers,websql,file_systems"
+
+
+@dataclass
+class PooledContext:
+    """Контекст из пула вместе с его основной страницей"""
+
+    context: BrowserContext
+    page: Page
+    uses: int = 0
+    origins: Set[str] = field(default_factory=set)
+
+
+class ContextPool:
+    """Пул контекстов одного воркера"""
+
+    def __init__(
+        self,
+        browser: Browser,
+        context_args: Dict[str, Any],
+        size: int = 2,
+        max_uses: int = 50,
+    ):
+        self.browser = browser
+        self.context_args = dict(context_args)
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: Deque[PooledContext] = deque()
+        self._in_use: Dict[int, PooledContext] = {}
+        self.created = 0
+        self.recycled = 0
+
+    def warm_up(self) -> None:
+        """Заранее создать `size` контекстов"""
+        while len(self._idle) < self.size:
+            self._idle.append(self._create())
+
+    def acquire(self) -> PooledContext:
+        """Взять контекст из пула (или создать новый, если пул пуст)"""
+        pooled = self._idle.popleft() if self._idle else self._create()
+        pooled.uses += 1
+        self._in_use[id(pooled.context)] = pooled
+        return pooled
+
+    def lookup(self, context: BrowserContext) -> Optional[PooledContext]:
+        """Найти выданный контекст пула (None для контекстов не из пула)"""
+        return self._in_use.get(id(context))
+
+    def release(self, pooled: PooledContext) -> None:
+        """Вернуть контекст в пул, сбросив его состояние"""
+        self._in_use.pop(id(pooled.context), None)
+
+        if pooled.uses >= self.max_uses:
+            self._discard(pooled)
+            self.recycled += 1
+        else:
+            try:
+                self._reset(pooled)
+            except Error as e:
+                # Сломанный контекст не возвращаем в пул
+                print(f"⚠️  Context reset failed, recycling: {e}")
+                self._discard(pooled)
+                self.recycled += 1
+            else:
+                self._idle.append(pooled)
+                return
+
+        if len(self._idle) < self.size:
+            self._idle.append(self._create())
+
+    def close(self) -> None:
+        """Закрыть все контексты пула"""
+        for pooled in list(self._idle) + list(self._in_use.values()):
+            self._discard(pooled)
+        self._idle.clear()
+        self._in_use.clear()
+
+    def _create(self) -> PooledContext:
+        context = self.browser.new_context(**self.context_args)
+        pooled = PooledContext(context=context, page=context.new_page())
+        self._track_origins(pooled)
+        self.created += 1
+        return pooled
+
+    def _discard(self, pooled: PooledContext) -> None:
+        try:
+            pooled.context.close()
+        except Error:
+            pass
+
+    def _track_origins(self, pooled: PooledContext) -> None:
+        """Запоминать origin всех страниц контекста для очистки хранилищ"""
+
+        def on_navigated(frame: Frame) -> None:
+            parts = urlsplit(frame.url)
+            if parts.scheme in ("http", "https"):
+                pooled.origins.add(f"{parts.scheme}://{parts.netloc}")
+
+        def on_page(page: Page) -> None:
+            page.on("framenavigated", on_navigated)
+
+        pooled.context.on("page", on_page)
+        on_page(pooled.page)
+
+    def _reset(self, pooled: PooledContext) -> None:
+        """Сбросить состояние контекста: маршруты, cookies, хранилища, страницы"""
+        context = pooled.context
+        context.unroute_all(behavior="ignoreErrors")
+        context.clear_cookies()
+        context.clear_permissions()
+
+        if pooled.page.is_closed():
+            pooled.page = context.new_page()
+        self._clear_storage(pooled)
+
+        # Новая основная страница: page.route и page.on обработчики прошлого теста
+        # остаются на странице, а не на контексте, и не должны попасть в следующий тест
+        used_pages: List[Page] = list(context.pages)
+        pooled.page = context.new_page()
+        for used_page in used_pages:
+            used_page.close()
+
+    def _clear_storage(self, pooled: PooledContext) -> None:
+        """Очистить localStorage/sessionStorage и прочие хранилища посещенных origin"""
+        page = pooled.page
+        if urlsplit(page.url).scheme in ("http", "https"):
+            page.evaluate(
+                "() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }"
+            )
+
+        if pooled.origins and self.browser.browser_type.name == "chromium":
+            session = pooled.context.new_cdp_session(page)
+            try:
+                for origin in pooled.origins:
+                    session.send(
+                        "Storage.clearDataForOrigin",
+                        {"origin": origin, "storageTypes": CDP_STORAGE_TYPES},
+                    )
+            finally:
+                session.detach()
+        pooled.origins.clear()
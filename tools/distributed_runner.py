@@ -0,0 +1,308 @@
+"""
+Распределенный прогон на нескольких удаленных браузерах
+Тесты собираются один раз, делятся между хостами (LPT из tools/sharding.py по истории
+длительностей) и выполняются локальными процессами pytest, по одному на хост, с
+--remote-browser этого хоста. Вывод процессов идет в консоль с префиксом хоста.
+Если хост перестает отвечать, его невыполненные тесты (и тесты с ошибками на нем)
+раздаются оставшимся хостам. JUnit отчеты хостов сводятся в один, с временем по хостам
+"""
+import importlib.util
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from tools.sharding import partition
+
+
+# Процессы pytest запускаются из корня проекта: node id, conftest и tools импортируются
+# одинаково, откуда бы ни был вызван раннер
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Коды выхода pytest, при которых хост считается рабочим: все прошло, есть падения, нет тестов
+HEALTHY_EXIT_CODES = (0, 1, 5)
+COLLECT_OUTPUT_ENV_VAR = "DISTRIBUTED_COLLECT_OUTPUT"
+
+
+def junit_address(nodeid: str) -> Tuple[str, str]:
+    """(classname, name) тестового случая в JUnit отчете pytest для node id"""
+    path, bracket, params = nodeid.partition("[")
+    names = path.split("::")
+    names[0] = re.sub(r"\.py$", "", names[0].replace("/", "."))
+    names[-1] += bracket + params
+    return ".".join(names[:-1]), names[-1]
+
+
+def collect(target: str, pytest_args: List[str]) -> List[str]:
+    """node id тестов, как их соберет pytest с аргументами прогона (-m, --shard, ...)
+
+    Вывод --collect-only зависит от -v в addopts, поэтому список пишет хук этого модуля,
+    подключенный через -p. Сборка идет в одном процессе: под -n N тесты собирали бы воркеры xdist.
+    """
+    with tempfile.NamedTemporaryFile(prefix="collected-", suffix=".json", delete=False) as f:
+        output = Path(f.name)
+    single_process = ["-n", "0"] if importlib.util.find_spec("xdist") else []
+    try:
+        result = subprocess.run(
+            [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", __name__, target, *pytest_args,
+             *single_process],
+            capture_output=True, text=True, check=False, cwd=PROJECT_ROOT,
+            env={**os.environ, COLLECT_OUTPUT_ENV_VAR: str(output)},
+        )
+        if result.returncode not in (0, 5):
+            raise RuntimeError(f"Test collection failed:\n{result.stdout}{result.stderr}")
+        nodeids: List[str] = json.loads(output.read_text() or "[]")
+        return nodeids
+    finally:
+        output.unlink(missing_ok=True)
+
+
+def pytest_collection_finish(session: Any) -> None:
+    """Хук для collect(): активен, только когда модуль подключен плагином через -p"""
+    output = os.getenv(COLLECT_OUTPUT_ENV_VAR)
+    if output:
+        Path(output).write_text(json.dumps([item.nodeid for item in session.items]))
+
+
+def run_pytest(nodeids: List[str], pytest_args: List[str], on_line: Callable[[str], None],
+               env: Optional[Dict[str, str]] = None) -> int:
+    """Процесс pytest для списка тестов; строки вывода передаются on_line по мере появления"""
+    # Список тестов передается файлом аргументов (@file): командная строка не ограничивает размер
+    with tempfile.NamedTemporaryFile("w", prefix="pytest-", suffix=".args", delete=False) as f:
+        f.write("\n".join(nodeids))
+    cmd = [sys.executable, "-m", "pytest", f"@{f.name}", *pytest_args]
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                              cwd=PROJECT_ROOT, env=env) as process:
+            assert process.stdout is not None
+            for line in process.stdout:
+                on_line(line.rstrip())
+            return process.wait()
+    finally:
+        Path(f.name).unlink(missing_ok=True)
+
+
+def host_reachable(address: str, timeout: float = 3.0) -> bool:
+    """Принимает ли host:port TCP подключения"""
+    host, _, port = address.rpartition(":")
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return True
+    except (OSError, ValueError):
+        return False
+
+
+class HostRun:
+    """Итоги одного хоста: пакеты тестов, время, JUnit отчеты"""
+
+    def __init__(self, host: str, url: str):
+        self.host = host
+        self.url = url
+        self.batches = 0
+        self.seconds = 0.0
+        # (номер завершения пакета в прогоне, отчет): порядок для сводного отчета
+        self.reports: List[Tuple[int, Path]] = []
+        self.failed = False
+
+
+class Scheduler:
+    """Очереди тестов хостов; тесты упавшего хоста раздаются живым"""
+
+    def __init__(self, assignments: Dict[str, List[str]], weights: Dict[str, float]):
+        self.pending = {host: list(tests) for host, tests in assignments.items()}
+        self.weights = weights
+        self.running: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.lost: List[str] = []
+        self.reassigned = 0
+        self._cond = threading.Condition()
+
+    def next_batch(self, host: str) -> Optional[List[str]]:
+        """Тесты для следующего запуска хоста; None - работы больше не будет"""
+        with self._cond:
+            while True:
+                if self.pending[host]:
+                    batch, self.pending[host] = self.pending[host], []
+                    self.running.add(host)
+                    return batch
+                if not self.running:
+                    return None
+                self._cond.wait()
+
+    def finish(self, host: str, remaining: List[str], host_failed: bool) -> None:
+        with self._cond:
+            self.running.discard(host)
+            if host_failed:
+                self.failed.add(host)
+            alive = sorted(h for h in self.pending if h not in self.failed)
+            if remaining and alive:
+                shares = partition({nodeid: self.weights.get(nodeid, 1.0) for nodeid in remaining}, len(alive))
+                for target, share in zip(alive, shares):
+                    self.pending[target].extend(share)
+                self.reassigned += len(remaining)
+            elif remaining:
+                self.lost.extend(remaining)
+            self._cond.notify_all()
+
+
+class DistributedRun:
+    """Прогон на хостах: {host: url удаленного браузера}"""
+
+    def __init__(self, hosts: Dict[str, str], target: str, pytest_args: List[str],
+                 report_dir: str = "reports/distributed", estimates: Optional[Dict[str, float]] = None):
+        self.hosts = {host: HostRun(host, url) for host, url in hosts.items()}
+        self.target = target
+        self.pytest_args = pytest_args
+        # Абсолютный путь: процессы pytest работают в корне проекта
+        self.report_dir = Path(report_dir).resolve()
+        self.estimates = estimates or {}
+        self._finished = itertools.count()
+        self._print_lock = threading.Lock()
+
+    def log(self, host: str, line: str) -> None:
+        width = max(len(name) for name in self.hosts)
+        with self._print_lock:
+            print(f"[{host:<{width}}] {line}", flush=True)
+
+    def run(self) -> int:
+        nodeids = collect(self.target, self.pytest_args)
+        median = sorted(self.estimates.values())[len(self.estimates) // 2] if self.estimates else 1.0
+        weights = {nodeid: self.estimates.get(nodeid, median) for nodeid in nodeids}
+        names = sorted(self.hosts)
+        shares = partition(weights, len(names)) if nodeids else [[] for _ in names]
+        scheduler = Scheduler(dict(zip(names, shares)), weights)
+        print(f"🌐 {len(nodeids)} tests across {len(names)} hosts: "
+              + ", ".join(f"{name} ({len(share)})" for name, share in zip(names, shares)))
+
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        threads = [threading.Thread(target=self._host_loop, args=(host, scheduler), daemon=True)
+                   for host in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.merge(nodeids, scheduler, time.monotonic() - started)
+
+    def _host_loop(self, host: str, scheduler: Scheduler) -> None:
+        run = self.hosts[host]
+        while True:
+            batch = scheduler.next_batch(host)
+            if batch is None:
+                return
+            run.batches += 1
+            report = self.report_dir / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', host)}-{run.batches}.xml"
+            started = time.monotonic()
+            exit_code = self._run_batch(run, batch, report)
+            run.seconds += time.monotonic() - started
+            # Номер - до finish: перезапуск тестов упавшего хоста всегда завершится позже
+            run.reports.append((next(self._finished), report))
+
+            results = read_junit(report) if report.exists() else {}
+            host_failed = exit_code not in HEALTHY_EXIT_CODES or not host_reachable(_address(run.url))
+            remaining = []
+            if host_failed:
+                # Ошибки на отказавшем хосте - скорее всего из-за отказа, а не теста
+                remaining = [nodeid for nodeid in batch
+                             if results.get(junit_address(nodeid), ("error",))[0] == "error"]
+                run.failed = True
+                self.log(host, f"❌ host failed (exit code {exit_code}), reassigning {len(remaining)} tests")
+            scheduler.finish(host, remaining, host_failed)
+            if host_failed:
+                return
+
+    def _run_batch(self, run: HostRun, batch: List[str], report: Path) -> int:
+        args = [f"--remote-browser={run.url}", f"--junitxml={report}", "-p", "no:cacheprovider", *self.pytest_args]
+        return run_pytest(batch, args, lambda line: self.log(run.host, line))
+
+    # ---------- сводный отчет ----------
+
+    def merge(self, nodeids: List[str], scheduler: Scheduler, wall_seconds: float) -> int:
+        """Сводный JUnit и JSON отчет; код выхода - как у pytest для всего прогона"""
+        root = ET.Element("testsuites")
+        # Тест, перезапущенный на другом хосте, учитывается по результату последнего по времени пакета
+        reports = sorted((finished, host, report) for host, run in self.hosts.items()
+                         for finished, report in run.reports)
+        latest: Dict[Tuple[str, str], Tuple[str, ET.Element]] = {}
+        for _, host, report in reports:
+            if not report.exists():
+                continue
+            for case in ET.parse(report).iter("testcase"):
+                latest[(case.get("classname", ""), case.get("name", ""))] = (host, case)
+
+        hosts: Dict[str, Dict[str, Any]] = {}
+        summary = {"wall_seconds": wall_seconds, "hosts": hosts, "lost": scheduler.lost,
+                   "reassigned": scheduler.reassigned}
+        totals = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+        for host in sorted(self.hosts):
+            run = self.hosts[host]
+            cases = [case for owner, case in latest.values() if owner == host]
+            counts = {
+                "tests": len(cases),
+                "failures": sum(1 for case in cases if case.find("failure") is not None),
+                "errors": sum(1 for case in cases if case.find("error") is not None),
+                "skipped": sum(1 for case in cases if case.find("skipped") is not None),
+            }
+            test_seconds = sum(float(case.get("time", 0)) for case in cases)
+            suite = ET.SubElement(root, "testsuite", {key: str(value) for key, value in counts.items()},
+                                  name="pytest", hostname=host, time=f"{run.seconds:.3f}")
+            suite.extend(cases)
+            for key, value in counts.items():
+                totals[key] += value
+            hosts[host] = {**counts, "url": run.url, "batches": run.batches, "failed": run.failed,
+                                      "seconds": run.seconds, "test_seconds": test_seconds}
+        root.attrib.update({key: str(value) for key, value in totals.items()})
+        root.set("time", f"{wall_seconds:.3f}")
+
+        junit_path = self.report_dir / "junit.xml"
+        ET.ElementTree(root).write(junit_path, encoding="utf-8", xml_declaration=True)
+        with open(self.report_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        self.print_summary(summary, totals, junit_path)
+        missing = len(nodeids) - totals["tests"]
+        return 0 if not (totals["failures"] or totals["errors"] or missing > 0) else 1
+
+    def print_summary(self, summary: Dict, totals: Dict[str, int], junit_path: Path) -> None:
+        print("=" * 50)
+        print(f"📊 Distributed run: {totals['tests']} tests, {totals['failures']} failed, "
+              f"{totals['errors']} errors in {summary['wall_seconds']:.1f}s")
+        for host, row in summary["hosts"].items():
+            status = "❌" if row["failed"] else "✅"
+            print(f"   {status} {host}: {row['tests']} tests, {row['failures'] + row['errors']} failed, "
+                  f"{row['seconds']:.1f}s ({row['batches']} runs)")
+        if summary["reassigned"]:
+            print(f"   🔁 Reassigned from failed hosts: {summary['reassigned']} tests")
+        if summary["lost"]:
+            print(f"   ⚠️ Not run (no healthy hosts left): {len(summary['lost'])} tests")
+        print(f"   📄 {junit_path}")
+
+
+def read_junit(path: Path) -> Dict[Tuple[str, str], Tuple[str, float]]:
+    """Исходы тестов JUnit отчета: (classname, name) -> (passed/error/failure/skipped, секунды)"""
+    try:
+        cases = ET.parse(path).iter("testcase")
+    except ET.ParseError:
+        return {}
+    results = {}
+    for case in cases:
+        outcome = "passed"
+        for tag in ("error", "failure", "skipped"):
+            if case.find(tag) is not None:
+                outcome = tag
+                break
+        results[(case.get("classname", ""), case.get("name", ""))] = (outcome, float(case.get("time", 0)))
+    return results
+
+
+def _address(url: str) -> str:
+    """host:port из URL удаленного браузера"""
+    return url.split("://", 1)[-1].split("/", 1)[0]
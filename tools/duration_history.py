@@ -0,0 +1,153 @@
+"""
+История длительностей и исходов тестов (SQLite) для планирования прогона
+Тесты упорядочиваются от самых долгих к коротким, чтобы при динамической раздаче
+воркерам pytest-xdist долгие тесты стартовали первыми (LPT), а по итогам прогона
+сравнивается предсказанный и фактический makespan
+"""
+import sqlite3
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytest
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    nodeid TEXT NOT NULL,
+    config_key TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup ON results (config_key, nodeid, recorded_at);
+"""
+
+
+def history_key(mode: str, browser: str, headless: Optional[bool]) -> str:
+    """Ключ конфигурации: режим/браузер/headless ('remote/chromium/n/a' для удаленного браузера)"""
+    if headless is None:
+        display = "n/a"
+    else:
+        display = "headless" if headless else "headed"
+    return f"{mode}/{browser}/{display}"
+
+
+def lpt_makespan(durations: Iterable[float], workers: int) -> float:
+    """Makespan раздачи тестов longest-first на `workers` воркеров"""
+    loads = [0.0] * max(workers, 1)
+    for duration in sorted(durations, reverse=True):
+        loads[loads.index(min(loads))] += duration
+    return max(loads)
+
+
+class DurationHistory:
+    """Хранилище результатов тестов по конфигурациям"""
+
+    def __init__(self, db_path: str, window: int = 5):
+        self.db_path = Path(db_path)
+        self.window = window
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def record(self, config_key: str, results: List[Tuple[str, str, float]]) -> None:
+        """Сохранить результаты прогона: (nodeid, outcome, duration)"""
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO results (nodeid, config_key, outcome, duration, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                [(nodeid, config_key, outcome, duration, now) for nodeid, outcome, duration in results],
+            )
+
+    def estimates(self, config_key: str) -> Dict[str, float]:
+        """Ожидаемая длительность тестов: медиана последних `window` выполнений (без skipped)"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT nodeid, duration FROM results WHERE config_key = ? AND outcome != 'skipped' "
+                "ORDER BY recorded_at DESC",
+                (config_key,),
+            ).fetchall()
+        recent: Dict[str, List[float]] = defaultdict(list)
+        for nodeid, duration in rows:
+            if len(recent[nodeid]) < self.window:
+                recent[nodeid].append(duration)
+        return {nodeid: statistics.median(durations) for nodeid, durations in recent.items()}
+
+
+class DurationScheduler:
+    """Плагин pytest: порядок longest-first по истории и отчет о makespan"""
+
+    def __init__(self, history: DurationHistory, config_key: str):
+        self.history = history
+        self.config_key = config_key
+        self.estimates = history.estimates(config_key)
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.outcomes: Dict[str, str] = {}
+        self.worker_busy: Dict[str, float] = defaultdict(float)
+        self.predicted: Optional[float] = None
+        self.started = time.monotonic()
+
+    def estimate(self, nodeid: str) -> float:
+        """Ожидаемая длительность теста; новым тестам - медиана известных"""
+        if nodeid in self.estimates:
+            return self.estimates[nodeid]
+        return statistics.median(self.estimates.values()) if self.estimates else 0.0
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: List[pytest.Item]) -> None:
+        # Сортировка стабильная: все воркеры xdist получают одинаковый порядок
+        items.sort(key=lambda item: self.estimate(item.nodeid), reverse=True)
+        if not hasattr(config, "workerinput"):
+            workers = _worker_count(config)
+            self.predicted = lpt_makespan((self.estimate(item.nodeid) for item in items), workers)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node: Any, ids: List[str]) -> None:
+        """Прогноз для прогона с xdist: контроллер сам тесты не собирает"""
+        if self.predicted is None:
+            self.predicted = lpt_makespan((self.estimate(nodeid) for nodeid in ids), _worker_count(node.config))
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        self.durations[report.nodeid] += report.duration
+        worker = getattr(report, "node", None)
+        self.worker_busy[worker.gateway.id if worker else "main"] += report.duration
+        if report.when == "call" or report.outcome != "passed":
+            # Исход теста - фаза call, либо первая упавшая или пропущенная фаза
+            self.outcomes.setdefault(report.nodeid, report.outcome)
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        if hasattr(session.config, "workerinput") or not self.durations:
+            return
+        self.history.record(
+            self.config_key,
+            [(nodeid, self.outcomes.get(nodeid, "passed"), duration) for nodeid, duration in self.durations.items()],
+        )
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if hasattr(terminalreporter.config, "workerinput") or not self.durations:
+            return
+        tr = terminalreporter
+        tr.write_sep("=", "duration history")
+        tr.write_line(f"Configuration: {self.config_key} ({len(self.estimates)} tests with history)")
+        if self.predicted is not None and self.estimates:
+            tr.write_line(f"Predicted makespan (LPT): {self.predicted:.1f}s")
+        else:
+            tr.write_line("Predicted makespan: no history yet")
+        tr.write_line(
+            f"Actual makespan: {max(self.worker_busy.values()):.1f}s busiest worker, "
+            f"{time.monotonic() - self.started:.1f}s wall"
+        )
+
+
+def _worker_count(config: pytest.Config) -> int:
+    """Число воркеров xdist (1 без xdist)"""
+    try:
+        return max(int(config.getoption("numprocesses") or 1), 1)
+    except (ValueError, TypeError):
+        return 1
@@ -0,0 +1,161 @@
+"""
+Пул удаленных браузеров: проверка доступности, балансировка воркеров и failover
+Эндпоинты из remote_settings.endpoints проверяются одновременно (TCP connect + RTT),
+результаты кэшируются на диске на короткое время, чтобы все воркеры xdist
+опирались на одну проверку и получали согласованное распределение
+"""
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+
+@dataclass
+class Endpoint:
+    """Удаленный браузер: URL, вес (доля нагрузки) и емкость (максимум воркеров)"""
+
+    url: str
+    weight: float = 1.0
+    capacity: Optional[int] = None
+
+
+@dataclass
+class ProbeResult:
+    """Результат проверки эндпоинта"""
+
+    url: str
+    healthy: bool
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+def probe(endpoint: Endpoint, timeout: float) -> ProbeResult:
+    """Доступность и время установки TCP соединения с эндпоинтом"""
+    parsed = urlparse(endpoint.url)
+    default_port = 443 if parsed.scheme in ("https", "wss") else 80
+    started = time.perf_counter()
+    try:
+        connection = socket.create_connection((parsed.hostname, parsed.port or default_port), timeout)
+    except OSError as e:
+        return ProbeResult(endpoint.url, healthy=False, error=str(e) or type(e).__name__)
+    latency_ms = (time.perf_counter() - started) * 1000
+    connection.close()
+    return ProbeResult(endpoint.url, healthy=True, latency_ms=round(latency_ms, 1))
+
+
+def probe_all(endpoints: List[Endpoint], timeout: float) -> List[ProbeResult]:
+    """Проверить все эндпоинты одновременно
+
+    Блокирующие проверки в потоках, а не asyncio: пул вызывается из фикстур после
+    запуска sync Playwright, у которого в этом потоке уже работает event loop.
+    """
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        return list(executor.map(lambda endpoint: probe(endpoint, timeout), endpoints))
+
+
+def assign_workers(endpoints: List[Endpoint], results: Dict[str, ProbeResult], workers: int) -> List[Endpoint]:
+    """Детерминированное распределение воркеров 0..workers-1 по здоровым эндпоинтам
+
+    Каждый следующий воркер уходит на эндпоинт с наименьшей нагрузкой на единицу веса
+    (при равенстве - с меньшей задержкой), заполненные до емкости пропускаются,
+    пока есть свободные.
+    """
+    healthy = [endpoint for endpoint in endpoints if results.get(endpoint.url, ProbeResult(endpoint.url, False)).healthy]
+    if not healthy:
+        raise ConnectionError("No healthy remote browser endpoints")
+
+    loads = {endpoint.url: 0 for endpoint in healthy}
+    plan = []
+    for _ in range(workers):
+        free = [e for e in healthy if e.capacity is None or loads[e.url] < e.capacity]
+        candidates = free or healthy
+        chosen = min(
+            candidates,
+            key=lambda e: ((loads[e.url] + 1) / e.weight, results[e.url].latency_ms or 0.0, e.url),
+        )
+        loads[chosen.url] += 1
+        plan.append(chosen)
+    return plan
+
+
+class EndpointPool:
+    """Эндпоинты удаленных браузеров с кэшем проверок и выбором для воркера"""
+
+    def __init__(self, endpoints: List[Endpoint], probe_timeout: float = 2.0, cache_ttl: float = 30.0):
+        if not endpoints:
+            raise ValueError("Remote endpoint pool is empty")
+        self.endpoints = endpoints
+        self.probe_timeout = probe_timeout
+        self.cache_ttl = cache_ttl
+        key = hashlib.sha256("|".join(e.url for e in endpoints).encode()).hexdigest()[:16]
+        self.cache_path = Path(tempfile.gettempdir()) / f"remote-endpoints-{key}.json"
+        self.failed: List[str] = []
+
+    def results(self, refresh: bool = False) -> Dict[str, ProbeResult]:
+        """Результаты проверки: из кэша, если он свежее cache_ttl"""
+        if not refresh:
+            cached = self._read_cache()
+            if cached is not None:
+                return cached
+        results = {r.url: r for r in probe_all(self.endpoints, self.probe_timeout)}
+        self._write_cache(results)
+        return results
+
+    def _read_cache(self) -> Optional[Dict[str, ProbeResult]]:
+        try:
+            if time.time() - self.cache_path.stat().st_mtime > self.cache_ttl:
+                return None
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {url: ProbeResult(**result) for url, result in data.items()}
+
+    def _write_cache(self, results: Dict[str, ProbeResult]) -> None:
+        # Запись через временный файл: воркеры не прочитают недописанный кэш
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({url: vars(result) for url, result in results.items()}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def endpoint_for_worker(self, index: int, workers: int) -> Endpoint:
+        """Эндпоинт воркера по общему для всех воркеров плану распределения"""
+        plan = assign_workers(self.endpoints, self.results(), max(workers, index + 1))
+        return plan[index]
+
+    def failover(self, failed_url: str) -> Endpoint:
+        """Другой здоровый эндпоинт после обрыва failed_url (проверка без кэша)"""
+        self.failed.append(failed_url)
+        results = self.results(refresh=True)
+        alive = [e for e in self.endpoints if e.url not in self.failed and results[e.url].healthy]
+        if not alive:
+            raise ConnectionError(f"No remote browser endpoint left after {failed_url} dropped")
+        return min(alive, key=lambda e: (results[e.url].latency_ms or 0.0, e.url))
+
+
+class RemoteBrowserSession:
+    """Браузер воркера на эндпоинте пула с переподключением к другому эндпоинту при обрыве"""
+
+    def __init__(self, pool: EndpointPool, connect: Callable[[str], Any], index: int, workers: int):
+        self.pool = pool
+        self._connect = connect
+        self.endpoint = pool.endpoint_for_worker(index, workers)
+        self.browser = connect(self.endpoint.url)
+        self.failovers = 0
+
+    def current(self) -> Any:
+        """Подключенный браузер; после обрыва - браузер на другом эндпоинте"""
+        if not self.browser.is_connected():
+            dropped = self.endpoint.url
+            self.endpoint = self.pool.failover(dropped)
+            self.browser = self._connect(self.endpoint.url)
+            self.failovers += 1
+            print(f"\n🔀 Remote browser {dropped} dropped, failed over to {self.endpoint.url}")
+        return self.browser
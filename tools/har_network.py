@@ -0,0 +1,108 @@
+"""
+Запись и воспроизведение сетевого трафика тестов через HAR
+record - HAR каждого теста пишется отдельно, в конце сессии собирается архив на модуль
+replay - ответы отдаются из архива модуля через route_from_har
+"""
+import hashlib
+import json
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from playwright.sync_api import BrowserContext
+
+
+NETWORK_MODES = ["live", "record", "replay"]
+HAR_MATCH_MODES = ["strict", "lenient"]
+
+
+class HarStore:
+    """Каталог с HAR архивами модулей"""
+
+    def __init__(self, har_dir: str = "har"):
+        self.har_dir = Path(har_dir)
+        self.recordings_dir = self.har_dir / ".recording"
+
+    def archive_path(self, module: str) -> Path:
+        """Сжатый HAR архив модуля"""
+        return self.har_dir / f"{module}.har.zip"
+
+    def recording_path(self, module: str, nodeid: str) -> Path:
+        """HAR одного теста во время записи"""
+        digest = hashlib.sha1(nodeid.encode("utf-8")).hexdigest()[:10]
+        name = re.sub(r"[^\w.-]+", "_", nodeid.split("::")[-1])[:80]
+        path = self.recordings_dir / module / f"{name}-{digest}.har"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def record_args(self, module: str, nodeid: str) -> Dict[str, Any]:
+        """Аргументы new_context() для записи HAR теста"""
+        return {
+            "record_har_path": str(self.recording_path(module, nodeid)),
+            "record_har_content": "embed",
+            "record_har_mode": "full",
+        }
+
+    def replay_args(self, module: str, match: str = "strict") -> Tuple[Path, Dict[str, Any]]:
+        """Архив модуля и аргументы route_from_har() для воспроизведения"""
+        archive = self.archive_path(module)
+        if not archive.exists():
+            raise FileNotFoundError(
+                f"HAR archive not found: {archive} (run with --network=record first)"
+            )
+        # strict - неизвестные запросы обрываются (работает без сети),
+        # lenient - уходят в сеть
+        return archive, {"not_found": "abort" if match == "strict" else "fallback"}
+
+    def replay(self, context: BrowserContext, module: str, match: str = "strict") -> None:
+        """Подключить воспроизведение HAR модуля к контексту"""
+        archive, kwargs = self.replay_args(module, match)
+        context.route_from_har(archive, **kwargs)
+
+    def clear_recordings(self) -> None:
+        """Удалить незавершенные записи прошлых запусков"""
+        shutil.rmtree(self.recordings_dir, ignore_errors=True)
+
+    def merge_recordings(self) -> List[Path]:
+        """Собрать записанные HAR тестов в сжатые архивы по модулям"""
+        archives: List[Path] = []
+        if not self.recordings_dir.exists():
+            return archives
+
+        for module_dir in sorted(self.recordings_dir.iterdir()):
+            har_files = sorted(module_dir.glob("*.har"))
+            if not har_files:
+                continue
+            archive = self.archive_path(module_dir.name)
+            self._write_archive(archive, module_dir.name, self._merge(har_files))
+            archives.append(archive)
+
+        self.clear_recordings()
+        return archives
+
+    def _merge(self, har_files: List[Path]) -> Dict[str, Any]:
+        """Объединить entries нескольких HAR, последний ответ на запрос побеждает"""
+        merged: Dict[str, Any] = {}
+        entries: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+        for har_file in har_files:
+            with open(har_file, "r", encoding="utf-8") as f:
+                har = json.load(f)
+            if not merged:
+                merged = {key: value for key, value in har["log"].items() if key != "entries"}
+            for entry in har["log"]["entries"]:
+                request = entry["request"]
+                post_data = request.get("postData", {}).get("text", "")
+                entries[(request["method"], request["url"], post_data)] = entry
+
+        merged["entries"] = list(entries.values())
+        return {"log": merged}
+
+    def _write_archive(self, archive: Path, module: str, har: Dict[str, Any]) -> None:
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = archive.with_suffix(".tmp")
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f"{module}.har", json.dumps(har))
+        tmp_path.replace(archive)
@@ -0,0 +1,483 @@
+"""
+Локальная замена the-internet.herokuapp.com для детерминированных тестов
+Асинхронный HTTP сервер в фоновом потоке, у каждого маршрута настраиваются
+задержка, разброс задержки, размер ответа и доля ошибок
+"""
+import asyncio
+import random
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclass
+class RouteSettings:
+    """Поведение маршрута"""
+
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    payload_bytes: int = 0
+    failure_rate: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], base: Optional["RouteSettings"] = None) -> "RouteSettings":
+        base = base or cls()
+        return cls(
+            latency_ms=data.get("latency_ms", base.latency_ms),
+            jitter_ms=data.get("jitter_ms", base.jitter_ms),
+            payload_bytes=data.get("payload_bytes", base.payload_bytes),
+            failure_rate=data.get("failure_rate", base.failure_rate),
+        )
+
+
+@dataclass
+class Request:
+    """Разобранный HTTP запрос"""
+
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+
+    def form(self) -> Dict[str, str]:
+        """Поля формы application/x-www-form-urlencoded"""
+        fields = parse_qs(self.body.decode("utf-8", errors="replace"))
+        return {key: values[0] for key, values in fields.items()}
+
+    def cookie(self, name: str) -> Optional[str]:
+        for part in self.headers.get("cookie", "").split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == name:
+                return value
+        return None
+
+
+@dataclass
+class Response:
+    """HTTP ответ"""
+
+    status: int = 200
+    body: str = ""
+    content_type: str = "text/html; charset=utf-8"
+    headers: Optional[Dict[str, str]] = None
+
+
+STATUS_TEXT = {
+    200: "OK", 301: "Moved Permanently", 303: "See Other", 400: "Bad Request", 401: "Unauthorized",
+    404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+}
+
+VALID_USERNAME = "tomsmith"
+VALID_PASSWORD = "SuperSecretPassword!"
+BASIC_AUTH_HEADER = "Basic YWRtaW46YWRtaW4="  # admin:admin
+
+# Время "загрузки" на страницах /dynamic_loading/N (на оригинальном сайте - около 5 с)
+DYNAMIC_LOADING_MS = 1000
+
+FORK_ME_IMAGE = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+
+EXAMPLES = [
+    ("A/B Testing", "/abtest"),
+    ("Add/Remove Elements", "/add_remove_elements/"),
+    ("Basic Auth", "/basic_auth"),
+    ("Broken Images", "/broken_images"),
+    ("Challenging DOM", "/challenging_dom"),
+    ("Checkboxes", "/checkboxes"),
+    ("Disappearing Elements", "/disappearing_elements"),
+    ("Dropdown", "/dropdown"),
+    ("Dynamic Content", "/dynamic_content"),
+    ("Dynamic Loading", "/dynamic_loading"),
+    ("Entry Ad", "/entry_ad"),
+    ("Exit Intent", "/exit_intent"),
+    ("Form Authentication", "/login"),
+    ("Hovers", "/hovers"),
+    ("Inputs", "/inputs"),
+    ("JavaScript onload event error", "/javascript_error"),
+    ("Key Presses", "/key_presses"),
+    ("Slow Resources", "/slow"),
+    ("Status Codes", "/status_codes"),
+    ("Typos", "/typos"),
+]
+
+LOREM = [
+    "Accusantium eius ut architecto neque vel voluptatem vel nam eos.",
+    "Omnis fugiat porro vero quas tempora quis eveniet ab officia.",
+    "Sunt nostrum et voluptate fugiat similique dolore quia deleniti.",
+    "Quia et quas rerum voluptatem est dolor ut et sint qui laudantium.",
+    "Et numquam molestiae omnis aut sit autem eum voluptate nostrum.",
+]
+
+
+def layout(body: str, head: str = "") -> str:
+    """Общий каркас страниц the-internet"""
+    return f"""<!DOCTYPE html>
+<html><head><title>The Internet</title>{head}</head>
+<body>
+<a href="https://github.com/tourdedave/the-internet"><img style="position: absolute; top: 0; right: 0; border: 0;" src="{FORK_ME_IMAGE}" alt="Fork me on GitHub"></a>
+<div class="row"><div id="content" class="large-12 columns">
+{body}
+</div></div>
+<div id="page-footer"><hr><div style="text-align: center;">Powered by <a target="_blank" href="http://elementalselenium.com/">Elemental Selenium</a></div></div>
+</body></html>"""
+
+
+class TheInternetApp:
+    """Страницы the-internet, которые использует тестовый набор"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.sessions: set = set()
+        self.routes: Dict[str, Callable[[Request], Response]] = {
+            "/": self.index,
+            "/abtest": lambda r: self.simple("<h3>A/B Test Variation 1</h3><p>Also known as split testing.</p>"),
+            "/add_remove_elements/": self.add_remove_elements,
+            "/basic_auth": self.basic_auth,
+            "/broken_images": lambda r: self.simple(
+                '<h3>Broken Images</h3><img src="/asdf.jpg"><img src="/hjkl.jpg"><img src="/img/avatar-blank.jpg">'
+            ),
+            "/challenging_dom": self.challenging_dom,
+            "/checkboxes": lambda r: self.simple(
+                '<h3>Checkboxes</h3><form id="checkboxes"><input type="checkbox"> checkbox 1<br>'
+                '<input type="checkbox" checked> checkbox 2</form>'
+            ),
+            "/disappearing_elements": self.disappearing_elements,
+            "/dropdown": lambda r: self.simple(
+                '<h3>Dropdown List</h3><select id="dropdown">'
+                '<option value="" disabled selected>Please select an option</option>'
+                '<option value="1">Option 1</option><option value="2">Option 2</option></select>'
+            ),
+            "/dynamic_content": self.dynamic_content,
+            "/dynamic_loading": lambda r: self.simple(
+                "<h3>Dynamically Loaded Page Elements</h3>"
+                '<a href="/dynamic_loading/1">Example 1: Element on page that is hidden</a><br>'
+                '<a href="/dynamic_loading/2">Example 2: Element rendered after the fact</a>'
+            ),
+            "/dynamic_loading/1": lambda r: self.dynamic_loading(rendered=True),
+            "/dynamic_loading/2": lambda r: self.dynamic_loading(rendered=False),
+            "/entry_ad": self.entry_ad,
+            "/exit_intent": self.exit_intent,
+            "/login": self.login,
+            "/authenticate": self.authenticate,
+            "/secure": self.secure,
+            "/logout": self.logout,
+            "/hovers": self.hovers,
+            "/inputs": lambda r: self.simple('<h3>Inputs</h3><p>Number</p><input type="number">'),
+            "/javascript_error": lambda r: Response(
+                body=layout("<p>This page has a JavaScript error in the onload event.</p>")
+                .replace("<body>", '<body onload="loadError()">')
+            ),
+            "/key_presses": self.key_presses,
+            "/slow": lambda r: self.simple(
+                "<h3>Slow Resources</h3><p>This example loads a resource that takes time to respond.</p>"
+                '<img src="/slow_external" alt="">'
+            ),
+            "/slow_external": lambda r: Response(body="", content_type="image/gif"),
+            "/status_codes": self.status_codes,
+            "/typos": self.typos,
+        }
+
+    def handle(self, request: Request) -> Response:
+        """Найти обработчик маршрута"""
+        handler = self.routes.get(request.path)
+        if handler is None and request.path.startswith("/status_codes/"):
+            handler = self.status_code_page
+        if handler is None:
+            return Response(status=404, body="<h1>Not Found</h1>")
+        return handler(request)
+
+    def simple(self, body: str) -> Response:
+        return Response(body=layout(body))
+
+    def redirect(self, location: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return Response(status=303, headers={"Location": location, **(headers or {})})
+
+    def index(self, request: Request) -> Response:
+        links = "\n".join(f'<li><a href="{path}">{name}</a></li>' for name, path in EXAMPLES)
+        return self.simple(
+            '<h1 class="heading">Welcome to the-internet</h1>'
+            f"<h2>Available Examples</h2><ul>{links}</ul>"
+        )
+
+    def add_remove_elements(self, request: Request) -> Response:
+        return Response(body=layout(
+            '<h3>Add/Remove Elements</h3><button onclick="addElement()">Add Element</button>'
+            '<div id="elements"></div>',
+            head="<script>function addElement(){var b=document.createElement('button');"
+                 "b.className='added-manually';b.textContent='Delete';b.onclick=function(){b.remove()};"
+                 "document.getElementById('elements').appendChild(b)}</script>",
+        ))
+
+    def basic_auth(self, request: Request) -> Response:
+        if request.headers.get("authorization") == BASIC_AUTH_HEADER:
+            return self.simple("<h3>Basic Auth</h3><p>Congratulations! You must have the proper credentials.</p>")
+        return Response(
+            status=401, body="Not authorized",
+            headers={"WWW-Authenticate": 'Basic realm="Restricted Area"'},
+        )
+
+    def challenging_dom(self, request: Request) -> Response:
+        rows = "".join(
+            f"<tr><td>Iuvaret{i}</td><td>Apeirian{i}</td><td>Adipisci{i}</td>"
+            f'<td><a href="#edit">edit</a> <a href="#delete">delete</a></td></tr>'
+            for i in range(10)
+        )
+        return self.simple(
+            '<h3>Challenging DOM</h3><a class="button">foo</a><a class="button alert">bar</a>'
+            f'<a class="button success">baz</a><table>{rows}</table><canvas id="canvas"></canvas>'
+        )
+
+    def disappearing_elements(self, request: Request) -> Response:
+        items = ["Home", "About", "Contact Us", "Portfolio"]
+        if self.rng.random() < 0.5:
+            items.append("Gallery")
+        links = "".join(f'<li><a href="/{item.lower()}/">{item}</a></li>' for item in items)
+        return self.simple(f"<h3>Disappearing Elements</h3><ul>{links}</ul>")
+
+    def dynamic_content(self, request: Request) -> Response:
+        rows = "".join(
+            f'<div class="row"><div class="large-2 columns"><img src="{FORK_ME_IMAGE}" alt=""></div>'
+            f'<div class="large-10 columns">{self.rng.choice(LOREM)}</div></div>'
+            for _ in range(3)
+        )
+        return self.simple(f"<h3>Dynamic Content</h3>{rows}")
+
+    def dynamic_loading(self, rendered: bool) -> Response:
+        """Пример 1 - #finish скрыт на странице, пример 2 - создается после загрузки"""
+        title = "Element on page that is hidden" if rendered else "Element rendered after the fact"
+        finish = '<div id="finish" style="display:none"><h4>Hello World!</h4></div>' if rendered else ""
+        show = ("document.getElementById('finish').style.display='block'" if rendered else
+                "var f=document.createElement('div');f.id='finish';f.innerHTML='<h4>Hello World!</h4>';"
+                "document.getElementById('content').appendChild(f)")
+        return Response(body=layout(
+            f"<h3>Dynamically Loaded Page Elements</h3><h4>Example {1 if rendered else 2}: {title}</h4>"
+            '<div id="start"><button onclick="start()">Start</button></div>'
+            f'<div id="loading" style="display:none">Loading... </div>{finish}',
+            head="<script>function start(){document.getElementById('start').style.display='none';"
+                 "document.getElementById('loading').style.display='block';setTimeout(function(){"
+                 f"document.getElementById('loading').style.display='none';{show}}},{DYNAMIC_LOADING_MS})}}</script>",
+        ))
+
+    def entry_ad(self, request: Request) -> Response:
+        return Response(body=layout(
+            "<h3>Entry Ad</h3><p>Displays an ad on page load.</p>"
+            '<div id="modal" class="modal" style="display: none;"><div class="modal-title"><h3>This is a modal window</h3></div>'
+            '<div class="modal-footer"><p onclick="document.getElementById(\'modal\').style.display=\'none\'">Close</p></div></div>',
+            head="<script>window.addEventListener('load',function(){setTimeout(function(){"
+                 "document.getElementById('modal').style.display='block'},500)})</script>",
+        ))
+
+    def exit_intent(self, request: Request) -> Response:
+        return Response(body=layout(
+            "<h3>Exit Intent</h3><p>Mouse out of the viewport pane and see a modal window appear.</p>"
+            '<div id="ouibounce-modal" style="display: none;"><div class="modal-title"><h3>This is a modal window</h3></div>'
+            '<div class="modal-footer"><p onclick="this.parentNode.parentNode.style.display=\'none\'">Close</p></div></div>',
+            head="<script>document.addEventListener('mouseleave',function(){"
+                 "document.getElementById('ouibounce-modal').style.display='block'})</script>",
+        ))
+
+    def login(self, request: Request, flash: str = "") -> Response:
+        flash = flash or {"invalid": "Your username is invalid!", "logout": "You logged out of the secure area!"}.get(
+            request.query.get("flash", [""])[0], ""
+        )
+        flash_html = f'<div id="flash" class="flash">{flash}</div>' if flash else ""
+        return self.simple(
+            f"{flash_html}<h2>Login Page</h2>"
+            '<form name="login" id="login" action="/authenticate" method="post">'
+            '<label for="username">Username</label><input type="text" name="username" id="username">'
+            '<label for="password">Password</label><input type="password" name="password" id="password">'
+            '<button class="radius" type="submit"><i class="fa fa-2x fa-sign-in"> Login</i></button></form>'
+        )
+
+    def authenticate(self, request: Request) -> Response:
+        if request.method != "POST":
+            return Response(status=405, body="Method Not Allowed")
+        form = request.form()
+        if form.get("username") == VALID_USERNAME and form.get("password") == VALID_PASSWORD:
+            token = secrets.token_hex(16)
+            self.sessions.add(token)
+            return self.redirect("/secure", {"Set-Cookie": f"rack.session={token}; Path=/; HttpOnly"})
+        return self.redirect("/login?flash=invalid")
+
+    def secure(self, request: Request) -> Response:
+        if request.cookie("rack.session") not in self.sessions:
+            return self.redirect("/login")
+        return self.simple(
+            '<div id="flash" class="flash success">You logged into a secure area!</div>'
+            "<h2>Secure Area</h2><h4>Welcome to the Secure Area. When you are done click logout below.</h4>"
+            '<a class="button secondary radius" href="/logout">Logout</a>'
+        )
+
+    def logout(self, request: Request) -> Response:
+        self.sessions.discard(request.cookie("rack.session"))
+        return self.redirect("/login?flash=logout")
+
+    def hovers(self, request: Request) -> Response:
+        figures = "".join(
+            f'<div class="figure"><img src="{FORK_ME_IMAGE}" alt="User Avatar" width="150" height="150">'
+            f'<div class="figcaption"><h5>name: user{i}</h5><a href="/users/{i}">View profile</a></div></div>'
+            for i in range(1, 4)
+        )
+        return self.simple(f"<h3>Hovers</h3>{figures}")
+
+    def key_presses(self, request: Request) -> Response:
+        return Response(body=layout(
+            '<h3>Key Presses</h3><form><input id="target" type="text"></form><p id="result"></p>',
+            head="<script>document.addEventListener('keydown',function(e){"
+                 "document.getElementById('result').textContent='You entered: '+e.key.toUpperCase()})</script>",
+        ))
+
+    def typos(self, request: Request) -> Response:
+        sentence = self.rng.choice(["Sometimes you'll see a typo", "Sometimes you'll see a tyop"])
+        return self.simple(
+            "<h3>Typos</h3><p>This example demonstrates a typo being introduced.</p>"
+            f"<p>{sentence}, other times you won't.</p>"
+        )
+
+    def status_codes(self, request: Request) -> Response:
+        links = "".join(f'<li><a href="/status_codes/{code}">{code}</a></li>' for code in (200, 301, 404, 500))
+        return self.simple(f"<h3>Status Codes</h3><ul>{links}</ul>")
+
+    def status_code_page(self, request: Request) -> Response:
+        code = request.path.rsplit("/", 1)[-1]
+        status = int(code) if code in ("200", "301", "404", "500") else 404
+        body = layout(f"<h3>Status Codes</h3><p>This page returned a {status} status code.</p>")
+        if status == 301:
+            return Response(status=301, body=body, headers={"Location": "/status_codes"})
+        return Response(status=status, body=body)
+
+
+class LocalTargetServer:
+    """HTTP сервер в фоновом потоке с собственным event loop"""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 0):
+        settings = settings or {}
+        self.host = host
+        self.port = port
+        self.rng = random.Random(settings.get("seed", 42))
+        self.default_route = RouteSettings.from_dict(settings.get("defaults", {}))
+        self.route_settings = {
+            path: RouteSettings.from_dict(data, self.default_route)
+            for path, data in settings.get("routes", {}).items()
+        }
+        self.app = TheInternetApp(self.rng)
+        self.request_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Базовый URL сервера (с завершающим слешем, как у base_url)"""
+        return f"http://{self.host}:{self.port}/"
+
+    def settings_for(self, path: str) -> RouteSettings:
+        return self.route_settings.get(path, self.default_route)
+
+    def start(self) -> str:
+        """Запустить сервер на свободном порту и вернуть его URL"""
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self._thread.start()
+        if not started.wait(10):
+            raise RuntimeError("Local target server failed to start")
+        return self.url
+
+    def stop(self) -> None:
+        """Остановить сервер"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+
+    def _run(self, started: threading.Event) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        started.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обслуживание keep-alive соединения"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError:
+                    # Некорректная строка запроса или Content-Length: ответ 400 и закрытие соединения
+                    writer.write(self._encode(Response(status=400), b"<h1>Bad Request</h1>", keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                response, keep_alive = await self._respond(request)
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Следующий запрос соединения; None - соединение закрыто, ValueError - запрос некорректен"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+        parts = urlsplit(target)
+        return Request(method, parts.path or "/", parse_qs(parts.query), headers, body)
+
+    async def _respond(self, request: Request) -> Tuple[bytes, bool]:
+        """Применить настройки маршрута и сформировать ответ"""
+        self.request_count += 1
+        settings = self.settings_for(request.path)
+
+        delay = settings.latency_ms + self.rng.uniform(-settings.jitter_ms, settings.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if settings.failure_rate and self.rng.random() < settings.failure_rate:
+            response = Response(status=500, body="<h1>Internal Server Error</h1>")
+        else:
+            response = self.app.handle(request)
+
+        body = response.body.encode("utf-8")
+        if settings.payload_bytes > len(body):
+            # Добиваем ответ до нужного размера комментарием/пробелами
+            padding = settings.payload_bytes - len(body)
+            body += (b"<!--" + b" " * max(padding - 7, 0) + b"-->") if "html" in response.content_type else b" " * padding
+
+        keep_alive = request.headers.get("connection", "").lower() != "close"
+        return self._encode(response, body, keep_alive, include_body=request.method != "HEAD"), keep_alive
+
+    def _encode(self, response: Response, body: bytes, keep_alive: bool, include_body: bool = True) -> bytes:
+        """Статус, заголовки и тело ответа"""
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(response.headers or {}),
+        }
+        status_line = f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, '')}\r\n"
+        head = status_line + "".join(f"{key}: {value}\r\n" for key, value in headers.items()) + "\r\n"
+        return head.encode("latin-1") + (body if include_body else b"")
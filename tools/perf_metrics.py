@@ -0,0 +1,221 @@
+"""
+Метрики производительности страниц: Navigation Timing, Paint Timing, LCP и ресурсы
+Плагин pytest (--perf-metrics) собирает их на событии load каждой страницы (в том
+числе после кликов по ссылкам и отправки форм) и после page.goto, сохраняет в
+user_properties результата теста и проверяет бюджеты из config/test_config.json
+"""
+from fnmatch import fnmatch
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import pytest
+from playwright.sync_api import Browser, BrowserContext, Error, Page
+
+from tools.playwright_hooks import MethodPatcher
+
+
+# Метрики текущего документа, время в мс от начала навигации
+COLLECT_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    const paint = {};
+    for (const entry of performance.getEntriesByType('paint')) paint[entry.name] = entry.startTime;
+
+    let lcp = null;
+    if (PerformanceObserver.supportedEntryTypes.includes('largest-contentful-paint')) {
+        // buffered записи попадают в буфер наблюдателя сразу, без таймеров страницы
+        const observer = new PerformanceObserver(() => {});
+        observer.observe({type: 'largest-contentful-paint', buffered: true});
+        const entries = observer.takeRecords();
+        observer.disconnect();
+        if (entries.length) lcp = entries[entries.length - 1].startTime;
+    }
+
+    const resources = performance.getEntriesByType('resource');
+    const slowest = [...resources].sort((a, b) => b.duration - a.duration).slice(0, 3);
+    return {
+        // Идентификатор документа: одна навигация не учитывается дважды
+        time_origin: performance.timeOrigin,
+        ttfb_ms: nav.responseStart,
+        dom_content_loaded_ms: nav.domContentLoadedEventEnd,
+        // 0 - событие load еще не наступило (goto с wait_until=domcontentloaded)
+        load_ms: nav.loadEventEnd || null,
+        fcp_ms: paint['first-contentful-paint'] ?? null,
+        lcp_ms: lcp,
+        resource_count: resources.length,
+        transfer_bytes: resources.reduce((sum, r) => sum + (r.transferSize || 0), 0),
+        slowest_resources: slowest.map(r => ({name: r.name, duration_ms: r.duration})),
+    };
+}"""
+
+# Метрики, для которых задаются бюджеты: <метрика>_ms
+BUDGET_METRICS = ("ttfb_ms", "dom_content_loaded_ms", "load_ms", "fcp_ms", "lcp_ms")
+
+
+def collect_metrics(page: Page) -> Optional[Dict[str, Any]]:
+    """Метрики последней навигации страницы (None для about:blank, data: и т.п.)"""
+    if not page.url.startswith(("http://", "https://")):
+        return None
+    metrics = page.evaluate(COLLECT_SCRIPT)
+    if metrics is None:
+        return None
+    for key in BUDGET_METRICS:
+        if metrics[key] is not None:
+            metrics[key] = round(metrics[key], 1)
+    return {"url": page.url, **metrics}
+
+
+class PerformanceAssertions:
+    """Проверки метрик страницы: expect_performance(page).load_under(3000).lcp_under(2500)"""
+
+    def __init__(self, metrics: Dict[str, Any]):
+        self.metrics = metrics
+
+    def _under(self, key: str, limit_ms: float) -> "PerformanceAssertions":
+        value = self.metrics.get(key)
+        assert value is not None, f"{key} is not available for {self.metrics['url']}"
+        assert value <= limit_ms, f"{key} {value:.0f}ms exceeds {limit_ms:.0f}ms for {self.metrics['url']}"
+        return self
+
+    def within_budget(self, budgets: "PerformanceBudgets") -> "PerformanceAssertions":
+        """Метрики укладываются в бюджет страницы из performance_budgets"""
+        violations = budgets.violations(self.metrics)
+        assert not violations, "Performance budget exceeded:\n" + "\n".join(violations)
+        return self
+
+    def ttfb_under(self, ms: float) -> "PerformanceAssertions":
+        return self._under("ttfb_ms", ms)
+
+    def dom_content_loaded_under(self, ms: float) -> "PerformanceAssertions":
+        return self._under("dom_content_loaded_ms", ms)
+
+    def load_under(self, ms: float) -> "PerformanceAssertions":
+        return self._under("load_ms", ms)
+
+    def fcp_under(self, ms: float) -> "PerformanceAssertions":
+        return self._under("fcp_ms", ms)
+
+    def lcp_under(self, ms: float) -> "PerformanceAssertions":
+        return self._under("lcp_ms", ms)
+
+
+def expect_performance(page: Page) -> PerformanceAssertions:
+    """Проверки производительности текущего документа страницы"""
+    metrics = collect_metrics(page)
+    assert metrics is not None, f"No navigation timing for {page.url}"
+    return PerformanceAssertions(metrics)
+
+
+class PerformanceBudgets:
+    """Бюджеты метрик по URL: default + шаблоны путей (fnmatch)"""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.default: Dict[str, float] = settings.get("default", {})
+        self.urls: Dict[str, Dict[str, float]] = settings.get("urls", {})
+
+    def for_url(self, url: str) -> Dict[str, float]:
+        """Бюджет страницы: default, уточненный всеми подходящими шаблонами"""
+        path = urlparse(url).path or "/"
+        budget = dict(self.default)
+        for pattern, limits in self.urls.items():
+            if fnmatch(path, pattern):
+                budget.update(limits)
+        return budget
+
+    def violations(self, metrics: Dict[str, Any]) -> List[str]:
+        """Превышения бюджета для метрик одной навигации"""
+        result = []
+        for key, limit in self.for_url(metrics["url"]).items():
+            value = metrics.get(key)
+            if value is not None and value > limit:
+                result.append(f"{metrics['url']}: {key} {value:.0f}ms > budget {limit:.0f}ms")
+        return result
+
+
+class PerfMetricsCollector:
+    """Сбор метрик на событии load и после page.goto, проверка бюджетов по завершении теста"""
+
+    def __init__(self, budgets: PerformanceBudgets, top: int = 10):
+        self.budgets = budgets
+        self.top = top
+        # Навигации текущего теста: (страница, performance.timeOrigin) -> метрики
+        self.current: Optional[Dict[Tuple[int, float], Dict[str, Any]]] = None
+        self.loads: List[Dict[str, Any]] = []
+        self._patcher = MethodPatcher()
+
+    def install(self) -> None:
+        self._patcher.wrap(Browser, "new_context", self._wrap_new_context)
+        self._patcher.wrap(Page, "goto", self._wrap_goto)
+
+    def uninstall(self) -> None:
+        self._patcher.restore()
+
+    def _wrap_new_context(self, original: Callable) -> Callable:
+        def wrapper(browser: Browser, *args: Any, **kwargs: Any) -> BrowserContext:
+            context: BrowserContext = original(browser, *args, **kwargs)
+            # Навигации кликами, формами и редиректами проходят мимо page.goto
+            context.on("page", lambda page: page.on("load", self.record))
+            return context
+        return wrapper
+
+    def _wrap_goto(self, original: Callable) -> Callable:
+        def wrapper(page: Page, *args: Any, **kwargs: Any) -> Any:
+            response = original(page, *args, **kwargs)
+            # Событие load могло еще не дойти до обработчика к концу теста
+            self.record(page)
+            return response
+        return wrapper
+
+    def record(self, page: Page) -> None:
+        """Метрики текущего документа страницы, если идет тест"""
+        if self.current is None:
+            return
+        try:
+            metrics = collect_metrics(page)
+        except Error:
+            # Страница успела уйти дальше или закрыться - метрики пропускаем
+            return
+        if metrics is None:
+            return
+        key = (id(page), metrics.pop("time_origin"))
+        known = self.current.get(key)
+        # goto с wait_until=domcontentloaded снимает метрики до load - load их дополняет
+        if known is None or (known["load_ms"] is None and metrics["load_ms"] is not None):
+            self.current[key] = metrics
+
+    # ---------- хуки pytest ----------
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item) -> Generator[None, object, object]:
+        self.current = {}
+        try:
+            result = yield
+        finally:
+            navigations, self.current = list(self.current.values()), None
+            if navigations:
+                item.user_properties.append(("performance", navigations))
+
+        violations = [v for metrics in navigations for v in self.budgets.violations(metrics)]
+        if violations:
+            pytest.fail("Performance budget exceeded:\n" + "\n".join(violations), pytrace=False)
+        return result
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        """Загрузки страниц для итоговой таблицы (в т.ч. из воркеров xdist)"""
+        if report.when != "call":
+            return
+        for name, value in report.user_properties:
+            if name == "performance" and isinstance(value, list):
+                self.loads.extend({"test": report.nodeid, **metrics} for metrics in value)
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if hasattr(terminalreporter.config, "workerinput") or not self.loads:
+            return
+        tr = terminalreporter
+        tr.write_sep("=", "page performance")
+        tr.write_line(f"{'load, ms':>9} {'fcp, ms':>8} {'lcp, ms':>8} {'res':>5}  URL (test)")
+        slowest = sorted(self.loads, key=lambda m: m["load_ms"] or 0, reverse=True)[: self.top]
+        for metrics in slowest:
+            values = [metrics[key] for key in ("load_ms", "fcp_ms", "lcp_ms")]
+            columns = " ".join(f"{value:>8.0f}" if value is not None else f"{'-':>8}" for value in values)
+            tr.write_line(f" {columns} {metrics['resource_count']:>5}  {metrics['url']} ({metrics['test']})")
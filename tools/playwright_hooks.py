@@ -0,0 +1,74 @@
+"""
+Общие средства инструментирования sync API Playwright для pytest плагинов
+"""
+import functools
+import sys
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from playwright.sync_api._generated import (
+    APIResponseAssertions,
+    LocatorAssertions,
+    PageAssertions,
+)
+
+
+# Классы, методы которых вызываются через expect(...)
+ASSERTION_CLASSES = (LocatorAssertions, PageAssertions, APIResponseAssertions)
+
+
+def assertion_methods(cls: Type) -> List[str]:
+    """Методы-проверки класса expect (to_*, not_to_*)"""
+    return [name for name in dir(cls) if name.startswith(("to_", "not_to_"))]
+
+
+class MethodPatcher:
+    """Подмена методов классов с восстановлением оригиналов"""
+
+    def __init__(self) -> None:
+        self._originals: List[Tuple[Any, str, Any]] = []
+
+    def wrap(self, owner: Any, name: str, make_wrapper: Callable[[Callable], Callable]) -> None:
+        """Заменить owner.name на make_wrapper(оригинал)"""
+        original = getattr(owner, name)
+        wrapper = functools.wraps(original)(make_wrapper(original))
+        setattr(owner, name, wrapper)
+        self._originals.append((owner, name, original))
+
+    def restore(self) -> None:
+        """Вернуть оригинальные методы"""
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals.clear()
+
+
+class CallSiteResolver:
+    """Определение места вызова в коде проекта (тесты, фикстуры)"""
+
+    def __init__(self, root: Path, exclude: Tuple[str, ...] = ("tools",)):
+        self.root = str(root.resolve())
+        self.excluded = tuple(str(root.resolve() / name) for name in exclude)
+        self._is_project_file: Dict[str, bool] = {}
+
+    def resolve(self, depth: int = 2) -> Optional[str]:
+        """Первый кадр стека из файлов проекта: 'tests/test_x.py:42 (func)'"""
+        frame: Optional[FrameType] = sys._getframe(depth)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if self._project_file(filename):
+                relative = filename[len(self.root) + 1:]
+                return f"{relative}:{frame.f_lineno} ({frame.f_code.co_name})"
+            frame = frame.f_back
+        return None
+
+    def _project_file(self, filename: str) -> bool:
+        cached = self._is_project_file.get(filename)
+        if cached is None:
+            cached = (
+                filename.startswith(self.root)
+                and not filename.startswith(self.excluded)
+                and "site-packages" not in filename
+            )
+            self._is_project_file[filename] = cached
+        return cached
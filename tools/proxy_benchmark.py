@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк WebSocket relay ChromeProxy на локальном фейковом CDP сервере
+Сравнивает прямое подключение и подключение через прокси: время подключения,
+задержку round trip небольших команд и пропускную способность потока крупных кадров
+(как screencast)
+"""
+import argparse
+import json
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import websockets
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.chrome_proxy import ChromeProxy, RelaySettings, add_relay_arguments, relay_settings, run
+
+
+# Подключений для замера времени подключения (с первой командой)
+CONNECT_SAMPLES = 20
+
+
+async def fake_cdp_handler(websocket: Any) -> None:
+    """Фейковый CDP: Bench.echo отвечает параметрами, Bench.stream шлет count событий по size байт"""
+    async for message in websocket:
+        request = json.loads(message)
+        params = request.get("params", {})
+        if request["method"] == "Bench.stream":
+            frame = json.dumps({"method": "Page.screencastFrame", "params": {"data": "A" * params["size"]}})
+            for _ in range(params["count"]):
+                await websocket.send(frame)
+            await websocket.send(json.dumps({"id": request["id"], "result": {}}))
+        else:
+            await websocket.send(json.dumps({"id": request["id"], "result": params}))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def percentile(values: List[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def measure(url: str, messages: int, frames: int, frame_size: int, max_size: int) -> Dict[str, float]:
+    """Время подключения и задержка echo команд (мс), скорость потока кадров (МБ/с)"""
+    connects = []
+    for _ in range(CONNECT_SAMPLES):
+        started = time.perf_counter()
+        async with websockets.connect(url, compression=None) as ws:
+            await ws.send(json.dumps({"id": 0, "method": "Bench.echo", "params": {}}))
+            await ws.recv()
+            connects.append((time.perf_counter() - started) * 1000)
+
+    async with websockets.connect(url, max_size=max_size, compression=None) as ws:
+        latencies = []
+        for i in range(messages):
+            started = time.perf_counter()
+            await ws.send(json.dumps({"id": i, "method": "Bench.echo", "params": {"n": i}}))
+            await ws.recv(decode=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await ws.send(json.dumps({"id": -1, "method": "Bench.stream",
+                                  "params": {"count": frames, "size": frame_size}}))
+        received = 0
+        while True:
+            message = await ws.recv(decode=False)
+            received += len(message)
+            if message.startswith(b'{"id"'):
+                break
+        elapsed = time.perf_counter() - started
+
+    return {
+        "connect_ms": statistics.median(connects),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mb_per_s": received / elapsed / 1024 / 1024,
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    relay: RelaySettings = relay_settings(args)
+    cdp_port, proxy_port = free_port(), free_port()
+    proxy = ChromeProxy("localhost", cdp_port, proxy_port - 1, relay=relay, multiplex=args.multiplex)
+
+    async with websockets.serve(fake_cdp_handler, "localhost", cdp_port, max_size=relay.max_frame_size,
+                                compression=None), \
+            websockets.serve(proxy.handle_websocket, "localhost", proxy_port, **relay.connection_kwargs()):
+        path = "/devtools/browser/benchmark"
+        results = {}
+        for name, port in (("direct", cdp_port), ("proxy", proxy_port)):
+            results[name] = await measure(f"ws://localhost:{port}{path}", args.messages, args.frames,
+                                          args.frame_size, relay.max_frame_size)
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]], args: argparse.Namespace) -> None:
+    print(f"\n📊 {args.messages} echo commands, {args.frames} frames x {args.frame_size // 1024} KB")
+    print(f"{'':<8} {'connect':>9} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'MB/s':>9}")
+    for name, row in results.items():
+        print(f"{name:<8} {row['connect_ms']:>9.3f} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['mb_per_s']:>9.1f}")
+    direct, proxy = results["direct"], results["proxy"]
+    print(f"🔌 Proxy overhead: +{proxy['p50_ms'] - direct['p50_ms']:.3f} ms p50, "
+          f"{proxy['mb_per_s'] / direct['mb_per_s']:.0%} of direct throughput")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ChromeProxy WebSocket relay benchmark')
+    parser.add_argument('--messages', type=int, default=2000, help='Sequential echo commands for latency')
+    parser.add_argument('--frames', type=int, default=400, help='Streamed frames for throughput')
+    parser.add_argument('--frame-size', type=int, default=256 * 1024, help='Streamed frame size, bytes')
+    parser.add_argument('--multiplex', type=int, default=0, metavar='N',
+                        help='Benchmark the proxy in multiplexing mode with N upstream connections')
+    add_relay_arguments(parser)
+    args = parser.parse_args()
+
+    print_results(run(benchmark(args), use_uvloop=args.uvloop), args)
+
+
+if __name__ == "__main__":
+    main()
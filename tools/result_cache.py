@@ -0,0 +1,195 @@
+"""
+Кэш результатов тестов по хэшу содержимого
+Ключ теста - хэш его исходника (с используемыми им именами модуля), исходников всех
+фикстур из его замыкания, модулей проекта из транзитивного замыкания импортов
+тестового файла и модулей фикстур, config/test_config.json, конфигурации прогона (режим/браузер/headless) и
+необязательного ID сборки приложения. Тест, прошедший с таким ключом раньше,
+не выполняется и отмечается в отчете как cached. Записи - маленькие JSON файлы
+в каталоге, который можно переносить между CI прогонами; при превышении размера
+удаляются давно не использованные (mtime обновляется при каждом попадании)
+"""
+import ast
+import hashlib
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Literal, Optional, Set, Tuple
+
+import pytest
+
+from tools.test_watcher import PROJECT_ROOT, ModuleInfo
+
+
+PHASES: Tuple[Literal["setup", "call", "teardown"], ...] = ("setup", "call", "teardown")
+
+
+class ResultCache:
+    """Плагин pytest: пропуск тестов, прошедших с тем же ключом"""
+
+    def __init__(self, directory: str, run_key: str, config_path: Path,
+                 build_id: Optional[str] = None, max_mb: float = 64.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        config_digest = hashlib.sha256(config_path.read_bytes()).hexdigest() if config_path.exists() else ""
+        self.base_key = json.dumps([run_key, config_digest, build_id or ""])
+        self.modules: Dict[Path, Optional[ModuleInfo]] = {}
+        self.closures: Dict[Path, str] = {}
+        self.keys: Dict[str, str] = {}
+        # Тесты прогона, у которых хотя бы одна фаза не прошла (или был перезапуск)
+        self.failed: Set[str] = set()
+        self.hits = 0
+        self.stored = 0
+
+    # ---------- ключ ----------
+
+    def _module(self, path: Path) -> Optional[ModuleInfo]:
+        if path not in self.modules:
+            try:
+                self.modules[path] = ModuleInfo(path, ast.parse(path.read_text(encoding="utf-8")))
+            except (OSError, SyntaxError, UnicodeDecodeError):
+                self.modules[path] = None
+        return self.modules[path]
+
+    @staticmethod
+    def _source_path(func: Callable[..., Any]) -> Optional[Path]:
+        try:
+            source = inspect.getsourcefile(inspect.unwrap(func))
+        except TypeError:
+            return None
+        return Path(source).resolve() if source else None
+
+    def _source_digest(self, func: Callable[..., Any]) -> str:
+        """Хэш функции по AST ее модуля; для вложенных и динамических - по исходнику"""
+        func = inspect.unwrap(func)
+        path = self._source_path(func)
+        if path is None:
+            return getattr(func, "__qualname__", repr(func))
+        info = self._module(path)
+        name = func.__qualname__.split(".")[0]
+        if info is not None and name in info.hashes:
+            return info.digest(name)
+        try:
+            return hashlib.sha1(inspect.getsource(func).encode()).hexdigest()
+        except (OSError, TypeError):
+            return func.__qualname__
+
+    def _imports_digest(self, path: Path) -> str:
+        """Хэш модулей проекта из транзитивного замыкания импортов файла
+
+        Как DependencyMap.propagate: from-импорт учитывает только импортированные имена
+        (импорт фикстур - через граф фикстур), модуль-зависимость обходится дальше целиком.
+        """
+        if path in self.closures:
+            return self.closures[path]
+        digests: Set[str] = set()
+        seen = {path}
+        pending = [path]
+        while pending:
+            info = self._module(pending.pop())
+            if info is None:
+                continue
+            for dependency, names in info.imports:
+                dependency_info = self._module(dependency)
+                if names is not None and dependency_info is not None:
+                    names = names - set(dependency_info.fixtures)
+                    if not names:
+                        continue
+                    digests.update(dependency_info.digest(name) for name in names)
+                else:
+                    digests.add(hashlib.sha1(dependency.read_bytes()).hexdigest())
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.append(dependency)
+        self.closures[path] = hashlib.sha1("".join(sorted(digests)).encode()).hexdigest()
+        return self.closures[path]
+
+    def key(self, item: pytest.Item) -> Optional[str]:
+        if not isinstance(item, pytest.Function):
+            return None
+        parts = [self.base_key, item.nodeid, self._source_digest(item.function)]
+        modules = {Path(item.path).resolve()}
+        # fixturenames - транзитивное замыкание фикстур теста (включая autouse)
+        for name in sorted(item.fixturenames):
+            for fixturedef in item._fixtureinfo.name2fixturedefs.get(name, ()):
+                parts.append(f"{name}:{self._source_digest(fixturedef.func)}")
+                source = self._source_path(fixturedef.func)
+                if source is not None:
+                    modules.add(source)
+        # Импорты плагинов окружения (pytest-playwright и т.п.) в ключ не входят
+        parts.extend(self._imports_digest(path) for path in sorted(modules)
+                     if path.is_relative_to(PROJECT_ROOT))
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    # ---------- хуки ----------
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item: pytest.Item, nextitem: Optional[pytest.Item]) -> Optional[bool]:
+        key = self.key(item)
+        if key is None:
+            return None
+        self.keys[item.nodeid] = key
+        entry = self._entry(key)
+        if not entry.exists():
+            return None
+        os.utime(entry)  # LRU: недавно использованные записи вытесняются последними
+        item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        for when in PHASES:
+            report = pytest.TestReport(item.nodeid, item.location, {}, "passed", None, when, [], 0.0, cached=True)
+            item.ihook.pytest_runtest_logreport(report=report)
+        item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+        return True
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_report_teststatus(self, report: pytest.TestReport,
+                                 config: pytest.Config) -> Optional[Tuple[str, str, str]]:
+        if getattr(report, "cached", False) and report.when == "call":
+            return "cached", "c", "CACHED"
+        return None
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if getattr(report, "cached", False):
+            # На контроллере xdist считаются и попадания воркеров
+            self.hits += report.when == "call"
+            return
+        if report.nodeid not in self.keys:
+            return
+        if report.outcome != "passed" or hasattr(report, "wasxfail"):
+            self.failed.add(report.nodeid)
+        elif report.when == "teardown" and report.nodeid not in self.failed:
+            entry = self._entry(self.keys[report.nodeid])
+            entry.parent.mkdir(exist_ok=True)
+            entry.write_text(json.dumps({"nodeid": report.nodeid, "stored_at": time.time()}))
+            self.stored += 1
+
+    def pytest_sessionfinish(self, session: pytest.Session) -> None:
+        if not hasattr(session.config, "workerinput"):
+            self.evict()
+
+    def evict(self) -> int:
+        """Удалить давно не использованные записи сверх лимита размера"""
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        terminalreporter.write_line(
+            f"🗃️ Result cache: {self.hits} cached, {self.stored} stored ({self.directory})")
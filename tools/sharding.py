@@ -0,0 +1,178 @@
+"""
+Детерминированное разбиение тестов на шарды для нескольких CI машин
+Веса тестов - длительности из истории (tools/duration_history.py), без истории -
+эвристика по числу тестов. Каждый шард пишет манифест, по которым проверяется,
+что каждый тест выполнен ровно один раз
+"""
+import json
+import re
+import statistics
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from tools.duration_history import DurationHistory
+
+
+# Вес теста с маркером slow, если истории нет
+SLOW_WEIGHT = 5.0
+MANIFEST_PATTERN = re.compile(r"shard-(\d+)-of-(\d+)\.json$")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """'2/4' -> (2, 4); шарды нумеруются с 1"""
+    match = re.fullmatch(r"(\d+)/(\d+)", value.strip())
+    if not match:
+        raise ValueError(f"Shard must look like K/N, got '{value}'")
+    index, total = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= total:
+        raise ValueError(f"Shard index must be in 1..{total}, got {index}")
+    return index, total
+
+
+def param_family(nodeid: str) -> str:
+    """Параметризованные случаи одного теста - одна семья: test_x[1], test_x[2] -> test_x"""
+    return nodeid.split("[", 1)[0]
+
+
+def partition(weights: Dict[str, float], shards: int) -> List[List[str]]:
+    """LPT разбиение: тяжелые тесты первыми на наименее загруженный шард
+
+    Случаи одной параметризации штрафуются на шарде, где их семья уже есть,
+    чтобы не собираться на одной машине. Результат зависит только от входа.
+    """
+    loads = [0.0] * shards
+    members: List[List[str]] = [[] for _ in range(shards)]
+    families: List[Dict[str, int]] = [defaultdict(int) for _ in range(shards)]
+
+    for nodeid in sorted(weights, key=lambda n: (-weights[n], n)):
+        weight = weights[nodeid]
+        family = param_family(nodeid)
+        target = min(
+            range(shards),
+            key=lambda i: (loads[i] + weight * families[i][family], loads[i], i),
+        )
+        loads[target] += weight
+        members[target].append(nodeid)
+        families[target][family] += 1
+    return members
+
+
+class ShardSelector:
+    """Плагин pytest: оставить тесты шарда K/N и записать его манифест"""
+
+    def __init__(self, index: int, total: int, estimates: Dict[str, float], manifest_dir: str):
+        self.index = index
+        self.total = total
+        self.estimates = estimates
+        self.manifest_path = Path(manifest_dir) / f"shard-{index}-of-{total}.json"
+        self.collected: List[str] = []
+        self.assigned: List[str] = []
+        self.outcomes: Dict[str, str] = {}
+
+    def weight(self, item: pytest.Item) -> float:
+        """Вес теста: длительность из истории, иначе медиана истории или 1 (x5 для slow)"""
+        if item.nodeid in self.estimates:
+            return self.estimates[item.nodeid]
+        base = statistics.median(self.estimates.values()) if self.estimates else 1.0
+        return base * SLOW_WEIGHT if item.get_closest_marker("slow") else base
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: List[pytest.Item]) -> None:
+        self.collected = [item.nodeid for item in items]
+        shards = partition({item.nodeid: self.weight(item) for item in items}, self.total)
+        assigned = set(shards[self.index - 1])
+        self.assigned = [nodeid for nodeid in self.collected if nodeid in assigned]
+
+        deselected = [item for item in items if item.nodeid not in assigned]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if item.nodeid in assigned]
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node: Any, ids: List[str]) -> None:
+        """Контроллер xdist сам не собирает тесты - берем выбранные воркером"""
+        if not self.assigned:
+            self.assigned = list(ids)
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        # outcome "rerun" выставляет pytest-rerunfailures, в аннотации TestReport его нет
+        if str(report.outcome) == "rerun":
+            return
+        if report.when == "call" or report.outcome != "passed":
+            self.outcomes.setdefault(report.nodeid, report.outcome)
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            # Полный список собранных тестов известен только воркеру - передаем контроллеру
+            workeroutput["shard_collected"] = json.dumps(self.collected)
+            return
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "shard": self.index,
+            "total": self.total,
+            "collected": self.collected,
+            "assigned": self.assigned,
+            "outcomes": self.outcomes,
+        }
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"\n🧩 Shard {self.index}/{self.total}: {len(self.assigned)} of {len(self.collected)} tests, "
+              f"manifest {self.manifest_path}")
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        collected = getattr(node, "workeroutput", {}).get("shard_collected")
+        if collected and not self.collected:
+            self.collected = json.loads(collected)
+
+
+def check_manifests(manifest_dir: str) -> List[str]:
+    """Проверить манифесты всех шардов: каждый тест выполнен ровно один раз"""
+    manifests: Dict[int, Dict[str, Any]] = {}
+    totals = set()
+    for path in sorted(Path(manifest_dir).glob("shard-*-of-*.json")):
+        if not MANIFEST_PATTERN.search(path.name):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifests[manifest["shard"]] = manifest
+        totals.add(manifest["total"])
+
+    if not manifests:
+        return [f"No shard manifests in {manifest_dir}"]
+    if len(totals) > 1:
+        return [f"Manifests from different splits: N = {sorted(totals)}"]
+
+    problems = []
+    total = totals.pop()
+    missing_shards = sorted(set(range(1, total + 1)) - set(manifests))
+    if missing_shards:
+        problems.append(f"Missing manifests for shards: {missing_shards}")
+
+    collected = set()
+    runs: Dict[str, List[int]] = defaultdict(list)
+    for index, manifest in sorted(manifests.items()):
+        collected.update(manifest["collected"])
+        for nodeid in manifest["outcomes"]:
+            runs[nodeid].append(index)
+
+    for nodeid in sorted(collected):
+        shards = runs.get(nodeid, [])
+        if not shards:
+            problems.append(f"Not run: {nodeid}")
+        elif len(shards) > 1:
+            problems.append(f"Run {len(shards)} times (shards {shards}): {nodeid}")
+    for nodeid in sorted(set(runs) - collected):
+        problems.append(f"Run but not collected: {nodeid}")
+    return problems
+
+
+def shard_estimates(history_path: Optional[str], config_key: str) -> Dict[str, float]:
+    """Длительности из истории (пусто, если истории нет)"""
+    if not history_path or not Path(history_path).exists():
+        return {}
+    return DurationHistory(history_path).estimates(config_key)
@@ -0,0 +1,154 @@
+"""
+Иерархические спаны времени тестов в формате Chrome trace events
+Фазы теста, фикстуры, навигации, действия с локаторами и expect(...)
+Каждый воркер пишет свой файл, главный процесс объединяет их в один trace.json
+(открывается в chrome://tracing или https://ui.perfetto.dev)
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
+
+import pytest
+from playwright.sync_api import Locator, Page
+
+from tools.browser_servers import worker_index
+from tools.playwright_hooks import ASSERTION_CLASSES, MethodPatcher, assertion_methods
+
+
+NAVIGATION_METHODS = ["goto", "reload", "go_back", "go_forward"]
+LOCATOR_ACTIONS = [
+    "click", "dblclick", "fill", "type", "press", "press_sequentially", "check", "uncheck",
+    "hover", "tap", "focus", "select_option", "set_input_files", "inner_text", "text_content",
+    "input_value", "is_visible", "is_checked", "is_enabled", "count",
+]
+
+# Сырой спан: name, cat, начало (мкс), длительность (мкс), args
+RawSpan = Tuple[str, str, int, int, Optional[Dict[str, Any]]]
+
+
+class SpanTracer:
+    """Сбор спанов одного процесса pytest"""
+
+    def __init__(self, trace_dir: str = "reports/traces"):
+        self.trace_dir = Path(trace_dir)
+        self.worker = os.getenv("PYTEST_XDIST_WORKER", "main")
+        # pid 0 - процесс без xdist, воркеры gwN получают pid N + 1
+        self.pid = worker_index() + 1 if self.worker != "main" else 0
+        self.spans: List[RawSpan] = []
+        self._patcher = MethodPatcher()
+
+    @contextmanager
+    def span(self, name: str, cat: str, args: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+        """Записать спан на время выполнения блока"""
+        started = time.time_ns() // 1000
+        try:
+            yield
+        finally:
+            self.spans.append((name, cat, started, time.time_ns() // 1000 - started, args))
+
+    # ---------- инструментирование Playwright ----------
+
+    def install(self) -> None:
+        for name in NAVIGATION_METHODS:
+            self._patcher.wrap(Page, name, self._traced(f"page.{name}", "navigation"))
+        for name in LOCATOR_ACTIONS:
+            self._patcher.wrap(Locator, name, self._traced(f"locator.{name}", "action"))
+        for cls in ASSERTION_CLASSES:
+            for name in assertion_methods(cls):
+                self._patcher.wrap(cls, name, self._traced(f"expect.{name}", "expect"))
+
+    def uninstall(self) -> None:
+        self._patcher.restore()
+
+    def _traced(self, name: str, cat: str) -> Callable[[Callable], Callable]:
+        def make_wrapper(original: Callable) -> Callable:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = time.time_ns() // 1000
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    span_args = {"url": args[1]} if cat == "navigation" and len(args) > 1 else None
+                    self.spans.append((name, cat, started, time.time_ns() // 1000 - started, span_args))
+            return wrapper
+        return make_wrapper
+
+    # ---------- хуки pytest ----------
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: pytest.Item,
+                                nextitem: Optional[pytest.Item]) -> Generator[None, Any, None]:
+        with self.span(item.nodeid, "test"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item: pytest.Item) -> Generator[None, Any, None]:
+        with self.span("setup", "phase"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item) -> Generator[None, Any, None]:
+        with self.span("call", "phase"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item: pytest.Item,
+                                nextitem: Optional[pytest.Item]) -> Generator[None, Any, None]:
+        with self.span("teardown", "phase"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef: Any,
+                             request: pytest.FixtureRequest) -> Generator[None, Any, None]:
+        with self.span(f"fixture:{fixturedef.argname}", "fixture", {"scope": fixturedef.scope}):
+            yield
+
+    def pytest_sessionstart(self, session: pytest.Session) -> None:
+        if not hasattr(session.config, "workerinput"):
+            # Файлы прошлого запуска не должны попасть в объединенный trace
+            for old_file in self.trace_dir.glob("trace-*.json"):
+                old_file.unlink()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        if self.spans:
+            # Контроллер xdist сам тесты не выполняет и спанов не имеет
+            self.write()
+        if not hasattr(session.config, "workerinput"):
+            merged = self.merge()
+            print(f"\n🧭 Span trace saved: {merged}")
+
+    # ---------- запись ----------
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Спаны процесса в формате Chrome trace events"""
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": self.worker}}
+        ]
+        for name, cat, ts, dur, args in self.spans:
+            event = {"name": name, "cat": cat, "ph": "X", "ts": ts, "dur": dur, "pid": self.pid, "tid": 0}
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def write(self) -> Path:
+        """Записать файл спанов этого процесса"""
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        path = self.trace_dir / f"trace-{self.worker}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events()}, f)
+        return path
+
+    def merge(self) -> Path:
+        """Объединить файлы всех процессов в trace.json"""
+        events: List[Dict[str, Any]] = []
+        for path in sorted(self.trace_dir.glob("trace-*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                events.extend(json.load(f)["traceEvents"])
+        merged = self.trace_dir / "trace.json"
+        with open(merged, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return merged
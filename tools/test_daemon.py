@@ -0,0 +1,302 @@
+"""
+Демон запуска тестов: Playwright драйвер и браузеры остаются запущенными между прогонами
+`test_manager.py serve` принимает прогоны по Unix сокету (по строке JSON на сообщение),
+выполняет pytest.main в своем процессе и передает вывод и результаты клиенту
+`test_manager.py run --daemon`. Перед каждым прогоном модули проекта выгружаются,
+поэтому правки тестов, conftest и конфигурации подхватываются без перезапуска демона
+"""
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple, cast
+
+import pytest
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_warm: Optional["WarmBrowsers"] = None
+
+
+def default_socket_path() -> str:
+    """Сокет демона этого проекта (несколько checkout'ов не мешают друг другу)"""
+    digest = hashlib.sha256(str(PROJECT_ROOT).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"pytest-daemon-{digest}.sock")
+
+
+def warm_browsers() -> Optional["WarmBrowsers"]:
+    """Теплые Playwright и браузеры демона (None, если тесты запущены не в демоне)"""
+    return _warm
+
+
+class WarmBrowsers:
+    """Драйвер Playwright и запущенные браузеры, общие для всех прогонов демона"""
+
+    def __init__(self) -> None:
+        from playwright.sync_api import sync_playwright
+
+        self.playwright = sync_playwright().start()
+        self._browsers: Dict[Tuple[str, str], Any] = {}
+
+    def browser(self, browser_type: Any, launch_args: Dict[str, Any]) -> Any:
+        """Браузер с такими аргументами запуска: запущенный ранее или новый"""
+        key = (browser_type.name, json.dumps(launch_args, sort_keys=True, default=str))
+        browser = self._browsers.get(key)
+        if browser is None or not browser.is_connected():
+            browser = browser_type.launch(**launch_args)
+            self._browsers[key] = browser
+        return browser
+
+    def close(self) -> None:
+        for browser in self._browsers.values():
+            if browser.is_connected():
+                browser.close()
+        self._browsers.clear()
+        self.playwright.stop()
+
+
+# ---------- выгрузка модулей ----------
+
+def _is_project_module(module: Any) -> bool:
+    path = getattr(module, "__file__", None)
+    if not path:
+        return False
+    resolved = Path(path).resolve()
+    # Виртуальное окружение внутри проекта - это не код проекта
+    if "site-packages" in resolved.parts:
+        return False
+    try:
+        resolved.relative_to(PROJECT_ROOT)
+    except ValueError:
+        return False
+    return True
+
+
+def purge_project_modules() -> int:
+    """Выгрузить модули проекта (тесты, conftest, tools, config), кроме самого демона"""
+    keep = {"__main__", __name__, __name__.rpartition(".")[0]}
+    purged = [name for name, module in list(sys.modules.items())
+              if name not in keep and _is_project_module(module)]
+    for name in purged:
+        del sys.modules[name]
+    return len(purged)
+
+
+# ---------- протокол ----------
+
+class EventStream:
+    """Сообщения клиенту: по одному JSON объекту на строку"""
+
+    def __init__(self, wfile: Any):
+        self._wfile = wfile
+        self.connected = True
+
+    def send(self, event: str, **data: Any) -> None:
+        if not self.connected:
+            return
+        try:
+            self._wfile.write((json.dumps({"event": event, **data}) + "\n").encode())
+            self._wfile.flush()
+        except OSError:
+            # Клиент ушел (Ctrl+C) - прогон останавливается после текущего теста
+            self.connected = False
+
+
+class StreamWriter:
+    """sys.stdout/sys.stderr прогона: текст уходит клиенту"""
+
+    encoding = "utf-8"
+    errors = "replace"
+
+    def __init__(self, stream: EventStream, tty: bool):
+        self._stream = stream
+        self._tty = tty
+
+    def write(self, text: str) -> int:
+        if text:
+            self._stream.send("output", data=text)
+        return len(text)
+
+    def writelines(self, lines: List[str]) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return self._tty
+
+    def fileno(self) -> int:
+        raise io.UnsupportedOperation("fileno")
+
+
+class ResultStream:
+    """Плагин pytest прогона в демоне: результаты тестов клиенту, остановка при его уходе"""
+
+    def __init__(self, stream: EventStream):
+        self.stream = stream
+        self.session: Optional[pytest.Session] = None
+
+    def pytest_sessionstart(self, session: pytest.Session) -> None:
+        self.session = session
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if report.when == "call" or report.outcome != "passed":
+            self.stream.send("report", nodeid=report.nodeid, when=report.when,
+                             outcome=report.outcome, duration=report.duration)
+        if not self.stream.connected and self.session is not None:
+            self.session.shouldstop = "daemon client disconnected"
+
+
+# ---------- сервер ----------
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        stream = EventStream(self.wfile)
+        command = request.get("command")
+        if command == "ping":
+            stream.send("pong", pid=os.getpid(), runs=self.server.runs)
+        elif command == "stop":
+            stream.send("stopping")
+            # shutdown() ждет выхода из serve_forever, поэтому вызывается из другого потока
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif command == "run":
+            self.server.runs += 1
+            run_in_process(request, stream)
+        else:
+            stream.send("error", message=f"Unknown command: {command}")
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Прогоны выполняются по одному в главном потоке: sync API Playwright привязан к нему"""
+
+    def __init__(self, socket_path: str):
+        super().__init__(socket_path, DaemonHandler)
+        self.runs = 0
+
+
+def run_in_process(request: Dict[str, Any], stream: EventStream) -> None:
+    """pytest.main с окружением, каталогом и аргументами клиента; вывод - в поток событий"""
+    started = time.monotonic()
+    saved_env, saved_cwd, saved_path = dict(os.environ), os.getcwd(), list(sys.path)
+    saved_streams = sys.stdout, sys.stderr
+    writer = StreamWriter(stream, request.get("tty", False))
+    try:
+        purge_project_modules()
+        os.environ.clear()
+        os.environ.update(request.get("env") or saved_env)
+        os.chdir(request.get("cwd") or saved_cwd)
+        # StreamWriter реализует только то, что pytest вызывает у sys.stdout
+        sys.stdout = sys.stderr = cast(TextIO, writer)
+        exit_code = int(pytest.main(request["args"], plugins=[ResultStream(stream)]))
+    except Exception:
+        writer.write(traceback.format_exc())
+        exit_code = int(pytest.ExitCode.INTERNAL_ERROR)
+    finally:
+        sys.stdout, sys.stderr = saved_streams
+        sys.path[:] = saved_path
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+    stream.send("exit", code=exit_code, seconds=time.monotonic() - started)
+
+
+def serve(socket_path: str, prewarm: Optional[Tuple[str, Dict[str, Any]]] = None) -> None:
+    """Запустить демон: драйвер Playwright, браузер (prewarm) и прием прогонов"""
+    global _warm
+    if os.path.exists(socket_path):
+        if ping(socket_path) is not None:
+            raise RuntimeError(f"Test daemon is already running on {socket_path}")
+        os.remove(socket_path)  # сокет от упавшего демона
+
+    started = time.monotonic()
+    _warm = WarmBrowsers()
+    server = None
+    try:
+        if prewarm:
+            browser_name, launch_args = prewarm
+            try:
+                _warm.browser(getattr(_warm.playwright, browser_name), launch_args)
+            except Exception as e:
+                # Демон полезен и без браузера: драйвер и импорты остаются теплыми
+                print(f"⚠️ Browser warm-up failed: {e}")
+        server = DaemonServer(socket_path)
+        print(f"🔥 Test daemon ready in {time.monotonic() - started:.2f}s: {socket_path}")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.server_close()
+            os.remove(socket_path)
+        _warm.close()
+        _warm = None
+        print("\n🛑 Test daemon stopped")
+
+
+# ---------- клиент ----------
+
+def request_events(socket_path: str, request: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict]:
+    """Отправить запрос демону и читать его события до закрытия соединения"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + "\n").encode())
+        with sock.makefile("rb") as events:
+            for line in events:
+                yield json.loads(line)
+
+
+def ping(socket_path: str) -> Optional[Dict]:
+    """Ответ запущенного демона или None"""
+    try:
+        return next(request_events(socket_path, {"command": "ping"}, timeout=2.0), None)
+    except (OSError, ValueError):
+        return None
+
+
+def stop(socket_path: str) -> bool:
+    try:
+        for _ in request_events(socket_path, {"command": "stop"}, timeout=5.0):
+            pass
+    except OSError:
+        return False
+    return True
+
+
+def run_tests(socket_path: str, args: List[str],
+              on_event: Optional[Callable[[Dict], None]] = None) -> int:
+    """Прогон в демоне: вывод печатается по мере поступления, результат - код выхода pytest"""
+    request = {
+        "command": "run",
+        "args": args,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "tty": sys.stdout.isatty(),
+    }
+    exit_code = int(pytest.ExitCode.INTERNAL_ERROR)
+    for event in request_events(socket_path, request):
+        if event["event"] == "output":
+            sys.stdout.write(event["data"])
+            sys.stdout.flush()
+        elif event["event"] == "exit":
+            exit_code = event["code"]
+        if on_event is not None:
+            on_event(event)
+    return exit_code
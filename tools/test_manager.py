@@ -3,15 +3,33 @@
 CLI инструмент для управления тестовой конфигурацией
 """
 import argparse
+import os
 import subprocess
 import sys
+import tempfile
 from pathlib import Path
+from typing import List, NoReturn, Optional
 
 # Добавляем корневую директорию проекта в sys.path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from config.config_manager import ConfigManager
+from config.configurations import parse_matrix
+from tools.browser_servers import (
+    ENDPOINTS_ENV_VAR,
+    STARTUP_LOG_ENV_VAR,
+    BrowserServerPool,
+    ProcessTreeMonitor,
+    read_startup_log,
+    servers_for_workers,
+)
+from tools.config_matrix import MatrixRun
+from tools.sharding import check_manifests, parse_shard
+from tools import test_daemon, test_watcher
+
+
+DEFAULT_HISTORY_DB = ".test_history.sqlite"
 
 
 def main():
@@ -41,6 +59,32 @@ def main():
   python test_manager.py run
   python test_manager.py run --file tests/test_simple.py
   python test_manager.py run --smoke
+
+  # Общие browser-серверы для параллельных воркеров (4 воркера на сервер)
+  python test_manager.py run --parallel 16 --shared-browser --workers-per-server 4
+
+  # Долгие тесты первыми по истории длительностей
+  python test_manager.py run --parallel 4 --history
+
+  # Все движки: каждый тест на chromium, firefox и webkit
+  python test_manager.py run --browsers chromium,firefox,webkit
+
+  # Шард 2 из 4 для CI машины и проверка после всех шардов
+  python test_manager.py run --shard 2/4 --history
+  python test_manager.py shards-check --dir reports/shards
+
+  # CI: пропустить тесты, прошедшие с теми же исходниками, конфигурацией и сборкой
+  python test_manager.py run --result-cache .result_cache --build-id $BUILD_SHA
+
+  # Демон с теплым браузером и быстрые прогоны через него
+  python test_manager.py serve
+  python test_manager.py run --daemon --file tests/test_simple.py
+
+  # Перезапуск затронутых тестов при изменении файлов
+  python test_manager.py run --watch
+
+  # Несколько конфигураций одновременно и сравнение длительностей
+  python test_manager.py run --matrix local,headless
         """
     )
     
@@ -58,7 +102,7 @@ def main():
     remote_parser = subparsers.add_parser('remote', help='Переключиться на удаленный режим')
     remote_parser.add_argument('--ip', help='IP адрес удаленного Mac')
     remote_parser.add_argument('--port', type=int, default=9222, help='Порт (по умолчанию: 9222)')
-    remote_parser.add_argument('--service', choices=['chrome', 'selenium', 'chromedriver'], 
+    remote_parser.add_argument('--service', choices=['chrome', 'cdp', 'selenium', 'chromedriver'], 
                               default='chrome', help='Тип сервиса')
     
     # Команда proxy
@@ -76,9 +120,43 @@ def main():
     run_parser.add_argument('--regression', action='store_true', help='Запустить regression тесты')
     run_parser.add_argument('--slow', action='store_true', help='Запустить slow тесты')
     run_parser.add_argument('--auth', action='store_true', help='Запустить auth тесты')
-    run_parser.add_argument('--parallel', type=int, help='Количество параллельных процессов')
+    run_parser.add_argument('--parallel', type=int,
+                            help='Количество параллельных процессов (в воркере concurrent тесты '
+                                 'выполняются по одному, без пачек async движка)')
     run_parser.add_argument('--verbose', action='store_true', help='Подробный вывод')
     run_parser.add_argument('--quiet', action='store_true', help='Тихий режим')
+    run_parser.add_argument('--shared-browser', action='store_true',
+                           help='Запустить общие browser-серверы для параллельных воркеров')
+    run_parser.add_argument('--workers-per-server', type=int, default=4,
+                           help='Воркеров на один browser-сервер (по умолчанию: 4)')
+    run_parser.add_argument('--context-pool', type=int,
+                           help='Размер пула теплых BrowserContext на воркер')
+    run_parser.add_argument('--history', nargs='?', const=DEFAULT_HISTORY_DB,
+                           help=f'История длительностей: долгие тесты первыми (по умолчанию: {DEFAULT_HISTORY_DB})')
+    run_parser.add_argument('--shard', type=shard_arg, metavar='K/N',
+                           help='Запустить шард K из N (разбиение по истории длительностей)')
+    run_parser.add_argument('--browsers', metavar='LIST',
+                           help='Матрица движков: chromium,firefox,webkit (сравнение длительностей; '
+                                'без --parallel - воркер на движок, движки идут одновременно)')
+    run_parser.add_argument('--result-cache', metavar='DIR',
+                           help='Не выполнять тесты, прошедшие с тем же хэшем исходников и конфигурации')
+    run_parser.add_argument('--build-id', help='ID сборки приложения для ключа кэша результатов')
+    run_parser.add_argument('--matrix', type=matrix_arg, metavar='LIST',
+                           help='Конфигурации через запятую (local,headless,remote): одновременный прогон и сравнение')
+    run_parser.add_argument('--daemon', action='store_true',
+                           help='Выполнить в запущенном демоне (test_manager.py serve)')
+    run_parser.add_argument('--watch', action='store_true',
+                           help='Следить за tests/, config/, tools/ и перезапускать затронутые тесты')
+    run_parser.add_argument('--socket', default=test_daemon.default_socket_path(), help=argparse.SUPPRESS)
+    
+    # Команда serve
+    serve_parser = subparsers.add_parser('serve', help='Демон прогонов: драйвер и браузер остаются запущенными')
+    serve_parser.add_argument('--socket', default=test_daemon.default_socket_path(), help='Unix сокет демона')
+    serve_parser.add_argument('--stop', action='store_true', help='Остановить запущенный демон')
+    
+    # Команда shards-check
+    shards_parser = subparsers.add_parser('shards-check', help='Проверить, что шарды выполнили каждый тест ровно один раз')
+    shards_parser.add_argument('--dir', default='reports/shards', help='Каталог манифестов шардов')
     
     args = parser.parse_args()
     
@@ -99,6 +177,10 @@ def main():
             handle_proxy(config, args)
         elif args.command == 'run':
             handle_run(config, args)
+        elif args.command == 'shards-check':
+            handle_shards_check(args)
+        elif args.command == 'serve':
+            handle_serve(config, args)
             
     except Exception as e:
         print(f"❌ Ошибка: {e}")
@@ -197,6 +279,33 @@ def handle_run(config: ConfigManager, args):
     if args.parallel:
         cmd.extend(["-n", str(args.parallel)])
     
+    # История длительностей: долгие тесты первыми, раздача воркерам по одному тесту
+    if args.history:
+        cmd.append(f"--history={args.history}")
+        if args.parallel:
+            cmd.extend(["--dist", "load", "--maxschedchunk", "1"])
+    
+    # Кросс-браузерная матрица: без --parallel - воркер xdist на движок, движки идут параллельно
+    if args.browsers:
+        cmd.append(f"--browsers={args.browsers}")
+        if not (args.parallel or args.daemon or args.watch):
+            engines = {name.strip() for name in args.browsers.split(",") if name.strip()}
+            cmd.extend(["-n", str(len(engines)), "--dist", "loadgroup"])
+    
+    # Шард для CI машины
+    if args.shard:
+        cmd.append(f"--shard={args.shard}")
+    
+    # Кэш результатов
+    if args.result_cache:
+        cmd.append(f"--result-cache={args.result_cache}")
+        if args.build_id:
+            cmd.append(f"--build-id={args.build_id}")
+    
+    # Пул контекстов
+    if args.context_pool:
+        cmd.append(f"--context-pool={args.context_pool}")
+    
     # Добавляем вербозность
     if args.verbose:
         cmd.append("-v")
@@ -219,13 +328,150 @@ def handle_run(config: ConfigManager, args):
     print(f"🔧 Command: {' '.join(cmd)}")
     print("=" * 50)
     
-    # Запускаем тесты
+    if (args.daemon or args.watch) and (args.parallel or args.shared_browser):
+        raise ValueError("--daemon и --watch не совместимы с --parallel и --shared-browser")
+    
+    if args.matrix:
+        if args.daemon or args.watch or args.shared_browser:
+            raise ValueError("--matrix не совместим с --daemon, --watch и --shared-browser")
+        # Каждая конфигурация - отдельный процесс со своим окружением
+        try:
+            sys.exit(MatrixRun(args.matrix, cmd[3], cmd[4:]).run())
+        except KeyboardInterrupt:
+            print("\n⚠️ Тестирование прервано пользователем")
+            sys.exit(1)
+    
+    if args.watch:
+        # Прогоны идут через демон (при необходимости он запускается на время наблюдения)
+        test_watcher.watch(args.socket, cmd[3], cmd[4:])
+        return
+    
+    if args.daemon:
+        if test_daemon.ping(args.socket) is not None:
+            run_in_daemon(args.socket, cmd[3:])
+        print(f"⚠️ Демон не запущен ({args.socket}), обычный запуск")
+    
+    env = os.environ.copy()
+    startup_log = tempfile.NamedTemporaryFile(prefix="browser-startup-", suffix=".jsonl", delete=False)
+    startup_log.close()
+    env[STARTUP_LOG_ENV_VAR] = startup_log.name
+    
+    server_pool = None
+    monitor = ProcessTreeMonitor()
+    returncode = 1
+    
     try:
-        result = subprocess.run(cmd, cwd=".", check=False)
-        sys.exit(result.returncode)
+        if args.shared_browser:
+            server_pool = start_browser_servers(config, args)
+            env[ENDPOINTS_ENV_VAR] = ",".join(server_pool.endpoints)
+            monitor.track(*server_pool.pids)
+        
+        # Запускаем тесты
+        process = subprocess.Popen(cmd, cwd=".", env=env)
+        monitor.track(process.pid)
+        monitor.start()
+        returncode = process.wait()
     except KeyboardInterrupt:
         print("\n⚠️ Тестирование прервано пользователем")
+    finally:
+        monitor.stop()
+        if server_pool:
+            server_pool.stop()
+    
+    print_browser_startup_report(server_pool, monitor, startup_log.name)
+    os.remove(startup_log.name)
+    sys.exit(returncode)
+
+
+def run_in_daemon(socket_path: str, pytest_args: List[str]) -> NoReturn:
+    """Прогон в демоне: вывод и код выхода pytest, как у обычного запуска"""
+    try:
+        returncode = test_daemon.run_tests(socket_path, pytest_args)
+    except KeyboardInterrupt:
+        print("\n⚠️ Тестирование прервано пользователем")
+        returncode = 1
+    sys.exit(returncode)
+
+
+def handle_serve(config: ConfigManager, args: argparse.Namespace) -> None:
+    """Обработка команды serve"""
+    if args.stop:
+        if not test_daemon.stop(args.socket):
+            raise ValueError(f"Демон не запущен ({args.socket})")
+        print(f"🛑 Демон остановлен ({args.socket})")
+        return
+    
+    prewarm = None
+    if not config.is_remote_mode():
+        # Те же аргументы, что у browser_type_launch_args в conftest: тесты получат этот браузер
+        browser_name = os.getenv("BROWSER", config.config["local_settings"].get("browser", "chromium"))
+        prewarm = (browser_name, config.get_browser_launch_args())
+    test_daemon.serve(args.socket, prewarm)
+
+
+def handle_shards_check(args: argparse.Namespace) -> None:
+    """Обработка команды shards-check"""
+    problems = check_manifests(args.dir)
+    if problems:
+        print(f"❌ Shard manifests check failed ({len(problems)} problems):")
+        for problem in problems:
+            print(f"   {problem}")
         sys.exit(1)
+    print(f"✅ Every collected test ran exactly once ({args.dir})")
+
+
+def shard_arg(value: str) -> str:
+    """Проверка аргумента --shard K/N"""
+    try:
+        parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def matrix_arg(value: str) -> list:
+    """Проверка аргумента --matrix"""
+    try:
+        return parse_matrix(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def start_browser_servers(config: ConfigManager, args: argparse.Namespace) -> BrowserServerPool:
+    """Запустить общие browser-серверы для воркеров"""
+    if config.is_remote_mode():
+        raise ValueError("--shared-browser работает только в локальном режиме")
+    
+    workers = args.parallel or 1
+    count = servers_for_workers(workers, args.workers_per_server)
+    launch_args = config.get_browser_launch_args()
+    browser_name = os.getenv("BROWSER", config.config["local_settings"].get("browser", "chromium"))
+    
+    server_pool = BrowserServerPool(browser_name=browser_name, headless=launch_args["headless"])
+    print(f"🌐 Запуск {count} browser-серверов для {workers} воркеров...")
+    server_pool.start(count)
+    print(f"🌐 Browser-серверы готовы за {server_pool.startup_time:.2f}s")
+    return server_pool
+
+
+def print_browser_startup_report(server_pool: Optional[BrowserServerPool], monitor: ProcessTreeMonitor,
+                                 startup_log: str) -> None:
+    """Показать время запуска браузеров и пиковый RSS прогона"""
+    entries = read_startup_log(startup_log)
+    mode = "shared browser servers" if server_pool else "browser per worker"
+    
+    print("=" * 50)
+    print(f"📊 Browser mode: {mode}")
+    if server_pool:
+        print(f"   Server startup: {server_pool.startup_time:.2f}s ({len(server_pool.endpoints)} servers)")
+    if entries:
+        total = sum(entry["seconds"] for entry in entries)
+        slowest = max(entry["seconds"] for entry in entries)
+        print(f"   Worker browser startup: total {total:.2f}s, max {slowest:.2f}s ({len(entries)} workers)")
+    if monitor.available:
+        print(f"   Peak RSS: {monitor.peak_rss / (1024 * 1024):.1f} MB")
+    else:
+        print("   Peak RSS: недоступно (установите psutil)")
 
 
 if __name__ == "__main__":
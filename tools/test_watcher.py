@@ -0,0 +1,431 @@
+"""
+Режим наблюдения: перезапуск только тестов, затронутых изменением файлов
+Карта зависимостей строится по AST без импорта: импорты модулей проекта, фикстуры
+(аргументы, getfixturevalue, usefixtures, autouse из conftest) и верхнеуровневые
+имена модулей. Изменение сравнивается по именам, поэтому правка одной фикстуры
+в tests/fixtures.py перезапускает только тесты, которые ее используют (в том числе
+через другие фикстуры), а правка тестового файла - только этот файл.
+Прогоны идут через демон (tools/test_daemon.py): браузер остается теплым
+"""
+import ast
+import hashlib
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from tools import test_daemon
+
+
+PROJECT_ROOT = test_daemon.PROJECT_ROOT
+WATCH_ROOTS = ("tests", "config", "tools")
+WATCH_SUFFIXES = (".py", ".json")
+# Код модуля вне определений (if, try, вызовы): его изменение меняет весь модуль
+MODULE_CODE = "<module>"
+
+# Изменения: файл -> измененные верхнеуровневые имена (None - изменился весь модуль)
+Changes = Dict[Path, Optional[Set[str]]]
+FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+
+class Fixture(NamedTuple):
+    path: Path
+    name: str
+    requires: Set[str]
+    autouse: bool
+
+
+class ModuleInfo:
+    """Разобранный модуль: хэши верхнеуровневых имен, импорты, фикстуры и тесты"""
+
+    def __init__(self, path: Path, tree: ast.Module):
+        self.path = path
+        self.hashes: Dict[str, str] = {}
+        self.refs: Dict[str, Set[str]] = {}
+        # Импорт модуля проекта: файл и импортированные имена (None - модуль целиком)
+        self.imports: List[Tuple[Path, Optional[Set[str]]]] = []
+        # Имя в модуле -> (файл, имя) для from-импортов: так находятся импортированные фикстуры
+        self.imported_names: Dict[str, Tuple[Path, str]] = {}
+        self.star_imports: List[Path] = []
+        self.fixtures: Dict[str, Fixture] = {}
+        # "test_x" или "TestClass::test_x" -> фикстуры теста
+        self.tests: Dict[str, Set[str]] = {}
+
+        for stmt in tree.body:
+            for name in _bound_names(stmt):
+                digest = hashlib.sha1(ast.dump(stmt).encode()).hexdigest()
+                self.hashes[name] = self.hashes.get(name, "") + digest
+                self.refs.setdefault(name, set()).update(
+                    node.id for node in ast.walk(stmt) if isinstance(node, ast.Name))
+            if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                self._add_import(stmt)
+            elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._add_function(stmt, prefix="", class_fixtures=set())
+            elif isinstance(stmt, ast.ClassDef) and stmt.name.startswith("Test"):
+                class_fixtures = _usefixtures(stmt)
+                for item in stmt.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        self._add_function(item, prefix=f"{stmt.name}::", class_fixtures=class_fixtures)
+        for names in self.refs.values():
+            names.intersection_update(self.hashes)
+
+    def _add_import(self, stmt: Union[ast.Import, ast.ImportFrom]) -> None:
+        if isinstance(stmt, ast.Import):
+            for alias in stmt.names:
+                path = resolve_module(alias.name, self.path)
+                if path is not None:
+                    self.imports.append((path, None))
+            return
+        module = stmt.module or ""
+        base = resolve_module(module, self.path, stmt.level)
+        names: Set[str] = set()
+        for alias in stmt.names:
+            # from package import submodule - зависимость от файла подмодуля
+            submodule = resolve_module(f"{module}.{alias.name}" if module else alias.name, self.path, stmt.level)
+            if submodule is not None:
+                self.imports.append((submodule, None))
+            elif alias.name == "*" and base is not None:
+                self.star_imports.append(base)
+                self.imports.append((base, None))
+            elif base is not None:
+                names.add(alias.name)
+                self.imported_names[alias.asname or alias.name] = (base, alias.name)
+        if names and base is not None:
+            self.imports.append((base, names))
+
+    def _add_function(self, node: FunctionNode, prefix: str, class_fixtures: Set[str]) -> None:
+        fixture = _fixture_decorator(node)
+        if fixture is not None and not prefix:
+            name, autouse = fixture
+            self.fixtures[name] = Fixture(self.path, node.name, _requested_fixtures(node), autouse)
+        elif node.name.startswith("test") and self.path.name.startswith("test_"):
+            self.tests[prefix + node.name] = _requested_fixtures(node) | _usefixtures(node) | class_fixtures
+
+    def digest(self, name: str) -> str:
+        """Хэш определения и всех имен модуля, на которые оно ссылается (без учета строк и отступов)"""
+        seen: Set[str] = set()
+        pending = [name, MODULE_CODE]
+        while pending:
+            current = pending.pop()
+            if current in seen or current not in self.hashes:
+                continue
+            seen.add(current)
+            pending.extend(self.refs[current])
+        return hashlib.sha1("".join(self.hashes[n] for n in sorted(seen)).encode()).hexdigest()
+
+    def changed_names(self, previous: Optional["ModuleInfo"]) -> Optional[Set[str]]:
+        """Имена, определения которых изменились (с учетом ссылок внутри модуля)"""
+        if previous is None:
+            return None
+        changed = {name for name in self.hashes.keys() | previous.hashes.keys()
+                   if self.hashes.get(name) != previous.hashes.get(name)}
+        if MODULE_CODE in changed:
+            return None
+        # Фикстура, использующая измененную константу модуля, тоже изменилась
+        grown = True
+        while grown:
+            extra = {name for name, refs in self.refs.items() if name not in changed and refs & changed}
+            changed |= extra
+            grown = bool(extra)
+        return changed
+
+
+def _bound_names(stmt: ast.stmt) -> List[str]:
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [stmt.name]
+    if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+        targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+        names = [node.id for target in targets for node in ast.walk(target) if isinstance(node, ast.Name)]
+        return names or [MODULE_CODE]
+    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return [(alias.asname or alias.name).split(".")[0] for alias in stmt.names]
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+        return []  # docstring
+    return [MODULE_CODE]
+
+
+def _fixture_decorator(node: FunctionNode) -> Optional[Tuple[str, bool]]:
+    """(имя фикстуры, autouse), если функция - фикстура pytest"""
+    for decorator in node.decorator_list:
+        call = decorator if isinstance(decorator, ast.Call) else None
+        target = call.func if call else decorator
+        name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", None)
+        if name != "fixture":
+            continue
+        keywords = {kw.arg: kw.value for kw in call.keywords} if call else {}
+        fixture_name = keywords.get("name")
+        autouse = keywords.get("autouse")
+        return (fixture_name.value if isinstance(fixture_name, ast.Constant) else node.name,
+                isinstance(autouse, ast.Constant) and bool(autouse.value))
+    return None
+
+
+def _requested_fixtures(node: FunctionNode) -> Set[str]:
+    """Аргументы функции и имена из request.getfixturevalue("...")"""
+    args = node.args
+    names = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs} - {"self", "cls"}
+    for call in ast.walk(node):
+        if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                and call.func.attr == "getfixturevalue" and call.args
+                and isinstance(call.args[0], ast.Constant)):
+            names.add(call.args[0].value)
+    return names
+
+
+def _usefixtures(node: Union[FunctionNode, ast.ClassDef]) -> Set[str]:
+    names: Set[str] = set()
+    for decorator in node.decorator_list:
+        if (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)
+                and decorator.func.attr == "usefixtures"):
+            names.update(arg.value for arg in decorator.args if isinstance(arg, ast.Constant))
+    return names
+
+
+def resolve_module(name: str, importer: Path, level: int = 0) -> Optional[Path]:
+    """Файл модуля проекта (None для stdlib и пакетов окружения)"""
+    if level:
+        bases = [importer.parents[level - 1]]
+    else:
+        # Каталог тестов pytest добавляет в sys.path (rootdir без __init__.py)
+        bases = [importer.parent, PROJECT_ROOT]
+    parts = name.split(".") if name else []
+    for base in bases:
+        candidate = base.joinpath(*parts)
+        for path in (candidate.with_suffix(".py"), candidate / "__init__.py"):
+            if parts and path.is_file():
+                return path.resolve()
+    return None
+
+
+class DependencyMap:
+    """Кэш разобранных модулей и выбор тестов, затронутых изменениями"""
+
+    def __init__(self, target: str):
+        self.target = (PROJECT_ROOT / target).resolve()
+        self.modules: Dict[Path, Optional[ModuleInfo]] = {}
+
+    def test_files(self) -> List[Path]:
+        if self.target.is_file():
+            return [self.target]
+        return sorted(self.target.rglob("test_*.py"))
+
+    def module(self, path: Path) -> Optional[ModuleInfo]:
+        if path not in self.modules:
+            try:
+                self.modules[path] = ModuleInfo(path, ast.parse(path.read_text(encoding="utf-8")))
+            except (OSError, SyntaxError, UnicodeDecodeError):
+                self.modules[path] = None
+        return self.modules[path]
+
+    def load(self) -> None:
+        """Разобрать тесты, их conftest и все модули проекта, которые они импортируют"""
+        pending = [*self.test_files(), *(conftest for test in self.test_files()
+                                         for conftest in self.conftests(test))]
+        while pending:
+            info = self.module(pending.pop())
+            if info is not None:
+                pending.extend(path for path, _ in info.imports if path not in self.modules)
+
+    def update(self, paths: Iterable[Path]) -> Changes:
+        """Перечитать измененные файлы; результат - какие имена в них изменились"""
+        changes: Changes = {}
+        for path in paths:
+            if path.suffix != ".py":
+                changes[path] = None
+                continue
+            previous = self.modules.pop(path, None)
+            info = self.module(path) if path.exists() else None
+            if info is None or previous is None:
+                changes[path] = None
+            else:
+                names = info.changed_names(previous)
+                if names is None or names:
+                    changes[path] = names
+        self.load()
+        return changes
+
+    def conftests(self, test_file: Path) -> List[Path]:
+        """conftest.py от каталога теста до корня проекта (ближайший первым)"""
+        result = []
+        for directory in test_file.parents:
+            if (directory / "conftest.py").is_file():
+                result.append((directory / "conftest.py").resolve())
+            if directory == PROJECT_ROOT:
+                break
+        return result
+
+    def propagate(self, changes: Changes) -> Changes:
+        """Модули, импортирующие измененные имена, считаются измененными целиком"""
+        changes = dict(changes)
+        grown = True
+        while grown:
+            grown = False
+            for path, info in self.modules.items():
+                if info is None or changes.get(path, ()) is None:
+                    continue
+                for dependency, names in info.imports:
+                    if dependency not in changes:
+                        continue
+                    changed = changes[dependency]
+                    # Импортированные фикстуры учитываются по графу фикстур, а не как импорт
+                    imported = None if names is None else names - self._fixture_names(dependency)
+                    if imported is None or (imported if changed is None else imported & changed):
+                        changes[path] = None
+                        grown = True
+                        break
+        return changes
+
+    def _fixture_names(self, path: Path) -> Set[str]:
+        info = self.modules.get(path)
+        return set(info.fixtures) if info is not None else set()
+
+    def visible_fixtures(self, test_file: Path) -> Dict[str, Fixture]:
+        """Фикстуры, доступные тестам файла: свои, импортированные, из conftest"""
+        visible: Dict[str, Fixture] = {}
+        for conftest in reversed(self.conftests(test_file)):
+            info = self.modules.get(conftest)
+            if info is not None:
+                visible.update(info.fixtures)
+        info = self.modules.get(test_file)
+        if info is None:
+            return visible
+        for star in info.star_imports:
+            visible.update(self._fixtures_of(star))
+        for alias, (source, name) in info.imported_names.items():
+            fixture = self._fixtures_of(source).get(name)
+            if fixture is not None:
+                visible[alias] = fixture
+        visible.update(info.fixtures)
+        return visible
+
+    def _fixtures_of(self, path: Path) -> Dict[str, Fixture]:
+        info = self.modules.get(path)
+        return info.fixtures if info is not None else {}
+
+    def affected(self, changed_paths: Iterable[Path]) -> Optional[List[str]]:
+        """node id тестов, затронутых изменением (None - перезапустить все)"""
+        changes = self.propagate(self.update(changed_paths))
+        if any(path.suffix != ".py" for path in changes):
+            return None  # конфигурация (config/*.json) влияет на все тесты
+
+        selected: List[str] = []
+        for test_file in self.test_files():
+            relative = test_file.relative_to(PROJECT_ROOT).as_posix()
+            info = self.modules.get(test_file)
+            if test_file in changes or info is None:
+                if test_file in changes:
+                    selected.append(relative)
+                continue
+            # Хуки и код conftest вне фикстур влияют на все тесты каталога
+            if any(self._conftest_hooks_changed(conftest, changes) for conftest in self.conftests(test_file)):
+                selected.append(relative)
+                continue
+            visible = self.visible_fixtures(test_file)
+            autouse = {name for name, fixture in visible.items() if fixture.autouse}
+            tests = [test for test, requested in info.tests.items()
+                     if self._fixture_changed(requested | autouse, visible, changes)]
+            if tests and len(tests) == len(info.tests):
+                selected.append(relative)
+            else:
+                selected.extend(f"{relative}::{test}" for test in tests)
+        return selected
+
+    def _conftest_hooks_changed(self, conftest: Path, changes: Changes) -> bool:
+        if conftest not in changes:
+            return False
+        names = changes[conftest]
+        return names is None or bool(names - self._fixture_names(conftest))
+
+    def _fixture_changed(self, requested: Set[str], visible: Dict[str, Fixture], changes: Changes) -> bool:
+        """Изменилась ли фикстура из замыкания запрошенных тестом"""
+        seen: Set[str] = set()
+        pending = list(requested)
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in visible:
+                continue
+            seen.add(name)
+            fixture = visible[name]
+            if fixture.path in changes:
+                names = changes[fixture.path]
+                if names is None or fixture.name in names:
+                    return True
+            pending.extend(fixture.requires)
+        return False
+
+
+# ---------- наблюдение ----------
+
+def snapshot() -> Dict[Path, float]:
+    """mtime наблюдаемых файлов"""
+    mtimes = {}
+    for root in WATCH_ROOTS:
+        for path in (PROJECT_ROOT / root).rglob("*"):
+            if path.suffix in WATCH_SUFFIXES and "__pycache__" not in path.parts:
+                try:
+                    mtimes[path.resolve()] = path.stat().st_mtime
+                except OSError:
+                    pass
+    return mtimes
+
+
+def wait_for_changes(previous: Dict[Path, float], interval: float) -> Tuple[Set[Path], Dict[Path, float]]:
+    """Дождаться изменений и затишья (редактор сохраняет несколько файлов подряд)"""
+    while True:
+        time.sleep(interval)
+        current = snapshot()
+        if current != previous:
+            break
+    while True:
+        time.sleep(interval)
+        settled = snapshot()
+        if settled == current:
+            break
+        current = settled
+    changed = {path for path in previous.keys() | current.keys() if previous.get(path) != current.get(path)}
+    return changed, current
+
+
+def ensure_daemon(socket_path: str) -> Optional[subprocess.Popen]:
+    """Запустить демон, если он еще не запущен (процесс демона или None для уже запущенного)"""
+    if test_daemon.ping(socket_path) is not None:
+        return None
+    print("🔥 Starting test daemon for watch mode...")
+    process = subprocess.Popen([sys.executable, str(PROJECT_ROOT / "tools" / "test_manager.py"),
+                                "serve", "--socket", socket_path], cwd=str(PROJECT_ROOT))
+    deadline = time.monotonic() + 120
+    while test_daemon.ping(socket_path) is None:
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("Test daemon failed to start")
+        time.sleep(0.2)
+    return process
+
+
+def watch(socket_path: str, target: str, pytest_args: List[str], interval: float = 0.5) -> None:
+    """Первый прогон всей выборки, затем перезапуск затронутых тестов при каждом изменении"""
+    process = ensure_daemon(socket_path)
+    dependencies = DependencyMap(target)
+    dependencies.load()
+    mtimes = snapshot()
+    try:
+        test_daemon.run_tests(socket_path, [target, *pytest_args])
+        while True:
+            print(f"\n👀 Watching {', '.join(WATCH_ROOTS)} for changes (Ctrl+C to stop)")
+            changed, mtimes = wait_for_changes(mtimes, interval)
+            names = ", ".join(sorted(path.relative_to(PROJECT_ROOT).as_posix() for path in changed))
+            selection = dependencies.affected(changed)
+            if selection is None:
+                selection = [target]
+            if not selection:
+                print(f"💤 {names}: no affected tests")
+                continue
+            print(f"🔁 {names}: rerunning {len(selection)} node(s)")
+            test_daemon.run_tests(socket_path, [*selection, *pytest_args])
+    except KeyboardInterrupt:
+        print("\n⚠️ Watch mode stopped")
+    finally:
+        if process is not None:
+            test_daemon.stop(socket_path)
+            process.wait(timeout=30)
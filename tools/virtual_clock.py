@@ -0,0 +1,31 @@
+"""
+Виртуальное время страницы вместо фиксированных ожиданий в тестах
+Построено на Playwright Clock API: таймеры страницы идут в реальном времени,
+а advance() мгновенно прокручивает их вперед
+"""
+from playwright.sync_api import Page
+
+
+class VirtualClock:
+    """Ожидания теста: прокрутка виртуальных часов страницы или реальная пауза"""
+
+    def __init__(self, page: Page, enabled: bool = True):
+        self.page = page
+        self.enabled = enabled
+        self.advanced_ms = 0.0
+
+    def install(self) -> None:
+        """Подменить таймеры страницы (до первой навигации)"""
+        if not self.enabled:
+            return
+        self.page.clock.install()
+        # После install часы стоят - запускаем их, чтобы таймеры шли как обычно
+        self.page.clock.resume()
+
+    def advance(self, ms: float) -> None:
+        """Продвинуть время на `ms` миллисекунд, выполнив все таймеры в этом окне"""
+        if self.enabled:
+            self.page.clock.run_for(int(ms))
+            self.advanced_ms += ms
+        else:
+            self.page.wait_for_timeout(ms)
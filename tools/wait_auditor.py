@@ -0,0 +1,222 @@
+"""
+Аудит ожиданий: сколько времени тесты провели в sleep/wait и сколько из него впустую
+Плагин pytest, подключается в conftest.py опцией --audit-waits
+"""
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, List, Optional
+
+import pytest
+from playwright.sync_api import Error, Page
+
+from tools.playwright_hooks import (
+    ASSERTION_CLASSES,
+    CallSiteResolver,
+    MethodPatcher,
+    assertion_methods,
+)
+
+
+# Момент окончания загрузки страницы (epoch ms) или null, если load еще не наступил
+LOAD_END_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    return nav && nav.loadEventEnd > 0 ? performance.timeOrigin + nav.loadEventEnd : null;
+}"""
+
+
+class WaitAuditor:
+    """Запись заблокированного и потраченного впустую времени ожиданий"""
+
+    def __init__(self, root: Path, report_path: str, budget_ms: Optional[float] = None, top: int = 10):
+        self.report_path = Path(report_path)
+        self.budget_ms = budget_ms
+        self.top = top
+        self.records: List[Dict[str, Any]] = []
+        self.current_nodeid: Optional[str] = None
+        self._call_sites = CallSiteResolver(root)
+        self._patcher = MethodPatcher()
+        self._active = False
+
+    # ---------- инструментирование ----------
+
+    def install(self) -> None:
+        """Обернуть wait_for_timeout, time.sleep, networkidle и expect(...)"""
+        self._patcher.wrap(Page, "wait_for_timeout", self._wrap_page_wait("wait_for_timeout"))
+        self._patcher.wrap(Page, "wait_for_load_state", self._wrap_load_state)
+        self._patcher.wrap(time, "sleep", self._wrap_sleep)
+        for cls in ASSERTION_CLASSES:
+            for name in assertion_methods(cls):
+                self._patcher.wrap(cls, name, self._wrap_assertion(f"expect.{name}"))
+
+    def uninstall(self) -> None:
+        self._patcher.restore()
+
+    def _wrap_page_wait(self, kind: str) -> Callable[[Callable], Callable]:
+        def make_wrapper(original: Callable) -> Callable:
+            def wrapper(page: Page, *args: Any, **kwargs: Any) -> Any:
+                if self._active:
+                    return original(page, *args, **kwargs)
+                started = time.time()
+                try:
+                    return original(page, *args, **kwargs)
+                finally:
+                    self._record_page_wait(kind, page, started)
+            return wrapper
+        return make_wrapper
+
+    def _wrap_load_state(self, original: Callable) -> Callable:
+        page_wait = self._wrap_page_wait("wait_for_load_state(networkidle)")(original)
+
+        def wrapper(page: Page, state: Optional[str] = None, **kwargs: Any) -> Any:
+            if state == "networkidle":
+                return page_wait(page, state, **kwargs)
+            return original(page, state, **kwargs)
+        return wrapper
+
+    def _wrap_sleep(self, original: Callable) -> Callable:
+        def wrapper(seconds: float) -> None:
+            site = self._call_sites.resolve()
+            if site is None or self._active:
+                # Ожидания внутри библиотек не аудируем
+                original(seconds)
+                return
+            started = time.time()
+            try:
+                original(seconds)
+            finally:
+                blocked = (time.time() - started) * 1000
+                # У sleep нет условия ожидания - потрачено все время
+                self._record("time.sleep", site, blocked, blocked)
+        return wrapper
+
+    def _wrap_assertion(self, kind: str) -> Callable[[Callable], Callable]:
+        def make_wrapper(original: Callable) -> Callable:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if self._active:
+                    return original(*args, **kwargs)
+                site = self._call_sites.resolve()
+                started = time.time()
+                failed = False
+                try:
+                    return original(*args, **kwargs)
+                except AssertionError:
+                    # Опрос до таймаута проваленной проверки - потерянное время
+                    failed = True
+                    raise
+                finally:
+                    blocked = (time.time() - started) * 1000
+                    self._record(kind, site, blocked, blocked if failed else 0.0)
+            return wrapper
+        return make_wrapper
+
+    def _record_page_wait(self, kind: str, page: Page, started: float) -> None:
+        finished = time.time()
+        blocked = (finished - started) * 1000
+        site = self._call_sites.resolve()
+
+        self._active = True
+        try:
+            load_end = page.evaluate(LOAD_END_SCRIPT)
+        except Error:
+            load_end = None
+        finally:
+            self._active = False
+
+        # Страница загрузилась раньше конца ожидания - остаток ожидания потерян
+        wasted = 0.0
+        if load_end is not None:
+            wasted = max(0.0, min(blocked, finished * 1000 - max(started * 1000, load_end)))
+
+        self._record(kind, site, blocked, wasted)
+
+    def _record(self, kind: str, site: Optional[str], blocked_ms: float, wasted_ms: float) -> None:
+        self.records.append({
+            "test": self.current_nodeid,
+            "site": site or "<unknown>",
+            "kind": kind,
+            "blocked_ms": round(blocked_ms, 1),
+            "wasted_ms": round(wasted_ms, 1),
+        })
+
+    # ---------- хуки pytest ----------
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: pytest.Item,
+                                nextitem: Optional[pytest.Item]) -> Generator[None, None, None]:
+        self.current_nodeid = item.nodeid
+        yield
+        self.current_nodeid = None
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        """Собрать записи воркера pytest-xdist"""
+        records = getattr(node, "workeroutput", {}).get("wait_audit")
+        if records:
+            self.records.extend(json.loads(records))
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            workeroutput["wait_audit"] = json.dumps(self.records)
+            return
+
+        summary = self.summary()
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        if self.budget_ms is not None and summary["total_wasted_ms"] > self.budget_ms:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if hasattr(terminalreporter.config, "workerinput"):
+            return
+        summary = self.summary()
+        tr = terminalreporter
+        tr.write_sep("=", "wait audit")
+        tr.write_line(
+            f"Blocked: {summary['total_blocked_ms'] / 1000:.1f}s, "
+            f"wasted: {summary['total_wasted_ms'] / 1000:.1f}s ({len(self.records)} waits)"
+        )
+        for title, key in (("Tests", "by_test"), ("Call sites", "by_site")):
+            rows = summary[key][: self.top]
+            if not rows:
+                continue
+            tr.write_line("")
+            tr.write_line(f"{'wasted, s':>10} {'blocked, s':>11} {'waits':>6}  {title}")
+            for row in rows:
+                tr.write_line(
+                    f"{row['wasted_ms'] / 1000:>10.2f} {row['blocked_ms'] / 1000:>11.2f} "
+                    f"{row['count']:>6}  {row['name']}"
+                )
+        if self.budget_ms is not None and summary["total_wasted_ms"] > self.budget_ms:
+            tr.write_line(
+                f"❌ Wasted wait time {summary['total_wasted_ms']:.0f}ms exceeds budget {self.budget_ms:.0f}ms",
+                red=True,
+            )
+        tr.write_line(f"📄 Wait audit saved: {self.report_path}")
+
+    # ---------- отчет ----------
+
+    def summary(self) -> Dict[str, Any]:
+        """Итоги аудита, сгруппированные по тестам и местам вызова"""
+        return {
+            "total_blocked_ms": round(sum(r["blocked_ms"] for r in self.records), 1),
+            "total_wasted_ms": round(sum(r["wasted_ms"] for r in self.records), 1),
+            "budget_ms": self.budget_ms,
+            "by_test": self._group("test"),
+            "by_site": self._group("site"),
+            "records": self.records,
+        }
+
+    def _group(self, key: str) -> List[Dict[str, Any]]:
+        groups: Dict[str, Dict[str, float]] = defaultdict(lambda: {"blocked_ms": 0.0, "wasted_ms": 0.0, "count": 0})
+        for record in self.records:
+            group = groups[record[key] or "<outside tests>"]
+            group["blocked_ms"] += record["blocked_ms"]
+            group["wasted_ms"] += record["wasted_ms"]
+            group["count"] += 1
+        rows = [{"name": name, **{k: round(v, 1) for k, v in values.items()}} for name, values in groups.items()]
+        return sorted(rows, key=lambda row: row["wasted_ms"], reverse=True)